@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Auto-ajuste do Runtime de Inferencia (CPU)
+==========================================
+Varre tamanhos dos pools de threads, limites do micro-batching e backends
+do `XRayClassifier` nesta maquina e grava o melhor conjunto em um perfil
+de runtime (`runtime_profile.json`), lido por `_load_model` na
+inicializacao.
+
+Cada tentativa roda em processos novos (os pools de threads do
+TensorFlow so podem ser definidos antes da inicializacao do runtime), com
+o mesmo numero de processos que os workers do Gunicorn, todos gerando
+carga ao mesmo tempo. Assim a disputa por nucleos entre workers aparece
+na latencia medida.
+
+A varredura e feita em duas etapas:
+1. backend x threads (intra-op; inter-op apenas no keras)
+2. tamanho maximo de lote x espera maxima, na melhor combinacao da etapa 1
+
+Uso:
+    python autotune.py --workers 2 --concurrency 4 --target latency
+    python autotune.py --target throughput --max-p95-ms 250 --duration 20
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from config import XRAY_RUNTIME_PROFILE_PATH
+
+# GUNICORN_* so sao definidos no config em producao
+GUNICORN_WORKERS = int(os.getenv('GUNICORN_WORKERS', 2))
+GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', 4))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+TARGETS = ('latency', 'throughput')
+
+# Configuracoes do perfil -> variaveis de ambiente lidas pelo classificador
+SETTING_ENV_VARS = {
+    'backend': 'XRAY_BACKEND',
+    'intra_op_threads': 'XRAY_INTRA_OP_THREADS',
+    'inter_op_threads': 'XRAY_INTER_OP_THREADS',
+    'max_batch_size': 'XRAY_MAX_BATCH_SIZE',
+    'max_batch_wait_ms': 'XRAY_MAX_BATCH_WAIT_MS'
+}
+
+
+def _cgroup_cpu_limit():
+    """Limite de CPU do container (cgroup v2 ou v1), em nucleos; None se ilimitado."""
+    try:
+        quota, period = Path('/sys/fs/cgroup/cpu.max').read_text().split()[:2]
+        if quota != 'max':
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+
+    try:
+        quota = int(Path('/sys/fs/cgroup/cpu/cpu.cfs_quota_us').read_text())
+        period = int(Path('/sys/fs/cgroup/cpu/cpu.cfs_period_us').read_text())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+
+    return None
+
+
+def available_cpus() -> int:
+    """Nucleos utilizaveis: afinidade do processo limitada pela cota do cgroup."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    limit = _cgroup_cpu_limit()
+    if limit:
+        cpus = min(cpus, max(1, math.floor(limit)))
+    return cpus
+
+
+def thread_candidates(cpus: int, workers: int) -> list:
+    """Potencias de 2 ate o total de nucleos, incluindo a divisao justa por worker."""
+    candidates = {max(1, cpus // workers)}
+    value = 1
+    while value <= cpus:
+        candidates.add(value)
+        value *= 2
+    return sorted(candidates)
+
+
+# ================================================================================
+# TENTATIVA (processo filho)
+# ================================================================================
+
+def run_trial_worker(concurrency: int, duration: float):
+    """
+    Corpo de um processo de tentativa: carrega o classificador com as
+    configuracoes recebidas por variaveis de ambiente, sinaliza READY,
+    aguarda GO na entrada padrao e gera carga por `duration` segundos.
+    """
+    from benchmark_classifier import synthetic_xray
+    from xray_classifier import IMAGE_SIZE, XRayClassifier
+
+    classifier = XRayClassifier()
+    tensor = classifier.preprocess_image(synthetic_xray(IMAGE_SIZE))
+    classifier.classify(tensor)  # aquecimento
+
+    print('READY', flush=True)
+    sys.stdin.readline()
+
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        local = []
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            classifier.classify(tensor)
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(json.dumps({
+        'backend': classifier.backend_name,
+        'elapsed_s': time.perf_counter() - start,
+        'latencies_ms': [round(value, 3) for value in latencies]
+    }), flush=True)
+
+
+def _trial_command() -> list:
+    return [sys.executable, os.path.abspath(__file__), 'trial']
+
+
+def run_trial(settings: dict, workers: int, concurrency: int, duration: float) -> dict:
+    """Executa uma tentativa com `workers` processos simultaneos."""
+    env = dict(os.environ)
+    env['XRAY_RUNTIME_PROFILE_ENABLED'] = 'false'
+    env['TF_CPP_MIN_LOG_LEVEL'] = '2'
+    for key, env_var in SETTING_ENV_VARS.items():
+        env[env_var] = str(settings[key])
+
+    command = _trial_command() + ['--concurrency', str(concurrency), '--duration', str(duration)]
+    processes = [
+        subprocess.Popen(command, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                         stderr=subprocess.DEVNULL, text=True)
+        for _ in range(workers)
+    ]
+
+    try:
+        # Todos carregam o modelo antes de qualquer um gerar carga
+        for process in processes:
+            if process.stdout.readline().strip() != 'READY':
+                raise RuntimeError('processo de tentativa falhou ao carregar o modelo')
+        for process in processes:
+            process.stdin.write('GO\n')
+            process.stdin.flush()
+
+        outputs = [json.loads(process.stdout.readline()) for process in processes]
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+
+    if any(output['backend'] != settings['backend'] for output in outputs):
+        raise RuntimeError(f"backend {settings['backend']} indisponivel")
+
+    latencies = np.concatenate([output['latencies_ms'] for output in outputs])
+    elapsed = max(output['elapsed_s'] for output in outputs)
+    return {
+        'requests': int(len(latencies)),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 2),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 2),
+        'throughput_ips': round(len(latencies) / elapsed, 2)
+    }
+
+
+# ================================================================================
+# VARREDURA
+# ================================================================================
+
+def score(metrics: dict, target: str, max_p95_ms: float = None) -> float:
+    """Quanto menor, melhor. Tentativas acima do limite de p95 ficam por ultimo."""
+    if max_p95_ms and metrics['p95_ms'] > max_p95_ms:
+        return math.inf
+    if target == 'latency':
+        return metrics['p95_ms']
+    return -metrics['throughput_ips']
+
+
+def sweep(candidates: list, args, trials: list) -> dict:
+    """Executa as tentativas e retorna a melhor (ou None)."""
+    best = None
+    for settings in candidates:
+        label = ', '.join(f"{key}={value}" for key, value in settings.items())
+        try:
+            metrics = run_trial(settings, args.workers, args.concurrency, args.duration)
+        except Exception as e:
+            logger.warning(f"⚠️  {label}: {e}")
+            trials.append({'settings': settings, 'error': str(e)})
+            continue
+
+        logger.info(f"{label}: p95 {metrics['p95_ms']:.1f} ms, "
+                    f"{metrics['throughput_ips']:.1f} img/s")
+        trial = {'settings': settings, 'metrics': metrics,
+                 'score': score(metrics, args.target, args.max_p95_ms)}
+        trials.append(trial)
+        if best is None or trial['score'] < best['score']:
+            best = trial
+    return best
+
+
+def run_tune(args) -> bool:
+    cpus = available_cpus()
+    threads = args.threads or thread_candidates(cpus, args.workers)
+    logger.info(f"CPUs utilizaveis: {cpus} | workers: {args.workers} | "
+                f"concorrencia por worker: {args.concurrency} | alvo: {args.target}")
+
+    if args.backends:
+        backends = args.backends
+    else:
+        from benchmark_classifier import available_backends
+        backends = available_backends()
+
+    base = {'max_batch_size': args.batch_sizes[0], 'max_batch_wait_ms': args.batch_waits[0]}
+    stage1 = []
+    for backend in backends:
+        inter_values = args.inter_op if backend == 'keras' else [0]
+        for intra in threads:
+            for inter in inter_values:
+                stage1.append(dict(base, backend=backend, intra_op_threads=intra,
+                                   inter_op_threads=inter))
+
+    trials = []
+    best = sweep(stage1, args, trials)
+    if best is None:
+        logger.error("❌ Nenhuma tentativa concluida")
+        return False
+
+    stage2 = [
+        dict(best['settings'], max_batch_size=size, max_batch_wait_ms=wait)
+        for size in args.batch_sizes
+        for wait in args.batch_waits
+        if (size, wait) != (base['max_batch_size'], base['max_batch_wait_ms'])
+    ]
+    best = min([best, sweep(stage2, args, trials) or best], key=lambda trial: trial['score'])
+
+    profile = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'host': {'cpus': cpus, 'workers': args.workers, 'concurrency': args.concurrency},
+        'target': args.target,
+        'max_p95_ms': args.max_p95_ms,
+        'settings': best['settings'],
+        'metrics': best['metrics'],
+        'trials': [
+            {key: value for key, value in trial.items() if key != 'score'}
+            for trial in trials
+        ]
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(profile, indent=2))
+
+    logger.info(f"✅ Melhor configuracao: {best['settings']}")
+    logger.info(f"   p95 {best['metrics']['p95_ms']:.1f} ms, "
+                f"{best['metrics']['throughput_ips']:.1f} img/s")
+    logger.info(f"Perfil salvo em {output}")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Auto-ajuste do runtime de inferencia")
+    subparsers = parser.add_subparsers(dest='command')
+
+    trial = subparsers.add_parser('trial', help=argparse.SUPPRESS)
+    trial.add_argument('--concurrency', type=int, default=1)
+    trial.add_argument('--duration', type=float, default=5)
+
+    parser.add_argument('--target', choices=TARGETS, default='latency',
+                        help='Minimizar p95 (latency) ou maximizar img/s (throughput)')
+    parser.add_argument('--max-p95-ms', type=float, help='Limite de p95 aceito')
+    parser.add_argument('--workers', type=int, default=GUNICORN_WORKERS,
+                        help='Processos simultaneos (workers do Gunicorn)')
+    parser.add_argument('--concurrency', type=int, default=GUNICORN_THREADS,
+                        help='Threads gerando carga por processo')
+    parser.add_argument('--duration', type=float, default=10, help='Segundos por tentativa')
+    parser.add_argument('--backends', nargs='+', choices=('keras', 'onnx', 'tflite'))
+    parser.add_argument('--threads', nargs='+', type=int, help='Candidatos de intra-op')
+    parser.add_argument('--inter-op', nargs='+', type=int, default=[1, 2])
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[8, 1, 4, 16])
+    parser.add_argument('--batch-waits', nargs='+', type=float, default=[5, 2, 10])
+    parser.add_argument('--output', default=str(XRAY_RUNTIME_PROFILE_PATH))
+
+    args = parser.parse_args()
+    if args.command == 'trial':
+        run_trial_worker(args.concurrency, args.duration)
+        sys.exit(0)
+
+    sys.exit(0 if run_tune(args) else 1)
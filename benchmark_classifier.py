@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Benchmark do Classificador de Raio-X
+====================================
+Mede o `XRayClassifier` com entradas sinteticas (256x256 e tamanho de
+radiografia real), sem chamar o GPT-4o Vision:
+
+- carregamento do modelo por backend
+- pre-processamento (imagem decodificada -> tensor) e ingestao de upload
+  (bytes JPEG -> tensor + miniatura)
+- inferencia (forward pass de um tensor pronto)
+- `classify` ponta a ponta
+- vazao por tamanho de lote (`predict_batch`) e por numero de threads
+  concorrentes (`classify`, passando pelo micro-batching)
+
+Latencias em p50/p95/p99. O relatorio sai em JSON (e CSV opcional) e pode
+ser comparado com um baseline salvo para evidenciar regressoes.
+
+Uso:
+    python benchmark_classifier.py                           # backends disponiveis
+    python benchmark_classifier.py --backends keras onnx --iterations 100
+    python benchmark_classifier.py --save-baseline benchmark_baseline.json
+    python benchmark_classifier.py --baseline benchmark_baseline.json --fail-on-regression
+"""
+
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from config import IMAGE_SIZE, XRAY_ONNX_MODEL_PATH, XRAY_TFLITE_MODEL_PATH
+from image_ingestion import ingest_image
+from inference_backends import BACKENDS
+from xray_classifier import XRayClassifier
+
+logging.basicConfig(
+    level=logging.WARNING,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Radiografia de torax digital tipica (largura x altura)
+FULL_SIZE = (2048, 2500)
+
+# Colunas do relatorio (uma linha por medicao)
+REPORT_FIELDS = ('backend', 'metric', 'input', 'batch_size', 'threads', 'samples',
+                 'p50_ms', 'p95_ms', 'p99_ms', 'mean_ms', 'throughput_ips')
+
+# Metricas em que valores maiores sao melhores
+HIGHER_IS_BETTER = ('throughput_ips',)
+
+
+def synthetic_xray(size, seed: int = 0) -> Image.Image:
+    """
+    Imagem em tons de cinza com aparencia de radiografia: gradiente radial
+    (campos pulmonares escuros, bordas claras) e ruido.
+    """
+    width, height = size
+    rng = np.random.default_rng(seed)
+    y, x = np.ogrid[-1:1:complex(0, height), -1:1:complex(0, width)]
+    radial = np.clip(np.sqrt((x * 1.4) ** 2 + y ** 2), 0, 1)
+    noise = rng.normal(0, 0.05, size=(height, width))
+    pixels = np.clip((0.25 + 0.6 * radial + noise) * 255, 0, 255).astype(np.uint8)
+    return Image.fromarray(pixels, mode='L')
+
+
+def encode_jpeg(image: Image.Image, quality: int = 92) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def summarize(durations_ms, images_per_call: int = 1) -> dict:
+    """Percentis de latencia e vazao (imagens/s) de uma serie de medicoes."""
+    durations = np.asarray(durations_ms, dtype=np.float64)
+    mean = float(durations.mean())
+    return {
+        'samples': int(len(durations)),
+        'p50_ms': round(float(np.percentile(durations, 50)), 3),
+        'p95_ms': round(float(np.percentile(durations, 95)), 3),
+        'p99_ms': round(float(np.percentile(durations, 99)), 3),
+        'mean_ms': round(mean, 3),
+        'throughput_ips': round(images_per_call * 1000 / mean, 2) if mean else 0.0
+    }
+
+
+def time_calls(fn, iterations: int, warmup: int) -> list:
+    """Executa `fn` repetidas vezes e retorna as duracoes em ms."""
+    for _ in range(warmup):
+        fn()
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def available_backends() -> list:
+    """Backends com modelo disponivel (keras sempre; exportados se o arquivo existir)."""
+    backends = ['keras']
+    if Path(XRAY_ONNX_MODEL_PATH).exists():
+        backends.append('onnx')
+    if Path(XRAY_TFLITE_MODEL_PATH).exists():
+        backends.append('tflite')
+    return backends
+
+
+def _row(backend: str, metric: str, input_name: str, stats: dict,
+         batch_size: int = 1, threads: int = 1) -> dict:
+    row = {'backend': backend, 'metric': metric, 'input': input_name,
+           'batch_size': batch_size, 'threads': threads}
+    row.update(stats)
+    return row
+
+
+def benchmark_preprocessing(inputs: dict, iterations: int, warmup: int) -> list:
+    """Pre-processamento e ingestao; independentes do backend."""
+    from image_ingestion import image_to_tensor
+
+    rows = []
+    for name, image in inputs.items():
+        durations = time_calls(lambda: image_to_tensor(image), iterations, warmup)
+        rows.append(_row('-', 'preprocess', name, summarize(durations)))
+
+        data = encode_jpeg(image)
+        durations = time_calls(lambda: ingest_image(io.BytesIO(data)), iterations, warmup)
+        rows.append(_row('-', 'ingest_jpeg', name, summarize(durations)))
+    return rows
+
+
+def _concurrent_throughput(classifier: XRayClassifier, tensor: np.ndarray,
+                           threads: int, iterations: int) -> dict:
+    """Vazao de `classify` com varias threads (exercita o micro-batching)."""
+    durations = []
+    lock = threading.Lock()
+
+    def worker():
+        local = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            classifier.classify(tensor)
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            durations.extend(local)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    stats = summarize(durations)
+    stats['throughput_ips'] = round(len(durations) / elapsed, 2)
+    return stats
+
+
+def benchmark_backend(backend: str, inputs: dict, batch_sizes, thread_counts,
+                      iterations: int, warmup: int) -> list:
+    """Carregamento, inferencia, classify e curvas de vazao de um backend."""
+    start = time.perf_counter()
+    classifier = XRayClassifier(backend=backend)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    if not classifier.is_model_loaded() or classifier.backend_name != backend:
+        logger.error(f"❌ Backend {backend} indisponivel - ignorado")
+        return []
+
+    rows = [_row(backend, 'load', '-', summarize([load_ms]))]
+    tensor = classifier.preprocess_image(next(iter(inputs.values())))
+
+    durations = time_calls(lambda: classifier.predict_batch(tensor), iterations, warmup)
+    rows.append(_row(backend, 'inference', f"{IMAGE_SIZE[0]}x{IMAGE_SIZE[1]}", summarize(durations)))
+
+    for name, image in inputs.items():
+        durations = time_calls(lambda: classifier.classify(image), iterations, warmup)
+        rows.append(_row(backend, 'classify', name, summarize(durations)))
+
+    for batch_size in batch_sizes:
+        batch = np.repeat(tensor, batch_size, axis=0)
+        calls = max(1, iterations // batch_size)
+        durations = time_calls(lambda: classifier.predict_batch(batch), calls, min(warmup, 2))
+        rows.append(_row(backend, 'batch_throughput', 'tensor',
+                         summarize(durations, images_per_call=batch_size), batch_size=batch_size))
+
+    for threads in thread_counts:
+        stats = _concurrent_throughput(classifier, tensor, threads, max(1, iterations // threads))
+        rows.append(_row(backend, 'thread_throughput', 'tensor', stats, threads=threads))
+
+    if classifier.batcher is not None:
+        classifier.batcher.close()
+    return rows
+
+
+def _row_key(row: dict) -> tuple:
+    return (row['backend'], row['metric'], row['input'],
+            int(row['batch_size']), int(row['threads']))
+
+
+def compare_with_baseline(rows: list, baseline: list, tolerance: float) -> list:
+    """
+    Compara p95 (latencia) ou vazao com o baseline.
+
+    Returns:
+        list: Regressoes alem da tolerancia relativa.
+    """
+    reference = {_row_key(row): row for row in baseline}
+    regressions = []
+
+    for row in rows:
+        base = reference.get(_row_key(row))
+        if base is None:
+            continue
+        field = 'throughput_ips' if row['metric'].endswith('throughput') else 'p95_ms'
+        current, previous = float(row[field]), float(base[field])
+        if not previous:
+            continue
+        change = (current - previous) / previous
+        worse = -change if field in HIGHER_IS_BETTER else change
+        row['baseline_change'] = round(change, 4)
+        if worse > tolerance:
+            regressions.append({'key': _row_key(row), 'field': field,
+                                'baseline': previous, 'current': current, 'change': change})
+
+    return regressions
+
+
+def print_rows(rows: list):
+    """Exibe o relatorio em formato de tabela."""
+    print("\n" + "=" * 104)
+    print(f"{'Backend':<8} {'Metrica':<18} {'Entrada':<11} {'Lote':>5} {'Thr':>4} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'img/s':>9} {'vs base':>9}")
+    print("=" * 104)
+    for row in rows:
+        change = row.get('baseline_change')
+        change = f"{change * 100:+.1f}%" if change is not None else ''
+        print(f"{row['backend']:<8} {row['metric']:<18} {row['input']:<11} {row['batch_size']:>5} "
+              f"{row['threads']:>4} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} "
+              f"{row['p99_ms']:>9.2f} {row['throughput_ips']:>9.1f} {change:>9}")
+    print("=" * 104)
+
+
+def write_csv(rows: list, path: str):
+    with open(path, 'w', newline='') as handle:
+        writer = csv.DictWriter(handle, fieldnames=REPORT_FIELDS + ('baseline_change',),
+                                extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def environment_info() -> dict:
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+if __name__ == "__main__":
+    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+    parser = argparse.ArgumentParser(description="Benchmark do classificador de raio-X")
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS,
+                        help='Padrao: todos com modelo disponivel')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument('--threads', nargs='+', type=int, default=[1, 2, 4, 8])
+    parser.add_argument('--full-size', default=f"{FULL_SIZE[0]}x{FULL_SIZE[1]}",
+                        help='Dimensoes da radiografia sintetica em tamanho real (LxA)')
+    parser.add_argument('--output', default='benchmark_report.json')
+    parser.add_argument('--csv', help='Salvar tambem em CSV')
+    parser.add_argument('--baseline', help='Relatorio JSON de referencia para comparacao')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Piora relativa tolerada antes de acusar regressao')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    parser.add_argument('--save-baseline', help='Salvar este relatorio como baseline')
+    args = parser.parse_args()
+
+    full_width, full_height = (int(v) for v in args.full_size.lower().split('x'))
+    inputs = {
+        f"{IMAGE_SIZE[0]}x{IMAGE_SIZE[1]}": synthetic_xray(IMAGE_SIZE, seed=1),
+        f"{full_width}x{full_height}": synthetic_xray((full_width, full_height), seed=2)
+    }
+
+    rows = benchmark_preprocessing(inputs, args.iterations, args.warmup)
+    for backend in args.backends or available_backends():
+        print(f"⏱️  Backend {backend}...")
+        rows.extend(benchmark_backend(backend, inputs, args.batch_sizes, args.threads,
+                                      args.iterations, args.warmup))
+
+    regressions = []
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare_with_baseline(rows, baseline['results'], args.tolerance)
+
+    print_rows(rows)
+
+    report = {'environment': environment_info(), 'results': rows, 'regressions': regressions}
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"Relatorio salvo em {args.output}")
+    if args.csv:
+        write_csv(rows, args.csv)
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(report, indent=2))
+        print(f"Baseline salvo em {args.save_baseline}")
+
+    for regression in regressions:
+        print(f"⚠️  Regressao {regression['key']}: {regression['field']} "
+              f"{regression['baseline']:.2f} -> {regression['current']:.2f} "
+              f"({regression['change'] * 100:+.1f}%)")
+
+    sys.exit(1 if regressions and args.fail_on_regression else 0)
@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Benchmark do Processamento de Video
+===================================
+Mede `processar_video_xray` em gravacoes de tela sinteticas, geradas com
+`cv2.VideoWriter`: fundo escuro de visualizador com barra de ferramentas,
+radiografia sintetica (a mesma de `benchmark_classifier.py`) em uma
+posicao configuravel, cursor em movimento e troca da radiografia a cada
+`--static-seconds` (trechos estaticos).
+
+Posicoes da radiografia: 'center', 'left', 'full' (ocupa a tela) e
+'moving' (janela arrastada lentamente, forca o rastreador a redetectar).
+
+Cada configuracao de decodificacao/amostragem roda em um processo novo
+(modelo carregado e aquecido antes da medicao), para que o pico de RSS
+seja o da configuracao. Metricas por execucao:
+
+- frames de video percorridos/s, frames decodificados/s e classificados/s
+- tempo por etapa: decodificacao (pipeline), regiao do raio-X
+  (`XRayRegionTracker.locate`, sucessor de `extract_xray_region`),
+  realce (`prepare_frame`: recorte, cinza, reducao e CLAHE, sucessor de
+  `enhance_xray_frame`) e inferencia (pipeline)
+- pico de RSS e RSS apos carregar o modelo
+
+O relatorio sai em JSON (e CSV opcional) e pode ser comparado com um
+baseline salvo, como no benchmark do classificador.
+
+Uso:
+    python benchmark_video.py                                  # 60 s, 1280x720, 30 FPS
+    python benchmark_video.py --seconds 300 --resolution 1920x1080 --placements center moving
+    python benchmark_video.py --configs grab grab+change ffmpeg --save-baseline video_baseline.json
+    python benchmark_video.py --baseline video_baseline.json --fail-on-regression
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from benchmark_classifier import environment_info, synthetic_xray
+
+logging.basicConfig(
+    level=logging.WARNING,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+PLACEMENTS = ('center', 'left', 'full', 'moving')
+
+# Configuracoes de decodificacao/amostragem (argumentos de processar_video_xray)
+CONFIGS = {
+    'grab': {'sampling_mode': 'grab', 'change_detection': False},
+    'grab+change': {'sampling_mode': 'grab', 'change_detection': True},
+    'seek': {'sampling_mode': 'seek', 'change_detection': False},
+    'keyframes': {'sampling_mode': 'keyframes', 'change_detection': False},
+    'ffmpeg': {'sampling_mode': 'ffmpeg', 'change_detection': False},
+    'ffmpeg+change': {'sampling_mode': 'ffmpeg', 'change_detection': True}
+}
+
+# Colunas do relatorio (uma linha por video x configuracao)
+REPORT_FIELDS = ('video', 'config', 'frames_video', 'frames_decoded', 'frames_classified',
+                 'wall_s', 'video_fps', 'decoded_fps', 'classified_fps',
+                 'decode_s', 'region_s', 'enhance_s', 'inference_s',
+                 'rss_model_mb', 'rss_peak_mb', 'class_name')
+
+# Metricas comparadas com o baseline (True = maior e melhor)
+COMPARED_METRICS = {'video_fps': True, 'classified_fps': True, 'rss_peak_mb': False}
+
+
+# ================================================================================
+# GRAVACAO DE TELA SINTETICA
+# ================================================================================
+
+def _viewer_background(width: int, height: int) -> np.ndarray:
+    """Fundo de um visualizador de imagens medicas: area escura e barras de ferramentas."""
+    frame = np.full((height, width, 3), 32, dtype=np.uint8)
+    toolbar = max(8, height // 18)
+    frame[:toolbar] = (70, 70, 70)
+    frame[-toolbar:] = (55, 55, 55)
+    for x in range(toolbar // 2, width // 3, toolbar * 2):
+        cv2.rectangle(frame, (x, toolbar // 4), (x + toolbar, toolbar - toolbar // 4),
+                      (150, 150, 150), -1)
+    return frame
+
+
+def _xray_rect(placement: str, width: int, height: int, t: float) -> tuple:
+    """Retangulo (x, y, w, h) da radiografia na tela no instante t (s)."""
+    if placement == 'full':
+        return 0, 0, width, height
+
+    rect_h = int(height * 0.75)
+    rect_w = min(width, int(rect_h * 0.82))
+    y = (height - rect_h) // 2
+    if placement == 'left':
+        x = width // 12
+    elif placement == 'moving':
+        # Janela arrastada lentamente de um lado para o outro
+        travel = width - rect_w - width // 6
+        x = width // 12 + int(travel * (0.5 - 0.5 * np.cos(t * 2 * np.pi / 20)))
+    else:
+        x = (width - rect_w) // 2
+    return x, y, rect_w, rect_h
+
+
+def generate_screen_recording(path: str, seconds: float = 60, fps: float = 30,
+                              resolution: tuple = (1280, 720), static_seconds: float = 7,
+                              placement: str = 'center', seed: int = 0) -> dict:
+    """
+    Gera uma gravacao de tela sintetica de um visualizador de raio-X.
+
+    Args:
+        path: Arquivo de saida (.mp4, codec mp4v)
+        seconds: Duracao do video
+        fps: Frames por segundo
+        resolution: (largura, altura)
+        static_seconds: Tempo de cada radiografia na tela (trecho estatico,
+                        apenas o cursor se move)
+        placement: Um de PLACEMENTS
+        seed: Semente das radiografias sinteticas
+
+    Returns:
+        dict com os parametros do video gerado
+    """
+    if placement not in PLACEMENTS:
+        raise ValueError(f"posicao desconhecida: {placement}")
+
+    width, height = resolution
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"nao foi possivel criar o video {path}")
+
+    background = _viewer_background(width, height)
+    total_frames = int(round(seconds * fps))
+    frames_per_image = max(1, int(round(static_seconds * fps)))
+    images = {}
+
+    try:
+        for frame_number in range(total_frames):
+            t = frame_number / fps
+            x, y, rect_w, rect_h = _xray_rect(placement, width, height, t)
+
+            image_index = frame_number // frames_per_image
+            key = (image_index, rect_w, rect_h)
+            if key not in images:
+                images.clear()
+                xray = np.asarray(synthetic_xray((rect_w, rect_h), seed=seed + image_index))
+                images[key] = cv2.cvtColor(xray, cv2.COLOR_GRAY2BGR)
+
+            frame = background.copy()
+            frame[y:y + rect_h, x:x + rect_w] = images[key]
+
+            # Cursor do mouse percorrendo a tela
+            cursor_x = int((frame_number * 7) % width)
+            cursor_y = int(height * 0.85 - (frame_number * 3) % (height // 2))
+            cv2.circle(frame, (cursor_x, cursor_y), max(3, width // 200), (0, 0, 255), -1)
+
+            writer.write(frame)
+    finally:
+        writer.release()
+
+    return {
+        'path': str(path),
+        'seconds': seconds,
+        'fps': fps,
+        'resolution': f"{width}x{height}",
+        'static_seconds': static_seconds,
+        'placement': placement,
+        'frames': total_frames
+    }
+
+
+# ================================================================================
+# EXECUCAO (processo filho)
+# ================================================================================
+
+class _StageClock:
+    """Tempo acumulado por etapa, seguro entre as threads do pipeline."""
+
+    def __init__(self):
+        self.seconds = {}
+        self._lock = threading.Lock()
+
+    def wrap(self, name: str, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.seconds[name] = self.seconds.get(name, 0.0) + elapsed
+        return timed
+
+
+def _rss_mb() -> float:
+    """Pico de RSS do processo em MB (ru_maxrss e em KB no Linux)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_config_worker(video_path: str, config_name: str, early_stop: bool = False):
+    """
+    Corpo do processo de uma execucao: carrega e aquece o modelo, instrumenta
+    as etapas de regiao e realce e roda `processar_video_xray` uma vez.
+    """
+    # Mensagens do processamento vao para o stderr; o stdout leva apenas o JSON
+    output = sys.stdout
+    sys.stdout = sys.stderr
+
+    import gravar_e_transcrever as video
+    from xray_classifier import IMAGE_SIZE, get_classifier
+
+    classifier = get_classifier()
+    classifier.classify_batch(np.zeros((1, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32))
+    rss_model_mb = _rss_mb()
+
+    clock = _StageClock()
+    video.XRayRegionTracker.locate = clock.wrap('region', video.XRayRegionTracker.locate)
+    video.prepare_frame = clock.wrap('enhance', video.prepare_frame)
+
+    start = time.perf_counter()
+    result = video.processar_video_xray(
+        video_path,
+        full_scan=not early_stop,
+        segments=1,
+        **CONFIGS[config_name]
+    )
+    wall_s = time.perf_counter() - start
+
+    if not result.get('success'):
+        raise RuntimeError(result.get('error', 'falha no processamento'))
+
+    sampling = result['sampling']
+    stages = (result.get('pipeline') or {}).get('stages', {})
+    row = {
+        'config': config_name,
+        'sampling_mode': sampling['mode'],
+        'frames_video': result['total_frames_video'],
+        'frames_decoded': sampling['frames_decoded'],
+        'frames_classified': result['total_frames_analyzed'],
+        'wall_s': round(wall_s, 3),
+        'video_fps': round(result['total_frames_video'] / wall_s, 1),
+        'decoded_fps': round(sampling['frames_decoded'] / wall_s, 1),
+        'classified_fps': round(result['total_frames_analyzed'] / wall_s, 1),
+        'decode_s': stages.get('decode', {}).get('busy_s'),
+        'region_s': round(clock.seconds.get('region', 0.0), 3),
+        'enhance_s': round(clock.seconds.get('enhance', 0.0), 3),
+        'inference_s': stages.get('inference', {}).get('busy_s'),
+        'rss_model_mb': rss_model_mb,
+        'rss_peak_mb': _rss_mb(),
+        'class_name': result['final_classification']['class_name'],
+        'region_tracking': result['region_tracking'],
+        'early_stop': result['early_stop']['stopped']
+    }
+    output.write(json.dumps(row) + '\n')
+    output.flush()
+
+
+def _run_command(video_path: str, config_name: str, early_stop: bool) -> list:
+    command = [sys.executable, os.path.abspath(__file__), 'run',
+               '--video', str(video_path), '--config', config_name]
+    if early_stop:
+        command.append('--early-stop')
+    return command
+
+
+def run_config(video_path: str, config_name: str, early_stop: bool = False) -> dict:
+    """Executa uma configuracao em um processo novo e retorna a linha do relatorio."""
+    env = dict(os.environ)
+    env['TF_CPP_MIN_LOG_LEVEL'] = '2'
+    completed = subprocess.run(_run_command(video_path, config_name, early_stop), env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        raise RuntimeError(f"execucao {config_name} falhou (codigo {completed.returncode})")
+    return json.loads(lines[-1])
+
+
+# ================================================================================
+# RELATORIO
+# ================================================================================
+
+def _row_key(row: dict) -> tuple:
+    return row['video'], row['config']
+
+
+def compare_with_baseline(rows: list, baseline: list, tolerance: float) -> list:
+    """
+    Compara vazao e pico de RSS com o baseline.
+
+    Returns:
+        list: Regressoes alem da tolerancia relativa.
+    """
+    reference = {_row_key(row): row for row in baseline}
+    regressions = []
+
+    for row in rows:
+        base = reference.get(_row_key(row))
+        if base is None:
+            continue
+        changes = {}
+        for field, higher_is_better in COMPARED_METRICS.items():
+            current, previous = float(row[field]), float(base[field])
+            if not previous:
+                continue
+            change = (current - previous) / previous
+            changes[field] = round(change, 4)
+            worse = -change if higher_is_better else change
+            if worse > tolerance:
+                regressions.append({'key': _row_key(row), 'field': field,
+                                    'baseline': previous, 'current': current, 'change': change})
+        row['baseline_change'] = changes
+
+    return regressions
+
+
+def _format(value, width: int, digits: int = 2) -> str:
+    return f"{value:>{width}.{digits}f}" if isinstance(value, (int, float)) else f"{'-':>{width}}"
+
+
+def print_rows(rows: list):
+    """Exibe o relatorio em formato de tabela."""
+    print("\n" + "=" * 132)
+    print(f"{'Video':<22} {'Config':<14} {'Classif':>7} {'Tempo s':>8} {'video/s':>8} "
+          f"{'classif/s':>9} {'decod s':>8} {'regiao s':>8} {'realce s':>8} {'infer s':>8} "
+          f"{'RSS MB':>7} {'vs base':>16}")
+    print("=" * 132)
+    for row in rows:
+        change = row.get('baseline_change', {}).get('classified_fps')
+        change = f"{change * 100:+.1f}% classif/s" if change is not None else ''
+        print(f"{row['video']:<22} {row['config']:<14} {row['frames_classified']:>7} "
+              f"{_format(row['wall_s'], 8)} {_format(row['video_fps'], 8, 1)} "
+              f"{_format(row['classified_fps'], 9, 1)} {_format(row['decode_s'], 8)} "
+              f"{_format(row['region_s'], 8)} {_format(row['enhance_s'], 8)} "
+              f"{_format(row['inference_s'], 8)} {_format(row['rss_peak_mb'], 7, 0)} {change:>16}")
+    print("=" * 132)
+
+
+def write_csv(rows: list, path: str):
+    with open(path, 'w', newline='') as handle:
+        writer = csv.DictWriter(handle, fieldnames=REPORT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def available_configs() -> list:
+    """Configuracoes executaveis aqui (as de ffmpeg exigem o executavel no PATH)."""
+    from video_ffmpeg import find_ffmpeg
+    return [name for name in CONFIGS if not name.startswith('ffmpeg') or find_ffmpeg()]
+
+
+if __name__ == "__main__":
+    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+    parser = argparse.ArgumentParser(description="Benchmark do processamento de video")
+    subparsers = parser.add_subparsers(dest='command')
+
+    run = subparsers.add_parser('run', help=argparse.SUPPRESS)
+    run.add_argument('--video', required=True)
+    run.add_argument('--config', required=True, choices=tuple(CONFIGS))
+    run.add_argument('--early-stop', action='store_true')
+
+    parser.add_argument('--seconds', type=float, default=60, help='Duracao de cada video')
+    parser.add_argument('--fps', type=float, default=30)
+    parser.add_argument('--resolution', default='1280x720', help='Resolucao (LxA)')
+    parser.add_argument('--static-seconds', type=float, default=7,
+                        help='Tempo de cada radiografia na tela')
+    parser.add_argument('--placements', nargs='+', choices=PLACEMENTS, default=['center'])
+    parser.add_argument('--configs', nargs='+', choices=tuple(CONFIGS),
+                        help='Padrao: todas as disponiveis')
+    parser.add_argument('--early-stop', action='store_true',
+                        help='Manter a parada antecipada (padrao: video inteiro)')
+    parser.add_argument('--videos-dir', help='Onde gravar os videos (padrao: temporario)')
+    parser.add_argument('--output', default='benchmark_video_report.json')
+    parser.add_argument('--csv', help='Salvar tambem em CSV')
+    parser.add_argument('--baseline', help='Relatorio JSON de referencia para comparacao')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Piora relativa tolerada antes de acusar regressao')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    parser.add_argument('--save-baseline', help='Salvar este relatorio como baseline')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        run_config_worker(args.video, args.config, args.early_stop)
+        sys.exit(0)
+
+    width, height = (int(v) for v in args.resolution.lower().split('x'))
+    videos_dir = Path(args.videos_dir or tempfile.mkdtemp(prefix='benchmark_video_'))
+    videos_dir.mkdir(parents=True, exist_ok=True)
+    configs = args.configs or available_configs()
+
+    rows = []
+    videos = []
+    try:
+        for placement in args.placements:
+            name = f"{placement}_{width}x{height}_{args.seconds:g}s"
+            path = videos_dir / f"{name}.mp4"
+            print(f"🎞️  Gerando {path}...")
+            videos.append(generate_screen_recording(
+                path, args.seconds, args.fps, (width, height), args.static_seconds, placement
+            ))
+
+            for config_name in configs:
+                print(f"⏱️  {name} / {config_name}...")
+                row = run_config(path, config_name, args.early_stop)
+                row['video'] = name
+                rows.append(row)
+    finally:
+        if not args.videos_dir:
+            shutil.rmtree(videos_dir, ignore_errors=True)
+
+    regressions = []
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare_with_baseline(rows, baseline['results'], args.tolerance)
+
+    print_rows(rows)
+
+    report = {'environment': environment_info(), 'videos': videos, 'results': rows,
+              'regressions': regressions}
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"Relatorio salvo em {args.output}")
+    if args.csv:
+        write_csv(rows, args.csv)
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(report, indent=2))
+        print(f"Baseline salvo em {args.save_baseline}")
+
+    for regression in regressions:
+        print(f"⚠️  Regressao {regression['key']}: {regression['field']} "
+              f"{regression['baseline']:.2f} -> {regression['current']:.2f} "
+              f"({regression['change'] * 100:+.1f}%)")
+
+    sys.exit(1 if regressions and args.fail_on_regression else 0)
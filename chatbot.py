@@ -1,5 +1,4 @@
-from flask import Flask, render_template, request, jsonify
-from PIL import Image
+from flask import Flask, render_template, request, jsonify, Response
 import threading
 from openai import OpenAI
 import wave
@@ -9,10 +8,11 @@ import os
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
 import base64
-from io import BytesIO
+import hashlib
 import time
 import atexit
 import uuid
+import queue
 import logging
 
 # LangChain (stack moderno)
@@ -33,18 +33,28 @@ from config import (
     ALLOWED_IMAGE_EXTENSIONS,
     get_feature_status,
     is_feature_enabled,
-    IS_DOCKER  # Adicionar detecção de Docker
+    IS_DOCKER,  # Adicionar detecção de Docker
+    VIDEO_JOBS_ENABLED,
+    VIDEO_CACHE_ENABLED,
+    VIDEO_CACHE_MAX_ENTRIES,
+    VIDEO_CACHE_TTL_SECONDS,
+    VIDEO_CACHE_SQLITE_PATH
 )
 
 # Importar classificador de raio-X
-from xray_classifier import get_classifier
+from xray_classifier import get_classifier, model_fingerprint
+from xray_pipeline import analyze_xray
+from image_ingestion import ingest_image, ImageIngestionError
+from result_cache import ResultCache, save_stream_with_hash
 
 # Importar processamento de vídeo
 from gravar_e_transcrever import (
     processar_video_xray,
     allowed_video_file,
+    video_result_settings,
     ALLOWED_VIDEO_EXTENSIONS
 )
+from video_jobs import get_job_manager, start_worker_pool, stop_worker_pool, STATUS_DONE, STATUS_FAILED
 
 
 # Configuração de logging
@@ -347,8 +357,14 @@ def upload_xray():
         }), 400
 
     try:
-        # Carregar imagem com PIL
-        image = Image.open(file.stream)
+        # Decodificar uma única vez: miniatura para o Vision + tensor do modelo
+        try:
+            ingested = ingest_image(file.stream)
+        except ImageIngestionError as e:
+            return jsonify({
+                'error': 'Imagem inválida',
+                'message': str(e)
+            }), 400
 
         # Obter classificador (singleton)
         classifier = get_classifier()
@@ -359,27 +375,29 @@ def upload_xray():
                 'message': 'O modelo de classificação de raio-X não foi carregado.'
             }), 500
 
-        # Verificar se é uma imagem de raio-X usando GPT-4o Vision
-        is_xray = classifier.is_xray_image(image)
+        # Chaves de cache pelo conteúdo: re-uploads da mesma imagem reaproveitam resultados
+        cache_keys = classifier.get_cache_keys(ingested.image)
+
+        # Verificação, classificação e busca RAG em pipeline especulativo:
+        # a busca da classe detectada corre enquanto o veredito do Vision é aguardado
+        analysis = analyze_xray(
+            classifier, ingested, chatbot.get_ragsaude_response, cache_keys=cache_keys
+        )
+        result = analysis['classification']
 
-        if not is_xray:
+        if not analysis['is_xray']:
             return jsonify({
                 'type': 'not_xray',
                 'content': 'A imagem enviada não parece ser um raio-X de tórax. Por favor, envie uma radiografia de tórax válida.'
             })
 
-        # Classificar o raio-X
-        result = classifier.classify(image)
-
         if not result['success']:
             return jsonify({
                 'error': 'Falha na classificação',
                 'message': result.get('error', 'Erro desconhecido')
             }), 500
 
-        # Buscar informações de saúde no ChromaDB
-        disease_query = classifier.get_disease_query(result['class_name'])
-        health_info = chatbot.get_ragsaude_response(disease_query)
+        health_info = analysis['health_info']
         health_content = health_info.get('content', '') if isinstance(health_info, dict) else str(health_info)
 
         # Armazenar contexto para follow-up
@@ -429,15 +447,38 @@ def upload_video():
         }), 400
 
     try:
-        # Salvar vídeo temporariamente
+        # Salvar vídeo temporariamente (SHA-256 calculado durante a gravação)
         filename = secure_filename(video_file.filename)
         video_path = UPLOAD_FOLDER / f"{uuid.uuid4()}_{filename}"
-        video_file.save(str(video_path))
+        video_hash = save_stream_with_hash(video_file.stream, video_path)
+
+        # Campo opcional full_scan=true desativa a parada antecipada
+        full_scan = request.form.get('full_scan', 'false').lower() == 'true'
+
+        # Mesmo vídeo já analisado: resposta completa do cache
+        cache_key = video_cache_key(video_hash, full_scan)
+        cached = get_cached_video_response(cache_key)
+        if cached is not None:
+            video_path.unlink(missing_ok=True)
+            return jsonify(cached)
+
+        if VIDEO_JOBS_ENABLED:
+            # Analise em segundo plano: retorna o id do job imediatamente
+            job_id = get_job_manager().submit(
+                str(video_path), {'full_scan': full_scan, 'cache_key': cache_key}
+            )
+            return jsonify({
+                'type': 'video_job',
+                'job_id': job_id,
+                'status': 'queued',
+                'status_url': f'/video_jobs/{job_id}',
+                'result_url': f'/video_jobs/{job_id}/result'
+            }), 202
 
         logger.info(f"Processando vídeo: {video_path}")
 
         # ADAPTADO: Processar SEM exibir janela (show_window=False)
-        result = processar_video_xray(str(video_path), show_window=False)
+        result = processar_video_xray(str(video_path), show_window=False, full_scan=full_scan)
 
         # Limpar arquivo temporário
         if video_path.exists():
@@ -448,50 +489,275 @@ def upload_video():
                 'error': result.get('error', 'Erro desconhecido ao processar vídeo')
             }), 500
 
-        # Extrair classificacao final (agregada)
-        final_classification = result['final_classification']
+        return jsonify(build_video_response(result, cache_key=cache_key))
 
-        # Buscar informacoes de saude no ChromaDB (mesmo padrao do /upload_xray)
-        disease_query = get_classifier().get_disease_query(final_classification['class_name'])
-        health_info = chatbot.get_ragsaude_response(disease_query)
-        health_content = health_info.get('content', '') if isinstance(health_info, dict) else str(health_info)
+    except Exception as e:
+        logger.error(f"Erro ao processar vídeo: {e}")
+        return jsonify({
+            'error': 'Erro ao processar vídeo',
+            'message': str(e)
+        }), 500
 
-        # Armazenar contexto para follow-up (mesmo padrao do /upload_xray)
-        chatbot.last_xray_result = {
-            'classification': final_classification,
-            'health_info': health_content,
-            'timestamp': time.time()
-        }
-        chatbot.last_xray_timestamp = time.time()
+# Cache de respostas de vídeo, enderecado pelo SHA-256 do arquivo enviado
+video_cache = ResultCache(
+    max_entries=VIDEO_CACHE_MAX_ENTRIES,
+    ttl_seconds=VIDEO_CACHE_TTL_SECONDS,
+    sqlite_path=VIDEO_CACHE_SQLITE_PATH or None,
+    name='video'
+) if VIDEO_CACHE_ENABLED else None
 
-        # Adicionar ao historico do chat
-        chatbot.chat_history.append(
-            f"[Video Raio-X Analisado]: {final_classification['class_name']} "
-            f"({final_classification['confidence']*100:.1f}% confianca, "
-            f"{result['total_frames_analyzed']} frames analisados)"
-        )
+def video_cache_key(video_hash, full_scan):
+    """
+    Chave do cache de vídeo: conteúdo do arquivo + tudo o que muda o resultado
+    (opção da requisição, artefatos do modelo e configurações da análise).
+    """
+    settings = {
+        'full_scan': full_scan,
+        'model': model_fingerprint(),
+        'video': video_result_settings()
+    }
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+    return f"vid:{video_hash}:{digest}"
+
+def get_cached_video_response(cache_key):
+    """Resposta em cache de um vídeo já analisado (registra o contexto no chatbot), ou None."""
+    if video_cache is None:
+        return None
+    response = video_cache.get(cache_key)
+    if response is None:
+        return None
+
+    logger.info(f"Vídeo já analisado, resposta do cache: {cache_key}")
+    remember_video_response(response)
+    return {**response, 'cached': True}
+
+def remember_video_response(response):
+    """Registra o resultado do vídeo no contexto do chatbot (follow-up e histórico)."""
+    final_classification = response['classification']
+
+    # Armazenar contexto para follow-up (mesmo padrao do /upload_xray)
+    chatbot.last_xray_result = {
+        'classification': final_classification,
+        'health_info': response['health_info'],
+        'timestamp': time.time()
+    }
+    chatbot.last_xray_timestamp = time.time()
+
+    # Adicionar ao historico do chat
+    chatbot.chat_history.append(
+        f"[Video Raio-X Analisado]: {final_classification['class_name']} "
+        f"({final_classification['confidence']*100:.1f}% confianca, "
+        f"{response['stats']['total_frames_analyzed']} frames analisados)"
+    )
+
+    logging.info(
+        f"Video raio-X classificado: {final_classification['class_name']} "
+        f"({final_classification['confidence']*100:.1f}%) - "
+        f"{response['stats']['total_frames_analyzed']} frames"
+    )
+
+def build_video_response(result, cache_key=None):
+    """Monta a resposta da analise de video, registra o contexto no chatbot e a guarda no cache."""
+    # Extrair classificacao final (agregada)
+    final_classification = result['final_classification']
+
+    # Buscar informacoes de saude no ChromaDB (mesmo padrao do /upload_xray)
+    disease_query = get_classifier().get_disease_query(final_classification['class_name'])
+    health_info = chatbot.get_ragsaude_response(disease_query)
+    health_content = health_info.get('content', '') if isinstance(health_info, dict) else str(health_info)
+
+    response = {
+        'type': 'video_xray',
+        'classification': result['final_classification'],
+        'health_info': health_content,
+        'stats': {
+            'total_frames_analyzed': result['total_frames_analyzed'],
+            'total_frames_reliable': result['total_frames_reliable'],
+            'total_frames_video': result['total_frames_video'],
+            'fps': result['fps'],
+            'classification_counts': result['classification_counts'],
+            'early_stop': result['early_stop']
+        },
+        'content': f"# Análise de Vídeo Concluída\\n\\n..."  # Igual ao original
+    }
+    remember_video_response(response)
+
+    if cache_key and video_cache is not None:
+        video_cache.set(cache_key, response)
+    return response
+
+# Intervalo sem eventos apos o qual o stream envia um comentario de keep-alive
+# (mantem proxies abertos e detecta clientes desconectados durante trechos estaticos)
+VIDEO_STREAM_KEEPALIVE_SECONDS = 15
+
+def sse_event(event, data):
+    """Formata um evento server-sent events com payload JSON."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/upload_video/stream', methods=['POST'])
+def upload_video_stream():
+    """
+    Variante em streaming do /upload_video (text/event-stream).
 
-        logging.info(
-            f"Video raio-X classificado: {final_classification['class_name']} "
-            f"({final_classification['confidence']*100:.1f}%) - "
-            f"{result['total_frames_analyzed']} frames"
-        )
+    Eventos:
+        frame  - resultado de cada frame classificado e votacao ponderada parcial
+        result - resposta agregada final (mesmo formato do /upload_video)
+        error  - falha na analise
+
+    Se o cliente desconectar, a analise e cancelada e a decodificacao para.
+    """
+    global session_question_count
+    session_question_count += 1
+
+    if 'video' not in request.files:
+        return jsonify({'error': 'Nenhum vídeo fornecido'}), 400
 
+    video_file = request.files['video']
+
+    if video_file.filename == '':
+        return jsonify({'error': 'Nome de arquivo vazio'}), 400
+
+    if not allowed_video_file(video_file.filename):
         return jsonify({
-            'type': 'video_xray',
-            'classification': result['final_classification'],
-            'stats': {
-                'total_frames_analyzed': result['total_frames_analyzed'],
-                'total_frames_reliable': result['total_frames_reliable'],
-                'total_frames_video': result['total_frames_video'],
-                'fps': result['fps'],
-                'classification_counts': result['classification_counts']
-            },
-            'content': f"# Análise de Vídeo Concluída\\n\\n..."  # Igual ao original
-        })
+            'error': f'Formato de vídeo não suportado. Use: {", ".join(ALLOWED_VIDEO_EXTENSIONS)}'
+        }), 400
+
+    filename = secure_filename(video_file.filename)
+    video_path = UPLOAD_FOLDER / f"{uuid.uuid4()}_{filename}"
+    video_hash = save_stream_with_hash(video_file.stream, video_path)
+
+    full_scan = request.form.get('full_scan', 'false').lower() == 'true'
+
+    cache_key = video_cache_key(video_hash, full_scan)
+    cached = get_cached_video_response(cache_key)
+    if cached is not None:
+        video_path.unlink(missing_ok=True)
+        return Response(sse_event('result', cached), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache'})
+
+    events = queue.Queue()
+    cancel_event = threading.Event()
+    started = threading.Event()
+
+    def analyze():
+        """Roda a analise fora do gerador; os eventos chegam pela fila."""
+        try:
+            result = processar_video_xray(
+                str(video_path),
+                show_window=False,
+                full_scan=full_scan,
+                progress_callback=lambda progress: events.put(('frame', progress)),
+                cancel_event=cancel_event
+            )
+            events.put(('done', result))
+        except Exception as e:
+            events.put(('done', {'success': False, 'error': str(e)}))
+        finally:
+            if video_path.exists():
+                video_path.unlink()
+
+    def generate():
+        started.set()
+        logger.info(f"Processando vídeo (stream): {video_path}")
+        worker = threading.Thread(target=analyze, name='video-stream', daemon=True)
+        worker.start()
+        try:
+            while True:
+                try:
+                    kind, payload = events.get(timeout=VIDEO_STREAM_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                if kind == 'frame':
+                    yield sse_event('frame', payload)
+                    continue
+
+                if not payload.get('success'):
+                    yield sse_event('error', {
+                        'error': payload.get('error', 'Erro desconhecido ao processar vídeo')
+                    })
+                else:
+                    yield sse_event('result', build_video_response(payload, cache_key=cache_key))
+                return
+        except Exception as e:
+            logger.error(f"Erro ao processar vídeo (stream): {e}")
+            yield sse_event('error', {'error': 'Erro ao processar vídeo', 'message': str(e)})
+        finally:
+            # Cliente desconectado (GeneratorExit) ou fim do stream: para a decodificacao
+            if worker.is_alive():
+                logger.info(f"Stream de vídeo encerrado pelo cliente, cancelando: {video_path}")
+            cancel_event.set()
+
+    def on_close():
+        # Resposta fechada sem o gerador ter rodado (cliente saiu antes do
+        # primeiro chunk): o worker nunca vai apagar o upload
+        cancel_event.set()
+        if not started.is_set():
+            video_path.unlink(missing_ok=True)
+
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    response.call_on_close(on_close)
+    return response
+
+# Resposta de cada job montada uma unica vez (RAG + historico do chat)
+video_job_response_lock = threading.Lock()
+
+@app.route('/video_jobs/<job_id>', methods=['GET'])
+def video_job_status(job_id):
+    """Status e progresso (frames classificados, votacao parcial) de um job de vídeo."""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job não encontrado'}), 404
+
+    return jsonify({
+        'job_id': job_id,
+        'status': job['status'],
+        'progress': job['progress'],
+        'error': job['error'],
+        'attempts': job['attempts'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'result_url': f'/video_jobs/{job_id}/result'
+    })
+
+@app.route('/video_jobs/<job_id>/result', methods=['GET'])
+def video_job_result(job_id):
+    """Resultado final (mesmo formato do /upload_video síncrono); 202 enquanto processa."""
+    manager = get_job_manager()
+    job = manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job não encontrado'}), 404
+
+    if job['status'] == STATUS_FAILED:
+        return jsonify({
+            'error': 'Erro ao processar vídeo',
+            'message': job['error']
+        }), 500
+
+    if job['status'] != STATUS_DONE:
+        return jsonify({
+            'job_id': job_id,
+            'status': job['status'],
+            'progress': job['progress']
+        }), 202
+
+    try:
+        with video_job_response_lock:
+            response = manager.get(job_id)['response']
+            if response is None:
+                response = build_video_response(
+                    job['result'], cache_key=job['options'].get('cache_key')
+                )
+                manager.store.set_response(job_id, response)
+        return jsonify(response)
 
     except Exception as e:
-        logger.error(f"Erro ao processar vídeo: {e}")
+        logger.error(f"Erro ao montar resultado do job {job_id}: {e}")
         return jsonify({
             'error': 'Erro ao processar vídeo',
             'message': str(e)
@@ -678,10 +944,20 @@ def api_features():
     """
     return jsonify(get_feature_status())
 
+@app.route('/api/inference_stats', methods=['GET'])
+def api_inference_stats():
+    """
+    Retorna estatísticas de inferência do classificador de raio-X
+    (histogramas de tamanho de lote e de espera na fila do micro-batching)
+    """
+    return jsonify(get_classifier().get_inference_stats())
+
 def cleanup_on_exit():
     """Cleanup function called on program exit"""
     logger.info("Shutting down...")
     chatbot.cleanup()
+    if VIDEO_JOBS_ENABLED:
+        stop_worker_pool()
 
 # Instância global do chatbot (ANTES do atexit.register)
 chatbot = ChatBot()
@@ -700,6 +976,11 @@ if __name__ == '__main__':
         logger.info("✅ Modelo carregado com sucesso!")
     else:
         logger.error("❌ AVISO: Modelo não foi carregado!")
+
+    # Pool de workers de vídeo (no Gunicorn, iniciado pelo master em gunicorn.conf.py);
+    # retoma os jobs pendentes de antes do reinício
+    if VIDEO_JOBS_ENABLED:
+        start_worker_pool()
     
     # Rodar aplicação
     logger.info(f"Iniciando servidor em {FLASK_HOST}:{FLASK_PORT}")
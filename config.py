@@ -108,6 +108,12 @@ ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
 ALLOWED_VIDEO_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'wmv', 'webm'}
 ALLOWED_AUDIO_EXTENSIONS = {'wav', 'mp3', 'ogg', 'webm', 'm4a'}
 
+# Limite de resolucao de imagens (validado pelo cabecalho, antes de decodificar)
+XRAY_MAX_IMAGE_PIXELS = int(os.getenv('XRAY_MAX_IMAGE_PIXELS', 50_000_000))
+# Miniatura enviada ao GPT-4o Vision (lado maximo em pixels e qualidade JPEG)
+XRAY_VISION_THUMBNAIL_SIZE = int(os.getenv('XRAY_VISION_THUMBNAIL_SIZE', 512))
+XRAY_VISION_THUMBNAIL_QUALITY = int(os.getenv('XRAY_VISION_THUMBNAIL_QUALITY', 85))
+
 # ================================================================================
 # ÁUDIO CONFIGURAÇÕES
 # ================================================================================
@@ -129,6 +135,114 @@ CLASS_LABELS = {
     3: 'Pneumonia Bacteriana'
 }
 
+# Micro-batching: agrupa chamadas concorrentes de classify em um unico forward pass
+XRAY_BATCHING_ENABLED = os.getenv('XRAY_BATCHING_ENABLED', 'true').lower() == 'true'
+XRAY_MAX_BATCH_SIZE = int(os.getenv('XRAY_MAX_BATCH_SIZE', 8))
+XRAY_MAX_BATCH_WAIT_MS = float(os.getenv('XRAY_MAX_BATCH_WAIT_MS', 5))
+# Espera maxima de uma chamada pelo resultado do lote (evita threads presas)
+XRAY_BATCH_TIMEOUT_SECONDS = float(os.getenv('XRAY_BATCH_TIMEOUT_SECONDS', 30))
+
+# Modo de inferencia: 'compiled' (tf.function com assinatura fixa) ou 'predict' (model.predict)
+XRAY_INFERENCE_MODE = os.getenv('XRAY_INFERENCE_MODE', 'compiled').lower()
+# Compilar a funcao de inferencia com XLA (jit_compile)
+XRAY_JIT_COMPILE = os.getenv('XRAY_JIT_COMPILE', 'false').lower() == 'true'
+
+# Threads do runtime de inferencia (0 = padrao do runtime, todos os nucleos do host)
+# Com varios workers em poucos CPUs, limite para evitar disputa entre processos
+XRAY_INTRA_OP_THREADS = int(os.getenv('XRAY_INTRA_OP_THREADS', 0))
+XRAY_INTER_OP_THREADS = int(os.getenv('XRAY_INTER_OP_THREADS', 0))
+
+# Perfil de runtime gerado por `python autotune.py` (backend, threads e lote).
+# Variaveis de ambiente definidas explicitamente tem precedencia sobre o perfil
+XRAY_RUNTIME_PROFILE_ENABLED = os.getenv('XRAY_RUNTIME_PROFILE_ENABLED', 'true').lower() == 'true'
+XRAY_RUNTIME_PROFILE_PATH = Path(os.getenv('XRAY_RUNTIME_PROFILE_PATH', MODEL_PATH.parent / 'runtime_profile.json'))
+
+# Backend de inferencia: 'keras' (TensorFlow completo), 'onnx' (ONNX Runtime) ou 'tflite'
+# Gere os arquivos exportados com: python convert_model.py convert
+XRAY_BACKEND = os.getenv('XRAY_BACKEND', 'keras').lower()
+XRAY_ONNX_MODEL_PATH = Path(os.getenv('XRAY_ONNX_MODEL_PATH', MODEL_PATH.with_suffix('.onnx')))
+XRAY_TFLITE_MODEL_PATH = Path(os.getenv('XRAY_TFLITE_MODEL_PATH', MODEL_PATH.with_suffix('.tflite')))
+
+# Artefato de carregamento rapido do modelo Keras (pesos sem compressao, mmap)
+# Gere com: python fast_model.py build; ausente, o .keras e carregado normalmente
+XRAY_FAST_MODEL_ENABLED = os.getenv('XRAY_FAST_MODEL_ENABLED', 'true').lower() == 'true'
+XRAY_FAST_MODEL_PATH = Path(os.getenv('XRAY_FAST_MODEL_PATH', MODEL_PATH.with_suffix('.fastload')))
+
+# Gate local de out-of-distribution (features penultimas + Mahalanobis)
+# Ajuste offline com: python ood_gate.py fit --xray-dir <pasta_raio_x>
+XRAY_OOD_GATE_ENABLED = os.getenv('XRAY_OOD_GATE_ENABLED', 'true').lower() == 'true'
+XRAY_OOD_GATE_PATH = Path(os.getenv('XRAY_OOD_GATE_PATH', MODEL_PATH.parent / 'ood_gate.npz'))
+
+# Pipeline especulativo do /upload_xray: Vision, classificacao e RAG em paralelo
+XRAY_SPECULATIVE_PIPELINE = os.getenv('XRAY_SPECULATIVE_PIPELINE', 'true').lower() == 'true'
+XRAY_PIPELINE_WORKERS = int(os.getenv('XRAY_PIPELINE_WORKERS', 8))
+
+# Servidor de modelo compartilhado (model_server.py): com o socket definido,
+# os workers do Gunicorn nao carregam o modelo e enviam os tensores ao servidor
+XRAY_MODEL_SERVER_SOCKET = os.getenv('XRAY_MODEL_SERVER_SOCKET', '')
+XRAY_MODEL_SERVER_TIMEOUT = float(os.getenv('XRAY_MODEL_SERVER_TIMEOUT', 30))
+
+# ================================================================================
+# VÍDEO CONFIGURAÇÕES
+# ================================================================================
+
+# Frames amostrados acumulados por forward pass em processar_video_xray
+VIDEO_BATCH_SIZE = int(os.getenv('VIDEO_BATCH_SIZE', 16))
+
+# Amostragem de frames: 'grab' (decodifica so os amostrados), 'seek' (posiciona
+# direto nos amostrados), 'keyframes' (varredura rapida, videos longos) ou
+# 'ffmpeg' (decodificacao pelo ffmpeg com amostragem, reducao para no maximo
+# VIDEO_FFMPEG_WIDTH de largura e cinza dentro do decodificador)
+VIDEO_SAMPLING_MODE = os.getenv('VIDEO_SAMPLING_MODE', 'grab').lower()
+VIDEO_FFMPEG_WIDTH = int(os.getenv('VIDEO_FFMPEG_WIDTH', 640))
+
+# Pipeline decodificacao -> pre-processamento -> inferencia: threads de
+# pre-processamento e limite de frames em voo (backpressure)
+VIDEO_PREPROCESS_WORKERS = int(os.getenv('VIDEO_PREPROCESS_WORKERS', min(4, os.cpu_count() or 1)))
+VIDEO_PIPELINE_MAX_IN_FLIGHT = int(os.getenv('VIDEO_PIPELINE_MAX_IN_FLIGHT', 32))
+
+# Deteccao de mudanca: frames iguais ao ultimo classificado reaproveitam o
+# resultado anterior, e a amostragem fica mais densa quando o conteudo muda
+# e mais esparsa (ate VIDEO_MAX_SAMPLING_FACTOR x o intervalo) quando parado.
+# Desligada por padrao: acelera gravacoes de tela, mas frames que mudam pouco
+# (abaixo de VIDEO_CHANGE_THRESHOLD) herdam a classificacao do anterior e o
+# intervalo adaptativo pode pular trechos curtos; ligar apos validar a acuracia
+VIDEO_CHANGE_DETECTION = os.getenv('VIDEO_CHANGE_DETECTION', 'false').lower() == 'true'
+VIDEO_CHANGE_THRESHOLD = float(os.getenv('VIDEO_CHANGE_THRESHOLD', 3.0))
+VIDEO_MAX_SAMPLING_FACTOR = int(os.getenv('VIDEO_MAX_SAMPLING_FACTOR', 4))
+
+# Parada antecipada: encerra a analise quando a margem entre as duas classes
+# mais votadas e estatisticamente segura (limite inferior de ~99% acima de
+# VIDEO_EARLY_STOP_MARGIN) e os ultimos frames concordam.
+# Desligada por padrao: o restante do video nao e visto, entao um achado que
+# so aparece no final (ou frames correlacionados, que inflam a confianca)
+# pode mudar o resultado em relacao a varredura completa
+VIDEO_EARLY_STOP = os.getenv('VIDEO_EARLY_STOP', 'false').lower() == 'true'
+VIDEO_EARLY_STOP_MIN_FRAMES = int(os.getenv('VIDEO_EARLY_STOP_MIN_FRAMES', 8))
+VIDEO_EARLY_STOP_MARGIN = float(os.getenv('VIDEO_EARLY_STOP_MARGIN', 0.2))
+VIDEO_EARLY_STOP_CONSISTENT_FRAMES = int(os.getenv('VIDEO_EARLY_STOP_CONSISTENT_FRAMES', 5))
+
+# Segmentos paralelos: o video e dividido em trechos de tempo, cada um analisado
+# em um processo proprio (0 = um por nucleo utilizavel; 1 = desativado). Trechos
+# menores que VIDEO_SEGMENT_MIN_SECONDS nao compensam o carregamento do modelo
+VIDEO_SEGMENTS = int(os.getenv('VIDEO_SEGMENTS', 1))
+VIDEO_SEGMENT_MIN_SECONDS = float(os.getenv('VIDEO_SEGMENT_MIN_SECONDS', 60))
+
+# Jobs assincronos: /upload_video enfileira a analise e retorna o id do job;
+# VIDEO_JOB_WORKERS processos por container (iniciados uma vez, pelo master do
+# Gunicorn ou pelo `python chatbot.py`) processam os videos
+VIDEO_JOBS_ENABLED = os.getenv('VIDEO_JOBS_ENABLED', 'true').lower() == 'true'
+VIDEO_JOB_WORKERS = int(os.getenv('VIDEO_JOB_WORKERS', 1))
+VIDEO_JOBS_DB_PATH = Path(os.getenv('VIDEO_JOBS_DB_PATH', UPLOAD_FOLDER / 'video_jobs.sqlite3'))
+VIDEO_JOB_PROGRESS_INTERVAL = float(os.getenv('VIDEO_JOB_PROGRESS_INTERVAL', 1.0))
+VIDEO_JOB_STALE_SECONDS = int(os.getenv('VIDEO_JOB_STALE_SECONDS', 600))
+VIDEO_JOB_MAX_ATTEMPTS = int(os.getenv('VIDEO_JOB_MAX_ATTEMPTS', 2))
+# Workers que morrem sao reiniciados apos VIDEO_JOB_RESTART_BACKOFF segundos,
+# dobrando a cada queda seguida, ate VIDEO_JOB_MAX_RESTARTS quedas seguidas
+VIDEO_JOB_MAX_RESTARTS = int(os.getenv('VIDEO_JOB_MAX_RESTARTS', 5))
+VIDEO_JOB_RESTART_BACKOFF = float(os.getenv('VIDEO_JOB_RESTART_BACKOFF', 5.0))
+VIDEO_JOB_TTL_SECONDS = int(os.getenv('VIDEO_JOB_TTL_SECONDS', 86400))
+
 # ================================================================================
 # CHROMADB / RAG CONFIGURAÇÕES
 # ================================================================================
@@ -183,6 +297,27 @@ CORS_ORIGINS = os.getenv('CORS_ORIGINS', '*').split(',')
 ENABLE_EMBEDDING_CACHE = os.getenv('ENABLE_EMBEDDING_CACHE', 'true').lower() == 'true'
 CACHE_TTL_SECONDS = int(os.getenv('CACHE_TTL_SECONDS', 3600))  # 1 hora
 
+# Cache de resultados de raio-X (veredito do GPT-4o Vision + classificação),
+# enderecado pelo hash dos pixels decodificados
+XRAY_CACHE_ENABLED = os.getenv('XRAY_CACHE_ENABLED', 'true').lower() == 'true'
+XRAY_CACHE_MAX_ENTRIES = int(os.getenv('XRAY_CACHE_MAX_ENTRIES', 512))
+XRAY_CACHE_TTL_SECONDS = int(os.getenv('XRAY_CACHE_TTL_SECONDS', CACHE_TTL_SECONDS))
+# Camada em SQLite compartilhada entre workers (vazio = apenas memória)
+XRAY_CACHE_SQLITE_PATH = os.getenv('XRAY_CACHE_SQLITE_PATH', '')
+# Hash perceptual: reconhece re-encodes quase idênticos (desligado por padrão).
+# O dHash de 64 bits só indica um candidato: o acerto é confirmado comparando
+# miniaturas 32x32 (diferença média máxima, escala 0-255)
+XRAY_CACHE_PERCEPTUAL_HASH = os.getenv('XRAY_CACHE_PERCEPTUAL_HASH', 'false').lower() == 'true'
+XRAY_CACHE_PERCEPTUAL_MAX_DIFF = float(os.getenv('XRAY_CACHE_PERCEPTUAL_MAX_DIFF', 2.0))
+
+# Cache de respostas de vídeo (classificação, stats e health_info), enderecado pelo
+# SHA-256 do arquivo calculado durante o upload: re-uploads respondem sem reanálise
+VIDEO_CACHE_ENABLED = os.getenv('VIDEO_CACHE_ENABLED', 'true').lower() == 'true'
+VIDEO_CACHE_MAX_ENTRIES = int(os.getenv('VIDEO_CACHE_MAX_ENTRIES', 256))
+VIDEO_CACHE_TTL_SECONDS = int(os.getenv('VIDEO_CACHE_TTL_SECONDS', 86400))
+# Camada em SQLite (limitada por VIDEO_CACHE_MAX_ENTRIES, LRU); vazio = apenas memória
+VIDEO_CACHE_SQLITE_PATH = os.getenv('VIDEO_CACHE_SQLITE_PATH', str(UPLOAD_FOLDER / 'video_cache.sqlite3'))
+
 # ================================================================================
 # RATE LIMITING
 # ================================================================================
@@ -225,13 +360,20 @@ def get_allowed_extensions(file_type: str) -> set:
 # VALIDAÇÃO DE CONFIGURAÇÃO
 # ================================================================================
 
+def fast_model_available() -> bool:
+    """Artefato de carregamento rápido completo e habilitado (dispensa o .keras)."""
+    if not XRAY_FAST_MODEL_ENABLED:
+        return False
+    from fast_model import is_fast_artifact
+    return is_fast_artifact(XRAY_FAST_MODEL_PATH)
+
 def validate_config():
     """Valida se todas as configurações necessárias estão presentes"""
     errors = []
     
-    # Verificar modelo
-    if not MODEL_PATH.exists():
-        errors.append(f"❌ Modelo não encontrado: {MODEL_PATH}")
+    # Verificar modelo (.keras ou artefato de carregamento rápido)
+    if not MODEL_PATH.exists() and not fast_model_available():
+        errors.append(f"❌ Modelo não encontrado: {MODEL_PATH} (nem {XRAY_FAST_MODEL_PATH})")
     
     # Verificar diretórios
     if not UPLOAD_FOLDER.exists():
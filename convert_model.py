@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Conversao do Modelo de Raio-X para ONNX / TFLite
+================================================
+Exporta `Departamento_Medico/melhor_modelo.keras` para runtimes mais leves
+que o TensorFlow completo, com quantizacao INT8 opcional, e gera um
+relatorio de paridade contra o modelo Keras original.
+
+Uso:
+    # Exportar ONNX e TFLite (float32) e gerar relatorio de paridade
+    python convert_model.py convert
+
+    # TFLite com quantizacao INT8 estatica calibrada em imagens reais
+    python convert_model.py convert --formats tflite --quantize static \\
+        --calibration-dir data/xray_samples
+
+    # Apenas comparar arquivos ja exportados
+    python convert_model.py parity --images data/xray_samples \\
+        Departamento_Medico/melhor_modelo.onnx Departamento_Medico/melhor_modelo_int8_static.tflite
+
+Dependencias opcionais:
+    pip install tf2onnx onnxruntime   # exportacao/execucao ONNX
+    pip install ai-edge-litert        # execucao TFLite sem TensorFlow completo
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from config import MODEL_PATH, IMAGE_SIZE
+from xray_classifier import XRayClassifier
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.webp'}
+QUANTIZATION_MODES = ('none', 'dynamic', 'static')
+
+
+def load_sample_batch(classifier: XRayClassifier, image_dir, limit: int) -> np.ndarray:
+    """
+    Carrega e preprocessa imagens de exemplo (calibracao/paridade).
+
+    Sem diretorio, gera imagens sinteticas em tons de cinza; suficiente
+    para validar a exportacao, mas a calibracao INT8 deve usar raios-X reais.
+    """
+    arrays = []
+
+    if image_dir:
+        paths = sorted(
+            p for p in Path(image_dir).rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS
+        )[:limit]
+        for path in paths:
+            with Image.open(path) as image:
+                arrays.append(classifier.preprocess_image(image)[0])
+
+    if not arrays:
+        logger.warning("⚠️  Nenhuma imagem de exemplo - usando imagens sinteticas")
+        rng = np.random.default_rng(0)
+        for _ in range(limit):
+            gray = rng.integers(0, 256, size=IMAGE_SIZE, dtype=np.uint8)
+            arrays.append(classifier.preprocess_image(Image.fromarray(gray))[0])
+
+    return np.stack(arrays).astype(np.float32)
+
+
+def _export_saved_model(model, directory: str):
+    """Exporta o modelo Keras como SavedModel de inferencia."""
+    if hasattr(model, 'export'):
+        model.export(directory)
+    else:
+        import tensorflow as tf
+        tf.saved_model.save(model, directory)
+
+
+def export_tflite(model, output_path: Path, quantize: str, calibration: np.ndarray) -> Path:
+    """
+    Converte o modelo para TFLite.
+
+    Args:
+        quantize: 'none', 'dynamic' (pesos INT8) ou 'static' (pesos e
+            ativacoes INT8, calibrados em `calibration`). Entrada e saida
+            continuam em float32 para manter a interface do backend.
+    """
+    import tensorflow as tf
+
+    with tempfile.TemporaryDirectory() as saved_model_dir:
+        _export_saved_model(model, saved_model_dir)
+        converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+
+        if quantize in ('dynamic', 'static'):
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+        if quantize == 'static':
+            def representative_dataset():
+                for sample in calibration:
+                    yield [sample[np.newaxis, ...]]
+
+            converter.representative_dataset = representative_dataset
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+        tflite_model = converter.convert()
+
+    output_path.write_bytes(tflite_model)
+    return output_path
+
+
+class _CalibrationReader:
+    """Fornece lotes de calibracao para a quantizacao estatica do ONNX Runtime."""
+
+    def __init__(self, input_name: str, calibration: np.ndarray):
+        self._samples = iter(
+            {input_name: sample[np.newaxis, ...]} for sample in calibration
+        )
+
+    def get_next(self):
+        return next(self._samples, None)
+
+
+def export_onnx(model, output_path: Path, quantize: str, calibration: np.ndarray) -> Path:
+    """
+    Converte o modelo para ONNX (tf2onnx ou exportador nativo do Keras)
+    e aplica quantizacao INT8 dinamica ou estatica (QDQ) se solicitado.
+    """
+    float_path = output_path if quantize == 'none' else output_path.with_suffix('.float.onnx')
+
+    try:
+        import tensorflow as tf
+        import tf2onnx
+
+        signature = (tf.TensorSpec((None, IMAGE_SIZE[0], IMAGE_SIZE[1], 3), tf.float32, name='input'),)
+        tf2onnx.convert.from_keras(model, input_signature=signature, opset=17,
+                                   output_path=str(float_path))
+    except ImportError:
+        if not hasattr(model, 'export'):
+            raise
+        logger.info("tf2onnx nao instalado - usando exportador ONNX do Keras")
+        model.export(str(float_path), format='onnx')
+
+    if quantize == 'none':
+        return output_path
+
+    from onnxruntime.quantization import (
+        QuantFormat,
+        QuantType,
+        quantize_dynamic,
+        quantize_static
+    )
+
+    if quantize == 'dynamic':
+        quantize_dynamic(str(float_path), str(output_path), weight_type=QuantType.QInt8)
+    else:
+        import onnxruntime as ort
+        input_name = ort.InferenceSession(
+            str(float_path), providers=['CPUExecutionProvider']
+        ).get_inputs()[0].name
+        quantize_static(
+            str(float_path), str(output_path),
+            _CalibrationReader(input_name, calibration),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True
+        )
+
+    float_path.unlink(missing_ok=True)
+    return output_path
+
+
+def backend_for_path(path: Path) -> str:
+    """Deduz o backend pela extensao do arquivo exportado."""
+    suffix = path.suffix.lower()
+    if suffix == '.onnx':
+        return 'onnx'
+    if suffix == '.tflite':
+        return 'tflite'
+    raise ValueError(f"Extensao nao suportada: {path}")
+
+
+def parity_report(reference: XRayClassifier, model_paths, samples: np.ndarray) -> list:
+    """
+    Compara cada modelo exportado com o modelo Keras de referencia.
+
+    Returns:
+        list: Uma entrada por backend com delta maximo/medio de
+        probabilidade, concordancia do argmax, tamanho e latencia media.
+    """
+    expected = reference.predict_batch(samples)
+    expected_classes = np.argmax(expected, axis=1)
+    report = []
+
+    for path in model_paths:
+        path = Path(path)
+        entry = {'path': str(path), 'backend': backend_for_path(path)}
+
+        try:
+            candidate = XRayClassifier(backend=entry['backend'], backend_path=path)
+            if candidate.backend_name != entry['backend']:
+                raise RuntimeError("backend nao carregado")
+
+            start = time.perf_counter()
+            predicted = np.concatenate([
+                candidate.predict_batch(sample[np.newaxis, ...]) for sample in samples
+            ])
+            latency_ms = (time.perf_counter() - start) * 1000 / len(samples)
+
+            delta = np.abs(predicted - expected)
+            entry.update({
+                'size_mb': round(path.stat().st_size / 1_000_000, 2),
+                'max_probability_delta': float(delta.max()),
+                'mean_probability_delta': float(delta.mean()),
+                'argmax_agreement': float(np.mean(np.argmax(predicted, axis=1) == expected_classes)),
+                'latency_ms': round(latency_ms, 2),
+                'samples': int(len(samples))
+            })
+        except Exception as e:
+            logger.error(f"❌ Falha na paridade de {path}: {e}")
+            entry['error'] = str(e)
+
+        report.append(entry)
+
+    return report
+
+
+def print_report(report: list):
+    """Exibe o relatorio de paridade em formato de tabela."""
+    print("\n" + "=" * 100)
+    print(f"{'Arquivo':<45} {'MB':>8} {'Delta max':>11} {'Delta medio':>12} "
+          f"{'Argmax':>8} {'ms/img':>8}")
+    print("=" * 100)
+    for entry in report:
+        name = Path(entry['path']).name
+        if 'error' in entry:
+            print(f"{name:<45} ERRO: {entry['error']}")
+            continue
+        print(f"{name:<45} {entry['size_mb']:>8.1f} {entry['max_probability_delta']:>11.2e} "
+              f"{entry['mean_probability_delta']:>12.2e} {entry['argmax_agreement'] * 100:>7.1f}% "
+              f"{entry['latency_ms']:>8.2f}")
+    print("=" * 100)
+
+
+def output_name(model_path: Path, fmt: str, quantize: str) -> str:
+    """melhor_modelo.onnx, melhor_modelo_int8_dynamic.tflite, ..."""
+    suffix = '' if quantize == 'none' else f"_int8_{quantize}"
+    return f"{model_path.stem}{suffix}.{fmt}"
+
+
+def run_convert(args) -> bool:
+    reference = XRayClassifier(backend='keras', inference_mode='compiled')
+    if reference.model is None:
+        logger.error(f"❌ Modelo Keras nao carregado: {MODEL_PATH}")
+        return False
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    calibration = None
+    if args.quantize == 'static':
+        calibration = load_sample_batch(reference, args.calibration_dir, args.calibration_samples)
+        logger.info(f"Calibracao INT8 com {len(calibration)} imagens")
+
+    # Exportar com as duas saidas (probabilidades + features penultimas)
+    # para que o gate local de raio-X funcione tambem nos runtimes leves
+    export_model = reference.backend.feature_model or reference.model
+
+    exported = []
+    for fmt in args.formats:
+        output_path = output_dir / output_name(Path(MODEL_PATH), fmt, args.quantize)
+        logger.info(f"📦 Exportando {fmt} ({args.quantize}) -> {output_path}")
+        try:
+            if fmt == 'onnx':
+                export_onnx(export_model, output_path, args.quantize, calibration)
+            else:
+                export_tflite(export_model, output_path, args.quantize, calibration)
+            logger.info(f"✅ {output_path.name}: {output_path.stat().st_size / 1_000_000:.1f}MB")
+            exported.append(output_path)
+        except Exception as e:
+            logger.error(f"❌ Falha ao exportar {fmt}: {e}")
+
+    if not exported:
+        return False
+
+    if not args.skip_parity:
+        samples = load_sample_batch(reference, args.parity_dir or args.calibration_dir,
+                                    args.parity_samples)
+        report = parity_report(reference, exported, samples)
+        print_report(report)
+        Path(args.report).write_text(json.dumps(report, indent=2))
+        logger.info(f"Relatorio de paridade salvo em {args.report}")
+
+    return True
+
+
+def run_parity(args) -> bool:
+    reference = XRayClassifier(backend='keras', inference_mode='compiled')
+    if reference.model is None:
+        logger.error(f"❌ Modelo Keras nao carregado: {MODEL_PATH}")
+        return False
+
+    samples = load_sample_batch(reference, args.images, args.samples)
+    report = parity_report(reference, args.models, samples)
+    print_report(report)
+    Path(args.report).write_text(json.dumps(report, indent=2))
+    logger.info(f"Relatorio de paridade salvo em {args.report}")
+    return all('error' not in entry for entry in report)
+
+
+if __name__ == "__main__":
+    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+    parser = argparse.ArgumentParser(description="Exportar o modelo de raio-X para ONNX/TFLite")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert = subparsers.add_parser('convert', help='Exportar e gerar relatorio de paridade')
+    convert.add_argument('--formats', nargs='+', choices=['onnx', 'tflite'],
+                         default=['onnx', 'tflite'])
+    convert.add_argument('--quantize', choices=QUANTIZATION_MODES, default='none',
+                         help='Quantizacao INT8: dinamica (pesos) ou estatica (calibrada)')
+    convert.add_argument('--calibration-dir', help='Imagens de raio-X para calibracao INT8')
+    convert.add_argument('--calibration-samples', type=int, default=100)
+    convert.add_argument('--parity-dir', help='Imagens para o relatorio de paridade')
+    convert.add_argument('--parity-samples', type=int, default=50)
+    convert.add_argument('--output-dir', default=str(Path(MODEL_PATH).parent))
+    convert.add_argument('--report', default='parity_report.json')
+    convert.add_argument('--skip-parity', action='store_true')
+
+    parity = subparsers.add_parser('parity', help='Comparar modelos exportados com o Keras')
+    parity.add_argument('models', nargs='+', help='Arquivos .onnx / .tflite')
+    parity.add_argument('--images', help='Imagens para o relatorio de paridade')
+    parity.add_argument('--samples', type=int, default=50)
+    parity.add_argument('--report', default='parity_report.json')
+
+    args = parser.parse_args()
+    success = run_convert(args) if args.command == 'convert' else run_parity(args)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Artefato de Carregamento Rapido do Modelo
+=========================================
+Converte `melhor_modelo.keras` (zip com config + pesos HDF5) em um
+formato pensado para o cold start no Cloud Run:
+
+    melhor_modelo.fastload/
+        manifest.json   arquitetura ja serializada (JSON do Keras), dtype e
+                        a tabela de pesos (nome, shape, dtype, offset)
+        weights.bin     pesos brutos, sem compressao, alinhados em 64 bytes
+
+No carregamento o grafo e montado direto da arquitetura e os pesos sao
+lidos por `np.memmap`: sem extrair o zip nem decodificar HDF5, e as
+paginas do arquivo so sao lidas quando cada peso e copiado para o
+TensorFlow. Em float16 o artefato (e o download do GCS) cai pela metade;
+os pesos voltam para float32 no carregamento.
+
+Uso:
+    python fast_model.py build                   # float32
+    python fast_model.py build --dtype float16   # metade do tamanho
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+WEIGHTS_NAME = 'weights.bin'
+ALIGNMENT = 64
+DTYPES = ('float32', 'float16')
+
+
+def is_fast_artifact(path) -> bool:
+    """O manifesto e gravado por ultimo: sua presenca indica um artefato completo."""
+    path = Path(path)
+    return (path / MANIFEST_NAME).is_file() and (path / WEIGHTS_NAME).is_file()
+
+
+def build_fast_artifact(model, output_dir, dtype: str = 'float32') -> Path:
+    """
+    Grava o modelo Keras no formato de carregamento rapido.
+
+    Args:
+        model: Modelo Keras carregado
+        output_dir: Diretorio do artefato (substituido se existir)
+        dtype: 'float32' ou 'float16' (apenas pesos float32 sao convertidos)
+
+    Returns:
+        Path: Diretorio do artefato
+    """
+    from tensorflow import keras
+
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype invalido: {dtype} (use: {', '.join(DTYPES)})")
+
+    output_dir = Path(output_dir)
+    staging = output_dir.with_name(output_dir.name + '.tmp')
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir(parents=True)
+
+    entries = []
+    offset = 0
+    with open(staging / WEIGHTS_NAME, 'wb') as f:
+        for variable, value in zip(model.weights, model.get_weights()):
+            array = np.ascontiguousarray(value)
+            stored = array.astype(np.float16) if dtype == 'float16' and array.dtype == np.float32 else array
+
+            padding = -offset % ALIGNMENT
+            f.write(b'\0' * padding)
+            offset += padding
+
+            f.write(stored.tobytes())
+            entries.append({
+                'name': getattr(variable, 'path', variable.name),
+                'shape': list(array.shape),
+                'dtype': str(array.dtype),
+                'stored_dtype': str(stored.dtype),
+                'offset': offset
+            })
+            offset += stored.nbytes
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'keras_version': keras.__version__,
+        'dtype': dtype,
+        'architecture': json.loads(model.to_json()),
+        'weights': entries,
+        'weights_bytes': offset
+    }
+    (staging / MANIFEST_NAME).write_text(json.dumps(manifest))
+
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+    staging.rename(output_dir)
+    return output_dir
+
+
+def load_fast_artifact(artifact_dir):
+    """
+    Monta o modelo a partir do artefato, com os pesos mapeados em memoria.
+
+    Raises:
+        ValueError: Versao de formato ou tabela de pesos incompativel
+    """
+    from tensorflow import keras
+
+    artifact_dir = Path(artifact_dir)
+    manifest = json.loads((artifact_dir / MANIFEST_NAME).read_text())
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Versao de formato nao suportada: {manifest.get('format_version')}")
+
+    model = keras.models.model_from_json(json.dumps(manifest['architecture']))
+    if len(model.weights) != len(manifest['weights']):
+        raise ValueError(f"Artefato com {len(manifest['weights'])} pesos, "
+                         f"modelo espera {len(model.weights)}")
+
+    blob = np.memmap(artifact_dir / WEIGHTS_NAME, dtype=np.uint8, mode='r')
+    arrays = []
+    for entry in manifest['weights']:
+        shape = tuple(entry['shape'])
+        view = np.frombuffer(blob, dtype=entry['stored_dtype'],
+                             count=int(np.prod(shape)), offset=entry['offset']).reshape(shape)
+        if entry['stored_dtype'] != entry['dtype']:
+            view = view.astype(entry['dtype'])
+        arrays.append(view)
+
+    model.set_weights(arrays)
+    return model
+
+
+def _directory_size_mb(path: Path) -> float:
+    return sum(f.stat().st_size for f in path.iterdir()) / 1_000_000
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+    from config import MODEL_PATH, IMAGE_SIZE, XRAY_FAST_MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Gerar o artefato de carregamento rapido do modelo")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help='Converter o modelo .keras')
+    build.add_argument('--model', default=str(MODEL_PATH))
+    build.add_argument('--output', default=str(XRAY_FAST_MODEL_PATH))
+    build.add_argument('--dtype', choices=DTYPES, default='float32')
+
+    args = parser.parse_args()
+
+    from tensorflow import keras
+
+    start = time.perf_counter()
+    model = keras.models.load_model(args.model)
+    keras_load_s = time.perf_counter() - start
+
+    output = build_fast_artifact(model, args.output, dtype=args.dtype)
+    logger.info(f"✅ Artefato gerado em {output} ({_directory_size_mb(output):.1f}MB, {args.dtype})")
+
+    # Conferir: tempo de carregamento e diferenca maxima das predicoes
+    start = time.perf_counter()
+    fast_model = load_fast_artifact(output)
+    fast_load_s = time.perf_counter() - start
+
+    sample = np.random.default_rng(0).random((4, IMAGE_SIZE[0], IMAGE_SIZE[1], 3), dtype=np.float32)
+    delta = float(np.max(np.abs(model(sample, training=False) - fast_model(sample, training=False))))
+
+    logger.info(f"Carregamento .keras: {keras_load_s:.2f}s | fastload: {fast_load_s:.2f}s")
+    logger.info(f"Diferenca maxima de probabilidade: {delta:.2e}")
+    sys.exit(0)
@@ -6,15 +6,47 @@ import sys
 import os
 from pathlib import Path
 import cv2
-from PIL import Image
 import shutil
-from collections import Counter
 import numpy as np
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+try:
+    from config import (
+        VIDEO_BATCH_SIZE, VIDEO_SAMPLING_MODE,
+        VIDEO_PREPROCESS_WORKERS, VIDEO_PIPELINE_MAX_IN_FLIGHT,
+        VIDEO_CHANGE_DETECTION, VIDEO_CHANGE_THRESHOLD, VIDEO_MAX_SAMPLING_FACTOR,
+        VIDEO_EARLY_STOP, VIDEO_EARLY_STOP_MIN_FRAMES, VIDEO_EARLY_STOP_MARGIN,
+        VIDEO_EARLY_STOP_CONSISTENT_FRAMES, VIDEO_SEGMENTS, VIDEO_SEGMENT_MIN_SECONDS,
+        VIDEO_FFMPEG_WIDTH
+    )
+except ImportError:
+    # Fallback se config não importável (development edge case)
+    VIDEO_BATCH_SIZE = int(os.getenv('VIDEO_BATCH_SIZE', 16))
+    VIDEO_SAMPLING_MODE = os.getenv('VIDEO_SAMPLING_MODE', 'grab').lower()
+    VIDEO_PREPROCESS_WORKERS = int(os.getenv('VIDEO_PREPROCESS_WORKERS', min(4, os.cpu_count() or 1)))
+    VIDEO_PIPELINE_MAX_IN_FLIGHT = int(os.getenv('VIDEO_PIPELINE_MAX_IN_FLIGHT', 32))
+    VIDEO_CHANGE_DETECTION = os.getenv('VIDEO_CHANGE_DETECTION', 'false').lower() == 'true'
+    VIDEO_CHANGE_THRESHOLD = float(os.getenv('VIDEO_CHANGE_THRESHOLD', 3.0))
+    VIDEO_MAX_SAMPLING_FACTOR = int(os.getenv('VIDEO_MAX_SAMPLING_FACTOR', 4))
+    VIDEO_EARLY_STOP = os.getenv('VIDEO_EARLY_STOP', 'false').lower() == 'true'
+    VIDEO_EARLY_STOP_MIN_FRAMES = int(os.getenv('VIDEO_EARLY_STOP_MIN_FRAMES', 8))
+    VIDEO_EARLY_STOP_MARGIN = float(os.getenv('VIDEO_EARLY_STOP_MARGIN', 0.2))
+    VIDEO_EARLY_STOP_CONSISTENT_FRAMES = int(os.getenv('VIDEO_EARLY_STOP_CONSISTENT_FRAMES', 5))
+    VIDEO_SEGMENTS = int(os.getenv('VIDEO_SEGMENTS', 1))
+    VIDEO_SEGMENT_MIN_SECONDS = float(os.getenv('VIDEO_SEGMENT_MIN_SECONDS', 60))
+    VIDEO_FFMPEG_WIDTH = int(os.getenv('VIDEO_FFMPEG_WIDTH', 640))
+
 from xray_classifier import get_classifier
+from video_sampling import ChangeDetector, FrameSampler
+from video_pipeline import VideoPipeline
+from image_ingestion import pixels_to_tensor, prepare_frame
+from video_early_stop import EarlyStopRule
+from video_segments import merge_segment_stats, plan_segments, run_segments, segment_count
+from video_results import FrameResultStore
 
 #################################### VIDEO RAIO-X ####################################
 
@@ -22,6 +54,7 @@ MIN_CONFIDENCE_THRESHOLD = 0.4
 TARGET_CLASSIFICATIONS_PER_SECOND = 2
 MIN_CLASSIFY_INTERVAL = 3
 ALLOWED_VIDEO_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'wmv', 'webm'}
+CLASS_LABELS = ['Covid-19', 'Normal', 'Pneumonia Viral', 'Pneumonia Bacteriana']
 
 
 def allowed_video_file(filename):
@@ -29,40 +62,89 @@ def allowed_video_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_VIDEO_EXTENSIONS
 
 
-def extract_xray_region(frame):
+def video_result_settings():
     """
-    Detecta e extrai a regiao do raio-X de um frame de gravacao de tela.
-    
-    IGUAL AO ORIGINAL - sem mudanças
+    Configuracoes que mudam o resultado da analise de video (amostragem,
+    deteccao de mudanca e parada antecipada), para chaves de cache.
+    Paralelismo, lotes e segmentos nao mudam os frames classificados.
+    """
+    settings = {
+        'sampling_mode': VIDEO_SAMPLING_MODE,
+        'change_detection': VIDEO_CHANGE_DETECTION,
+        'early_stop': VIDEO_EARLY_STOP,
+        'min_confidence': MIN_CONFIDENCE_THRESHOLD,
+        'classifications_per_second': TARGET_CLASSIFICATIONS_PER_SECOND,
+        'min_classify_interval': MIN_CLASSIFY_INTERVAL
+    }
+    if VIDEO_SAMPLING_MODE == 'ffmpeg':
+        settings['ffmpeg_width'] = VIDEO_FFMPEG_WIDTH
+    if VIDEO_CHANGE_DETECTION:
+        settings['change_threshold'] = VIDEO_CHANGE_THRESHOLD
+        settings['max_sampling_factor'] = VIDEO_MAX_SAMPLING_FACTOR
+    if VIDEO_EARLY_STOP:
+        settings['early_stop_rule'] = [VIDEO_EARLY_STOP_MIN_FRAMES, VIDEO_EARLY_STOP_MARGIN,
+                                       VIDEO_EARLY_STOP_CONSISTENT_FRAMES]
+    return settings
+
+
+def detect_xray_bbox(frame, max_width=None):
+    """
+    Detecta a regiao do raio-X em um frame de gravacao de tela.
+
+    Mesmo criterio de sempre (Otsu, fechamento/abertura e maior contorno);
+    com `max_width`, a deteccao roda em uma copia reduzida e a caixa e
+    reescalada para o frame original.
+
+    Returns:
+        (x, y, w, h) com margem, ou None para usar o frame inteiro
     """
     h, w = frame.shape[:2]
-    frame_area = h * w
+    scale = 1.0
+    if max_width and w > max_width:
+        scale = max_width / w
+        frame = cv2.resize(frame, (max_width, max(1, round(h * scale))),
+                           interpolation=cv2.INTER_AREA)
 
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small_h, small_w = frame.shape[:2]
+    frame_area = small_h * small_w
+
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
     blurred = cv2.GaussianBlur(gray, (5, 5), 0)
 
     _, thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
 
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
-    thresh = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel, iterations=3)
-    thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel, iterations=1)
+    # Morfologia original: fechamento 5x5 x3 e abertura 5x5 x1, ou seja, raios
+    # de 6 e 2 px no tamanho original. Com kernel 3x3 (raio 1) e iteracoes
+    # proporcionais a escala, os raios continuam os mesmos no tamanho original
+    # (identico ao original com scale 1)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+    close_iterations = round(6 * scale)
+    open_iterations = round(2 * scale)
+    if close_iterations:
+        thresh = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel, iterations=close_iterations)
+    if open_iterations:
+        thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel, iterations=open_iterations)
 
     contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
     if not contours:
-        return frame
+        return None
 
     min_area = frame_area * 0.15
     valid_contours = [c for c in contours if cv2.contourArea(c) >= min_area]
 
     if not valid_contours:
-        return frame
+        return None
 
     largest = max(valid_contours, key=cv2.contourArea)
     x, y, rw, rh = cv2.boundingRect(largest)
 
     if (rw * rh) > frame_area * 0.9:
-        return frame
+        return None
+
+    if scale != 1.0:
+        x, y = int(x / scale), int(y / scale)
+        rw, rh = int(np.ceil(rw / scale)), int(np.ceil(rh / scale))
 
     margin = 5
     x = max(0, x - margin)
@@ -70,9 +152,107 @@ def extract_xray_region(frame):
     rw = min(w - x, rw + 2 * margin)
     rh = min(h - y, rh + 2 * margin)
 
+    return x, y, rw, rh
+
+
+def extract_xray_region(frame):
+    """
+    Detecta e extrai a regiao do raio-X de um frame de gravacao de tela.
+    
+    IGUAL AO ORIGINAL - deteccao em resolucao completa
+    """
+    bbox = detect_xray_bbox(frame)
+    if bbox is None:
+        return frame
+    x, y, rw, rh = bbox
     return frame[y:y+rh, x:x+rw]
 
 
+class XRayRegionTracker:
+    """
+    Rastreia a regiao do raio-X entre frames de um mesmo video.
+
+    Em gravacoes de tela a caixa do raio-X quase nunca se move: a deteccao
+    completa roda em uma copia reduzida e a caixa fica em cache. Nos frames
+    seguintes so e feita uma checagem das bordas: faixas finas logo fora da
+    caixa (o fundo do visualizador) devem continuar iguais as da deteccao.
+    Se a imagem se mover, mudar de tamanho ou o layout mudar, as faixas
+    mudam e a regiao e detectada de novo. Sem caixa (frame inteiro), nada
+    fica em cache: as bordas do frame nao mudam quando um raio-X aparece
+    no meio de um visualizador vazio, entao a deteccao (na copia reduzida)
+    roda de novo no frame seguinte.
+
+    O estado (caixa e faixas de referencia) depende da ordem dos frames:
+    `locate` deve ser chamado na ordem do video (no pipeline, pela thread de
+    decodificacao) para que o resultado nao dependa do escalonamento das
+    threads. Chamadas concorrentes sao serializadas.
+
+    Args:
+        detection_width: Largura da copia reduzida usada na deteccao
+        strip: Espessura (px) das faixas da checagem de bordas
+        tolerance: Diferenca media maxima (0-255) das faixas
+    """
+
+    def __init__(self, detection_width=320, strip=4, tolerance=12.0):
+        self.detection_width = detection_width
+        self.strip = strip
+        self.tolerance = tolerance
+        self.detections = 0
+        self.reused = 0
+        self._state = None
+        self._lock = threading.Lock()
+
+    def _border_strips(self, frame, bbox):
+        h, w = frame.shape[:2]
+        x, y, rw, rh = bbox if bbox is not None else (0, 0, w, h)
+        s = self.strip
+        # Faixas fora da caixa (subamostradas); vazias se a caixa encosta na borda
+        strips = [
+            frame[max(0, y - s):y, x:x + rw:4],
+            frame[y + rh:y + rh + s, x:x + rw:4],
+            frame[y:y + rh:4, max(0, x - s):x],
+            frame[y:y + rh:4, x + rw:x + rw + s]
+        ]
+        strips = [strip for strip in strips if strip.size]
+        if not strips:
+            # Caixa ocupando o frame inteiro: faixas nas bordas do proprio frame
+            strips = [frame[:s, ::4], frame[-s:, ::4], frame[::4, :s], frame[::4, -s:]]
+        return np.array([strip.mean() for strip in strips], dtype=np.float32)
+
+    def locate(self, frame):
+        """Caixa (x, y, w, h) do raio-X, ou None para o frame inteiro."""
+        with self._lock:
+            state = self._state
+            if state is not None and state['shape'] == frame.shape:
+                signature = self._border_strips(frame, state['bbox'])
+                if (len(signature) == len(state['signature'])
+                        and np.max(np.abs(signature - state['signature'])) <= self.tolerance):
+                    self.reused += 1
+                    return state['bbox']
+
+            bbox = detect_xray_bbox(frame, max_width=self.detection_width)
+            self._state = None
+            if bbox is not None:
+                self._state = {
+                    'shape': frame.shape,
+                    'bbox': bbox,
+                    'signature': self._border_strips(frame, bbox)
+                }
+            self.detections += 1
+            return bbox
+
+    def extract(self, frame):
+        """Equivalente a `extract_xray_region`, reaproveitando a caixa em cache."""
+        bbox = self.locate(frame)
+        if bbox is None:
+            return frame
+        x, y, rw, rh = bbox
+        return frame[y:y+rh, x:x+rw]
+
+    def get_stats(self):
+        return {'detections': self.detections, 'reused': self.reused}
+
+
 def enhance_xray_frame(frame):
     """
     Normaliza um frame de raio-X extraido de video.
@@ -87,7 +267,10 @@ def enhance_xray_frame(frame):
     return cv2.cvtColor(enhanced, cv2.COLOR_GRAY2BGR)
 
 
-def processar_video_xray(video_path, show_window=False):
+def processar_video_xray(video_path, show_window=False, batch_size=None, sampling_mode=None,
+                         change_detection=None, full_scan=False, progress_callback=None,
+                         cancel_event=None, segments=None, frame_range=None,
+                         include_frame_results=False):
     """
     Processa um video de raio-X, classificando frames periodicamente.
 
@@ -97,9 +280,34 @@ def processar_video_xray(video_path, show_window=False):
         video_path (str): Caminho absoluto para o arquivo de video.
         show_window (bool): Se True, exibe janela OpenCV (apenas local).
                            Se False, processa em background (cloud mode).
+        batch_size (int): Frames amostrados por forward pass (padrao:
+                          VIDEO_BATCH_SIZE). Com a janela aberta e sempre 1,
+                          para o resultado acompanhar o preview.
+        sampling_mode (str): 'grab', 'seek' ou 'keyframes' (padrao:
+                             VIDEO_SAMPLING_MODE). Com a janela aberta,
+                             todos os frames sao decodificados.
+        change_detection (bool): Reaproveitar o resultado anterior em frames
+                                 sem mudanca e adaptar o intervalo de
+                                 amostragem (padrao: VIDEO_CHANGE_DETECTION).
+        full_scan (bool): Analisar o video inteiro, sem parada antecipada
+                          (a parada so ocorre com VIDEO_EARLY_STOP ativo).
+        progress_callback (callable): Recebe um dict de progresso (frames
+                                      classificados, frame atual e votacao
+                                      parcial) e o resultado do frame a cada
+                                      frame classificado.
+        cancel_event (threading.Event): Quando sinalizado, interrompe a
+                                        decodificacao e a analise.
+        segments (int): Trechos de tempo processados em paralelo, um processo
+                        por trecho (padrao: VIDEO_SEGMENTS; 0 = um por nucleo
+                        utilizavel; 1 = processo unico).
+        frame_range (tuple): (inicio, fim) - analisa apenas esse trecho
+                             (usado pelos processos de cada segmento).
+        include_frame_results (bool): Incluir `frame_results` (um dict por
+                                      frame classificado) no resultado.
 
     Returns:
-        dict com final_classification, frame_results, classification_counts, etc.
+        dict com final_classification, classification_counts, etc.
+        (e frame_results, se pedido)
     """
     classifier = get_classifier()
 
@@ -142,81 +350,225 @@ def processar_video_xray(video_path, show_window=False):
               f"classificando a cada {classify_every_n} frames "
               f"(~{fps/max(classify_every_n, 1):.1f} classificacoes/s)")
         
+        # Com preview, cada frame precisa do resultado imediatamente
+        batch_size = 1 if can_show_window else max(1, batch_size or VIDEO_BATCH_SIZE)
+
         if can_show_window:
             print("🖥️  Exibindo janela de preview...")
         else:
             print("☁️  Processando em background (cloud mode)...")
 
-        frame_count = 0
-        frame_results = []
-        classification_names = []
+        if change_detection is None:
+            change_detection = VIDEO_CHANGE_DETECTION
+
+        # Trechos paralelos apenas na analise completa sem janela
+        segment_ranges = None
+        if frame_range is None and not can_show_window and total_frames > 0:
+            count = segment_count(
+                total_frames, fps,
+                requested=VIDEO_SEGMENTS if segments is None else segments,
+                min_seconds=VIDEO_SEGMENT_MIN_SECONDS
+            )
+            if count > 1:
+                segment_ranges = plan_segments(total_frames, classify_every_n, count)
+
+        start_frame, end_frame = frame_range or (0, None)
+
+        # Apenas os frames amostrados sao convertidos para BGR
+        sampler = FrameSampler(
+            cap,
+            classify_every_n,
+            mode='read' if can_show_window else (sampling_mode or VIDEO_SAMPLING_MODE),
+            video_path=video_path,
+            fps=fps,
+            total_frames=total_frames,
+            change_detector=ChangeDetector(VIDEO_CHANGE_THRESHOLD) if change_detection else None,
+            max_every_n=classify_every_n * VIDEO_MAX_SAMPLING_FACTOR,
+            start_frame=start_frame,
+            end_frame=end_frame,
+            decode_width=VIDEO_FFMPEG_WIDTH,
+            # Frames vivos no pipeline: os em voo + o que aguarda vaga
+            buffers=VIDEO_PIPELINE_MAX_IN_FLIGHT + 2
+        )
+
+        # Resultados em colunas, com a votacao ponderada atualizada a cada frame
+        frame_store = FrameResultStore(CLASS_LABELS, classify_every_n,
+                                       min_confidence=MIN_CONFIDENCE_THRESHOLD)
         last_result = None
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            # Classificar a cada N frames
-            if frame_count % classify_every_n == 0:
-                xray_frame = extract_xray_region(frame)
-                xray_frame = enhance_xray_frame(xray_frame)
-                rgb_frame = cv2.cvtColor(xray_frame, cv2.COLOR_BGR2RGB)
-                pil_image = Image.fromarray(rgb_frame)
-
-                result = classifier.classify(pil_image)
-
-                if result['success']:
-                    frame_results.append({
-                        'frame_number': frame_count,
-                        'class_name': result['class_name'],
-                        'confidence': result['confidence'],
-                        'all_probabilities': result['all_probabilities']
-                    })
-                    classification_names.append(result['class_name'])
-                    last_result = result
-                    print(f"Frame {frame_count}: {result['class_name']} "
-                          f"({result['confidence']*100:.1f}%)")
-
-            # *** ADAPTAÇÃO PRINCIPAL: Exibir apenas se show_window=True E display disponível ***
-            if can_show_window and last_result is not None:
-                # Sobrepor resultado da classificacao no frame
-                class_name = last_result['class_name']
-                confidence = last_result['confidence']
-                label = f"{class_name}: {confidence*100:.1f}%"
-
-                # Fundo escuro para legibilidade
-                (text_w, text_h), baseline = cv2.getTextSize(
-                    label, cv2.FONT_HERSHEY_SIMPLEX, 1.0, 2)
-                cv2.rectangle(frame, (10, 10), (20 + text_w, 40 + text_h),
-                              (0, 0, 0), -1)
-
-                # Classe principal em verde
-                cv2.putText(frame, label, (15, 35),
-                            cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 0), 2)
-
-                # Todas as probabilidades em branco
-                y_offset = 70
-                for cls_name, prob in last_result['all_probabilities'].items():
-                    prob_text = f"{cls_name}: {prob*100:.1f}%"
-                    cv2.putText(frame, prob_text, (15, y_offset),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
-                    y_offset += 25
-
-                # Contador de frames
-                cv2.putText(frame, f"Frame: {frame_count}/{total_frames}",
-                            (15, height - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5,
-                            (200, 200, 200), 1)
-
-                # *** EXIBIR JANELA (apenas se display disponível) ***
-                cv2.imshow("Classificador de Raio-X", frame)
-
-                # Check para fechar janela (apenas se janela aberta)
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    print("⏹️  Processamento interrompido pelo usuário")
+        pipeline_stats = None
+        segment_stats = None
+
+        region_tracker = XRayRegionTracker()
+
+        # Parada antecipada: totais ponderados mantidos a cada frame confiavel
+        early_stop = None
+        if VIDEO_EARLY_STOP and not full_scan:
+            early_stop = EarlyStopRule(
+                CLASS_LABELS,
+                min_frames=VIDEO_EARLY_STOP_MIN_FRAMES,
+                min_margin=VIDEO_EARLY_STOP_MARGIN,
+                consistent_frames=VIDEO_EARLY_STOP_CONSISTENT_FRAMES
+            )
+        stop_frame = None
+
+        def is_cancelled():
+            return cancel_event is not None and cancel_event.is_set()
+
+        def preprocess_frame(item):
+            """(frame BGR, caixa) -> pixels do modelo (roda no pool de pre-processamento)."""
+            frame, bbox = item
+            return prepare_frame(frame, bbox)
+
+        def record_result(frame_number, result):
+            """Registra o resultado; retorna True se a analise pode parar."""
+            nonlocal last_result, stop_frame
+            if not result['success']:
+                return False
+
+            previous_frame = frame_store.last_frame_number
+            frame_store.add(frame_number, result)
+            last_result = result
+            print(f"Frame {frame_number}: {result['class_name']} "
+                  f"({result['confidence']*100:.1f}%)")
+
+            # Peso provisorio: frames desde o ultimo resultado (o final e calculado no fim)
+            weight = 1.0 if previous_frame is None else (frame_number - previous_frame) / classify_every_n
+
+            if progress_callback is not None:
+                progress_callback({
+                    'frame': frame_store.frame_result(-1),
+                    'frames_classified': len(frame_store),
+                    'current_frame': frame_number,
+                    'total_frames': total_frames,
+                    'partial_vote': frame_store.vote()['all_probabilities']
+                })
+
+            if early_stop is None or result['confidence'] < MIN_CONFIDENCE_THRESHOLD:
+                return False
+
+            if early_stop.update(result['all_probabilities'], weight):
+                stop_frame = frame_number
+                print(f"⏩ Parada antecipada no frame {frame_number}: {early_stop.leader()} "
+                      f"(margem >= {early_stop.margin_lower_bound*100:.1f}% com ~99% de confianca)")
+                return True
+            return False
+
+        if segment_ranges:
+            # Um processo por trecho; os resultados entram em ordem na votacao
+            print(f"🧩 Processando em {len(segment_ranges)} trechos paralelos: "
+                  + ", ".join(f"{start}-{end}" for start, end in segment_ranges))
+            started = time.perf_counter()
+            finished_segments = []
+            segment_results = run_segments(
+                video_path,
+                segment_ranges,
+                sampling_mode=sampling_mode,
+                change_detection=change_detection,
+                cancel_event=cancel_event
+            )
+            for frame_range_done, segment in segment_results:
+                finished_segments.append((frame_range_done, segment))
+                if not segment.get('success') and not segment.get('frame_results'):
+                    logger.warning(f"Trecho {frame_range_done} sem frames classificados: "
+                                   f"{segment.get('error')}")
+                stopped = False
+                for fr in segment.get('frame_results', []):
+                    result = {'success': True, **fr}
+                    if record_result(fr['frame_number'], result):
+                        stopped = True
+                        break
+                if stopped or is_cancelled():
+                    break
+            # Encerra os processos dos trechos restantes
+            segment_results.close()
+
+            segment_stats = merge_segment_stats(finished_segments, time.perf_counter() - started)
+            pipeline_stats = segment_stats['pipeline']
+            print(f"Trechos: {pipeline_stats['wall_s']:.2f}s | "
+                  f"{len(finished_segments)}/{len(segment_ranges)} trechos usados")
+        elif not can_show_window:
+            # Decodificacao, pre-processamento e inferencia em paralelo
+            pipeline = VideoPipeline(
+                classifier,
+                preprocess_frame,
+                batch_size=batch_size,
+                workers=VIDEO_PREPROCESS_WORKERS,
+                max_in_flight=VIDEO_PIPELINE_MAX_IN_FLIGHT
+            )
+
+            def sampled_frames():
+                for frame_count, frame, sampled in sampler:
+                    if is_cancelled():
+                        break
+                    if sampled:
+                        # Regiao localizada aqui, na ordem dos frames: o estado do
+                        # rastreador nao depende da ordem das threads do pool
+                        yield frame_count, (frame, region_tracker.locate(frame))
+
+            results = pipeline.run(sampled_frames())
+            for frame_count, result in results:
+                if record_result(frame_count, result) or is_cancelled():
+                    break
+            # Encerra a decodificacao imediatamente em caso de parada antecipada
+            # ou cancelamento
+            results.close()
+
+            pipeline_stats = pipeline.get_stats()
+            stages = pipeline_stats['stages']
+            print(f"Pipeline: {pipeline_stats['wall_s']:.2f}s | utilizacao "
+                  + ", ".join(f"{name} {stage['utilization']*100:.0f}%"
+                              for name, stage in stages.items())
+                  + f" | gargalo: {pipeline_stats['bottleneck']}")
+        else:
+            # Preview: cada frame precisa do resultado imediatamente
+            for frame_count, frame, sampled in sampler:
+                if is_cancelled():
                     break
 
-            frame_count += 1
+                # Classificar a cada N frames
+                if sampled:
+                    pixels = prepare_frame(frame, region_tracker.locate(frame))
+                    result = classifier.classify_batch(pixels_to_tensor(pixels))[0]
+                    if record_result(frame_count, result):
+                        break
+
+                # *** ADAPTAÇÃO PRINCIPAL: Exibir apenas se show_window=True E display disponível ***
+                if last_result is not None:
+                    # Sobrepor resultado da classificacao no frame
+                    class_name = last_result['class_name']
+                    confidence = last_result['confidence']
+                    label = f"{class_name}: {confidence*100:.1f}%"
+
+                    # Fundo escuro para legibilidade
+                    (text_w, text_h), baseline = cv2.getTextSize(
+                        label, cv2.FONT_HERSHEY_SIMPLEX, 1.0, 2)
+                    cv2.rectangle(frame, (10, 10), (20 + text_w, 40 + text_h),
+                                  (0, 0, 0), -1)
+
+                    # Classe principal em verde
+                    cv2.putText(frame, label, (15, 35),
+                                cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 0), 2)
+
+                    # Todas as probabilidades em branco
+                    y_offset = 70
+                    for cls_name, prob in last_result['all_probabilities'].items():
+                        prob_text = f"{cls_name}: {prob*100:.1f}%"
+                        cv2.putText(frame, prob_text, (15, y_offset),
+                                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+                        y_offset += 25
+
+                    # Contador de frames
+                    cv2.putText(frame, f"Frame: {frame_count}/{total_frames}",
+                                (15, height - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+                                (200, 200, 200), 1)
+
+                    # *** EXIBIR JANELA (apenas se display disponível) ***
+                    cv2.imshow("Classificador de Raio-X", frame)
+
+                    # Check para fechar janela (apenas se janela aberta)
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        print("⏹️  Processamento interrompido pelo usuário")
+                        break
 
         cap.release()
         
@@ -224,49 +576,53 @@ def processar_video_xray(video_path, show_window=False):
         if can_show_window:
             cv2.destroyAllWindows()
 
-        if not frame_results:
+        if is_cancelled():
+            print("⏹️  Analise cancelada")
             return {
                 'success': False,
-                'error': 'Nenhum frame foi classificado com sucesso'
+                'cancelled': True,
+                'error': 'Analise cancelada'
             }
 
-        # Filtrar frames com confianca baixa
-        reliable_results = [
-            fr for fr in frame_results
-            if fr['confidence'] >= MIN_CONFIDENCE_THRESHOLD
-        ]
-
-        if not reliable_results:
-            reliable_results = frame_results
+        if not len(frame_store):
+            return {
+                'success': False,
+                'error': 'Nenhum frame foi classificado com sucesso'
+            }
 
-        filtered_count = len(frame_results) - len(reliable_results)
+        # Com parada antecipada, o ultimo resultado nao representa o trecho nao
+        # analisado; nos modos sequenciais, o fim real lido substitui a contagem
+        # do container (CAP_PROP_FRAME_COUNT), que e apenas uma estimativa
+        if stop_frame is not None:
+            analyzed_frames = stop_frame + 1
+        elif sampler.reached_end is not None:
+            analyzed_frames = sampler.reached_end
+        else:
+            analyzed_frames = total_frames
+        # O ultimo frame vale no maximo o intervalo em que a proxima amostra seria lida
+        frame_store.finalize(
+            analyzed_frames,
+            max_span=sampler.max_every_n if sampler.change_detector is not None else classify_every_n
+        )
+
+        # Votacao ponderada (pelo trecho de video que cada resultado representa),
+        # apenas com os frames de confianca suficiente
+        vote = frame_store.vote()
+        reliable_count = frame_store.reliable_frames or len(frame_store)
+
+        filtered_count = len(frame_store) - reliable_count
         if filtered_count > 0:
             print(f"Filtrados {filtered_count} frames com confianca "
                   f"abaixo de {MIN_CONFIDENCE_THRESHOLD*100:.0f}%")
 
-        # Votacao ponderada
-        class_labels = ['Covid-19', 'Normal', 'Pneumonia Viral', 'Pneumonia Bacteriana']
-        weighted_scores = {label: 0.0 for label in class_labels}
-
-        for fr in reliable_results:
-            for label in class_labels:
-                weighted_scores[label] += fr['all_probabilities'].get(label, 0.0)
-
-        dominant_class = max(weighted_scores, key=weighted_scores.get)
-
-        total_frames_used = len(reliable_results)
-        avg_probabilities = {
-            label: weighted_scores[label] / total_frames_used
-            for label in class_labels
-        }
-        avg_confidence = avg_probabilities[dominant_class]
-
-        class_counts = Counter(fr['class_name'] for fr in reliable_results)
+        dominant_class = vote['class_name']
+        avg_probabilities = vote['all_probabilities']
+        avg_confidence = vote['confidence']
 
         print(f"Votacao ponderada: {dominant_class} "
               f"(confianca media: {avg_confidence*100:.1f}%)")
 
-        return {
+        result = {
             'success': True,
             'final_classification': {
                 'success': True,
@@ -274,13 +630,26 @@ def processar_video_xray(video_path, show_window=False):
                 'confidence': avg_confidence,
                 'all_probabilities': avg_probabilities
             },
-            'total_frames_analyzed': len(frame_results),
-            'total_frames_reliable': len(reliable_results),
+            'total_frames_analyzed': len(frame_store),
+            'total_frames_reliable': reliable_count,
             'total_frames_video': total_frames,
             'fps': fps,
-            'frame_results': frame_results,
-            'classification_counts': dict(class_counts)
+            'classification_counts': frame_store.class_counts(),
+            'sampling': segment_stats['sampling'] if segment_stats else sampler.get_stats(),
+            'region_tracking': (segment_stats['region_tracking'] if segment_stats
+                                else region_tracker.get_stats()),
+            'early_stop': {
+                'enabled': early_stop is not None,
+                'stopped': stop_frame is not None,
+                'stop_frame': stop_frame,
+                'frames_skipped': max(0, total_frames - analyzed_frames) if stop_frame is not None else 0,
+                'margin_lower_bound': early_stop.margin_lower_bound if early_stop else None
+            },
+            'pipeline': pipeline_stats
         }
+        if include_frame_results:
+            result['frame_results'] = frame_store.frame_results()
+        return result
 
     except Exception as e:
         print(f"❌ Erro ao processar vídeo: {e}")
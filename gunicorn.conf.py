@@ -0,0 +1,49 @@
+"""
+Configuracao do Gunicorn (producao)
+===================================
+Usa as configuracoes GUNICORN_* do config.py e inicia o pool de workers de
+video uma unica vez, no master. Os workers web (forks do master) apenas
+enfileiram jobs; sem o hook, cada um iniciaria VIDEO_JOB_WORKERS processos
+com a propria copia do modelo.
+
+Uso:
+    gunicorn -c gunicorn.conf.py chatbot:app
+"""
+
+import os
+
+try:
+    from config import (
+        GUNICORN_WORKERS,
+        GUNICORN_THREADS,
+        GUNICORN_TIMEOUT,
+        GUNICORN_KEEPALIVE,
+        VIDEO_JOBS_ENABLED
+    )
+except ImportError:
+    # Fora de producao o config.py nao define as variaveis do Gunicorn
+    GUNICORN_WORKERS = int(os.getenv('GUNICORN_WORKERS', 2))
+    GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', 4))
+    GUNICORN_TIMEOUT = int(os.getenv('GUNICORN_TIMEOUT', 300))
+    GUNICORN_KEEPALIVE = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+    VIDEO_JOBS_ENABLED = os.getenv('VIDEO_JOBS_ENABLED', 'true').lower() == 'true'
+
+bind = f"0.0.0.0:{os.getenv('PORT', 8080)}"
+workers = GUNICORN_WORKERS
+threads = GUNICORN_THREADS
+timeout = GUNICORN_TIMEOUT
+keepalive = GUNICORN_KEEPALIVE
+
+
+def on_starting(server):
+    """Master: inicia o pool de workers de video do container."""
+    if VIDEO_JOBS_ENABLED:
+        from video_jobs import start_worker_pool
+        start_worker_pool()
+
+
+def on_exit(server):
+    """Master: encerra o pool ao desligar o servidor."""
+    if VIDEO_JOBS_ENABLED:
+        from video_jobs import stop_worker_pool
+        stop_worker_pool()
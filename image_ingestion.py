@@ -0,0 +1,246 @@
+"""
+Ingestao de Imagens de Raio-X
+=============================
+Decodifica o upload uma unica vez e produz tudo o que o fluxo de
+/upload_xray precisa:
+
+- validacao barata pelo cabecalho (dimensoes) antes de decodificar;
+- decodificacao reduzida (draft/DCT scaling em JPEG, `reduce` nos demais);
+- miniatura JPEG comprimida para a verificacao via GPT-4o Vision;
+- tensor float32 (1, 256, 256, 3) pronto para o modelo.
+
+Para frames de video (arrays BGR/cinza do OpenCV) ha um caminho direto,
+sem PIL: `prepare_frame` recorta, reduz com INTER_AREA e aplica o CLAHE
+ja na imagem pequena; `pixels_to_tensor` replica os canais e escreve
+float32 direto no buffer do lote.
+"""
+
+import base64
+import os
+from io import BytesIO
+
+import cv2
+import numpy as np
+from PIL import Image, UnidentifiedImageError
+
+try:
+    from config import (
+        IMAGE_SIZE,
+        XRAY_MAX_IMAGE_PIXELS,
+        XRAY_VISION_THUMBNAIL_SIZE,
+        XRAY_VISION_THUMBNAIL_QUALITY
+    )
+except ImportError:
+    # Fallback se config não importável (development edge case)
+    IMAGE_SIZE = (256, 256)
+    XRAY_MAX_IMAGE_PIXELS = int(os.getenv('XRAY_MAX_IMAGE_PIXELS', 50_000_000))
+    XRAY_VISION_THUMBNAIL_SIZE = int(os.getenv('XRAY_VISION_THUMBNAIL_SIZE', 512))
+    XRAY_VISION_THUMBNAIL_QUALITY = int(os.getenv('XRAY_VISION_THUMBNAIL_QUALITY', 85))
+
+# Filtro de redimensionamento (mesmo padrao do Image.resize usado ate aqui)
+RESAMPLE_FILTER = Image.Resampling.BICUBIC
+
+
+class ImageIngestionError(ValueError):
+    """Upload invalido: formato nao reconhecido, corrompido ou grande demais."""
+
+
+class IngestedImage:
+    """
+    Resultado da ingestao de uma imagem.
+
+    Attributes:
+        image: Imagem PIL decodificada (possivelmente ja reduzida), RGB ou L
+        tensor: Entrada do modelo com shape (1, 256, 256, 3) float32
+        vision_data_url: Miniatura JPEG em data URL para o GPT-4o Vision
+        original_size: Dimensoes (largura, altura) do arquivo enviado
+        format: Formato detectado pelo PIL (JPEG, PNG, ...)
+    """
+
+    def __init__(self, image, tensor, vision_data_url, original_size, format):
+        self.image = image
+        self.tensor = tensor
+        self.vision_data_url = vision_data_url
+        self.original_size = original_size
+        self.format = format
+
+
+def _normalize_mode(image: Image.Image) -> Image.Image:
+    """Reduz a imagem a L (tons de cinza) ou RGB."""
+    if image.mode in ('L', 'RGB'):
+        return image
+    if image.mode in ('I;16', 'I;16B', 'I;16L', 'I'):
+        # Radiografias de 16 bits: reescalar para 8 bits. Imagens 'I' (32 bits
+        # com sinal) podem ter valores negativos, cortados em 0; uma imagem sem
+        # nenhum valor positivo fica preta
+        array = np.clip(np.asarray(image, dtype=np.float32), 0.0, None)
+        peak = float(array.max())
+        scale = 255.0 / peak if peak > 0 else 0.0
+        return Image.fromarray((array * scale).astype(np.uint8), mode='L')
+    return image.convert('RGB')
+
+
+def image_to_tensor(image: Image.Image) -> np.ndarray:
+    """
+    Converte uma imagem PIL no tensor de entrada do modelo.
+
+    Redimensiona para IMAGE_SIZE e normaliza para [0, 1] diretamente em
+    float32. Imagens em tons de cinza sao redimensionadas com um unico
+    canal e replicadas para 3 canais apenas no final.
+
+    Returns:
+        numpy.ndarray: Array float32 com shape (1, 256, 256, 3)
+    """
+    image = _normalize_mode(image)
+    resized = image.resize(IMAGE_SIZE, RESAMPLE_FILTER)
+
+    tensor = np.empty((1, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+    pixels = np.asarray(resized, dtype=np.float32)
+    if pixels.ndim == 2:
+        pixels = pixels[..., np.newaxis]
+    np.multiply(pixels, 1.0 / 255.0, out=tensor[0], casting='unsafe')
+
+    return tensor
+
+
+def prepare_frame(frame: np.ndarray, bbox: tuple = None, clahe: bool = True) -> np.ndarray:
+    """
+    Frame de video -> pixels em tons de cinza no tamanho do modelo.
+
+    Recorte (view, sem copia), conversao para cinza apenas da regiao,
+    reducao com INTER_AREA e CLAHE na imagem ja reduzida: todas as copias
+    apos o recorte tem o tamanho da entrada do modelo.
+
+    Args:
+        frame: Array BGR (H, W, 3) ou cinza (H, W), uint8
+        bbox: Regiao (x, y, w, h) do raio-X, ou None para o frame inteiro
+        clahe: Aplicar a equalizacao CLAHE (clipLimit 2.0, grade 8x8)
+
+    Returns:
+        numpy.ndarray: uint8 com shape (256, 256)
+    """
+    if bbox is not None:
+        x, y, w, h = bbox
+        frame = frame[y:y + h, x:x + w]
+
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    pixels = cv2.resize(gray, IMAGE_SIZE, interpolation=cv2.INTER_AREA)
+
+    if clahe:
+        pixels = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(pixels)
+    return pixels
+
+
+def pixels_to_tensor(pixels: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """
+    Escreve pixels uint8 (cinza ou RGB) como float32 em [0, 1] com 3 canais.
+
+    Args:
+        pixels: (256, 256) ou (256, 256, 3) uint8; um tensor float32
+                (1, 256, 256, 3) ja pronto e apenas copiado
+        out: Destino (1, 256, 256, 3) ou (256, 256, 3), por exemplo uma
+             fatia do buffer do lote; alocado se None
+
+    Returns:
+        numpy.ndarray: `out`
+    """
+    if out is None:
+        out = np.empty((1, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+
+    if pixels.dtype == np.float32:
+        out[...] = pixels.reshape(out.shape)
+        return out
+
+    if pixels.ndim == 2:
+        pixels = pixels[..., np.newaxis]
+    # Replicacao dos canais por broadcasting, direto no destino
+    np.multiply(pixels, np.float32(1.0 / 255.0), out=out.reshape(pixels.shape[:2] + (3,)),
+                casting='unsafe')
+    return out
+
+
+def frame_to_tensor(frame: np.ndarray, bbox: tuple = None, clahe: bool = True,
+                    out: np.ndarray = None) -> np.ndarray:
+    """Frame de video -> tensor (1, 256, 256, 3) float32; ver `prepare_frame`."""
+    return pixels_to_tensor(prepare_frame(frame, bbox, clahe), out)
+
+
+def encode_vision_thumbnail(image: Image.Image,
+                            max_side: int = XRAY_VISION_THUMBNAIL_SIZE,
+                            quality: int = XRAY_VISION_THUMBNAIL_QUALITY) -> str:
+    """
+    Gera uma miniatura JPEG em data URL para a verificacao via visao.
+
+    Substitui o PNG em resolucao total: uma foto de 12 MP passa a custar
+    dezenas de KB de base64 em vez de megabytes.
+    """
+    thumbnail = _normalize_mode(image)
+    if max(thumbnail.size) > max_side:
+        thumbnail = thumbnail.copy()
+        thumbnail.thumbnail((max_side, max_side), Image.Resampling.BILINEAR)
+
+    buffered = BytesIO()
+    thumbnail.save(buffered, format='JPEG', quality=quality)
+    encoded = base64.b64encode(buffered.getvalue()).decode('utf-8')
+
+    return f"data:image/jpeg;base64,{encoded}"
+
+
+def ingest_image(stream, max_pixels: int = XRAY_MAX_IMAGE_PIXELS,
+                 thumbnail_size: int = XRAY_VISION_THUMBNAIL_SIZE) -> IngestedImage:
+    """
+    Le, valida e decodifica um upload de imagem uma unica vez.
+
+    Args:
+        stream: Arquivo (ou file-like) com a imagem enviada
+        max_pixels: Limite de largura x altura aceito
+        thumbnail_size: Lado maximo da miniatura para o GPT-4o Vision
+
+    Returns:
+        IngestedImage: Imagem reduzida, tensor do modelo e miniatura
+
+    Raises:
+        ImageIngestionError: Se a imagem for invalida ou grande demais
+    """
+    try:
+        # Image.open le apenas o cabecalho; os pixels ainda nao foram decodificados
+        image = Image.open(stream)
+    except (UnidentifiedImageError, Image.DecompressionBombError) as e:
+        raise ImageIngestionError(f"Imagem invalida: {e}") from e
+
+    original_size = image.size
+    width, height = original_size
+    if width * height > max_pixels:
+        raise ImageIngestionError(
+            f"Imagem grande demais: {width}x{height} "
+            f"({width * height / 1_000_000:.1f} MP, maximo {max_pixels / 1_000_000:g} MP)"
+        )
+
+    # Menor resolucao que ainda atende o modelo e a miniatura
+    target = max(max(IMAGE_SIZE), thumbnail_size)
+    image_format = image.format
+
+    try:
+        if image_format == 'JPEG':
+            # Decodificacao com escala DCT (1/2, 1/4, 1/8) direto no decoder
+            image.draft(image.mode if image.mode in ('L', 'RGB') else 'RGB', (target, target))
+            image.load()
+        else:
+            image.load()
+            # `reduce` nao aceita paleta, 1 bit nem 16 bits: normalizar antes
+            image = _normalize_mode(image)
+            factor = min(image.size[0] // target, image.size[1] // target)
+            if factor > 1:
+                image = image.reduce(factor)
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ImageIngestionError(f"Erro ao decodificar imagem: {e}") from e
+
+    image = _normalize_mode(image)
+
+    return IngestedImage(
+        image=image,
+        tensor=image_to_tensor(image),
+        vision_data_url=encode_vision_thumbnail(image, max_side=thumbnail_size),
+        original_size=original_size,
+        format=image_format
+    )
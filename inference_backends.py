@@ -0,0 +1,254 @@
+"""
+Backends de Inferencia do Classificador de Raio-X
+=================================================
+Runtimes intercambiaveis para executar o modelo de raio-X:
+
+- keras:  modelo `.keras` no TensorFlow completo (tf.function ou model.predict)
+- onnx:   modelo exportado para ONNX executado no ONNX Runtime
+- tflite: modelo exportado para TFLite (float, INT8 dinamico ou estatico)
+
+Todos recebem lotes preprocessados (N, 256, 256, 3) float32 e retornam
+as probabilidades (N, 4), de forma que `XRayClassifier` produz o mesmo
+dicionario de resultado independente do runtime escolhido. Quando o
+modelo expoe a camada penultima (entrada da camada de classificacao), as
+features (N, D) saem do mesmo forward pass para o gate de
+out-of-distribution (`ood_gate.py`).
+"""
+
+import importlib
+import logging
+import os
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('keras', 'onnx', 'tflite')
+INFERENCE_MODES = ('compiled', 'predict')
+
+
+class InferenceBackend:
+    """Interface comum dos runtimes de inferencia."""
+
+    name = 'base'
+    inference_mode = None
+
+    def predict_with_features(self, batch: np.ndarray):
+        """
+        Executa o modelo em um lote (N, 256, 256, 3) float32.
+
+        Returns:
+            tuple: (probabilidades (N, 4), features (N, D) ou None)
+        """
+        raise NotImplementedError
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """Executa o modelo e retorna apenas as probabilidades (N, 4)."""
+        return self.predict_with_features(batch)[0]
+
+
+def build_feature_model(model):
+    """
+    Cria um modelo com duas saidas: probabilidades e features penultimas.
+
+    As features sao a entrada da ultima camada (a Dense de classificacao),
+    portanto saem do mesmo forward pass sem custo adicional.
+    """
+    from tensorflow import keras
+
+    features = model.layers[-1].input
+    return keras.Model(inputs=model.inputs, outputs=[model.outputs[0], features])
+
+
+def _split_outputs(outputs):
+    """Separa probabilidades e features das saidas de um modelo exportado."""
+    if len(outputs) == 1:
+        return np.asarray(outputs[0], dtype=np.float32), None
+
+    # A saida de probabilidades e a de menor dimensao (4 classes)
+    ordered = sorted(outputs, key=lambda output: output.shape[-1])
+    return (np.asarray(ordered[0], dtype=np.float32),
+            np.asarray(ordered[-1], dtype=np.float32))
+
+
+class KerasBackend(InferenceBackend):
+    """
+    Executa o modelo Keras carregado no TensorFlow.
+
+    No modo 'compiled' o modelo e envolvido uma unica vez em uma
+    tf.function com assinatura fixa (N, H, W, 3) float32 e aquecido no
+    carregamento, evitando o custo de `model.predict`, que monta um data
+    adapter e uma step function a cada chamada.
+    """
+
+    name = 'keras'
+
+    def __init__(self, model, image_size, inference_mode: str = 'compiled',
+                 jit_compile: bool = False):
+        self.model = model
+        self.image_size = image_size
+        self.jit_compile = jit_compile
+        self.inference_mode = inference_mode
+        self._infer_fn = None
+
+        try:
+            self.feature_model = build_feature_model(model)
+        except Exception as e:
+            logger.warning(f"Features penultimas indisponiveis: {e}")
+            self.feature_model = None
+
+        if self.inference_mode not in INFERENCE_MODES:
+            logger.warning(f"Modo de inferencia desconhecido '{self.inference_mode}', "
+                           f"usando 'predict'")
+            self.inference_mode = 'predict'
+
+        if self.inference_mode == 'compiled':
+            self._build_inference_fn()
+
+    def _build_inference_fn(self):
+        """Rastreia (e compila, com XLA) a funcao de inferencia."""
+        try:
+            import tensorflow as tf
+
+            model = self.feature_model or self.model
+            height, width = self.image_size
+            signature = [tf.TensorSpec(shape=(None, height, width, 3), dtype=tf.float32)]
+
+            @tf.function(input_signature=signature, jit_compile=self.jit_compile)
+            def infer(batch):
+                return model(batch, training=False)
+
+            # Aquecimento: rastreia antes da primeira requisicao
+            infer(tf.zeros((1, height, width, 3), dtype=tf.float32))
+
+            self._infer_fn = infer
+            logger.info(f"Inferencia compilada pronta (XLA: {'sim' if self.jit_compile else 'nao'})")
+
+        except Exception as e:
+            logger.warning(f"Falha ao compilar inferencia, usando model.predict: {e}")
+            self._infer_fn = None
+            self.inference_mode = 'predict'
+
+    def predict_with_features(self, batch: np.ndarray):
+        if self._infer_fn is not None:
+            outputs = self._infer_fn(batch)
+        else:
+            outputs = (self.feature_model or self.model).predict(batch, verbose=0)
+
+        if self.feature_model is None:
+            return np.asarray(outputs), None
+        probabilities, features = outputs
+        return np.asarray(probabilities), np.asarray(features)
+
+
+class OnnxBackend(InferenceBackend):
+    """Executa um modelo ONNX no ONNX Runtime (CPU)."""
+
+    name = 'onnx'
+
+    def __init__(self, model_path, num_threads: int = None):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            logger.error("❌ onnxruntime não instalado!")
+            logger.error("Execute: pip install onnxruntime")
+            raise
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.model_path = str(model_path)
+        self.session = ort.InferenceSession(
+            self.model_path, sess_options=options, providers=['CPUExecutionProvider']
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict_with_features(self, batch: np.ndarray):
+        return _split_outputs(self.session.run(None, {self.input_name: batch}))
+
+
+def _create_tflite_interpreter(model_path: str, num_threads: int = None):
+    """Usa o runtime TFLite mais leve disponivel, caindo para tf.lite."""
+    for module_name in ('ai_edge_litert.interpreter', 'tflite_runtime.interpreter'):
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError:
+            continue
+        return module.Interpreter(model_path=model_path, num_threads=num_threads)
+
+    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+    import tensorflow as tf
+    return tf.lite.Interpreter(model_path=model_path, num_threads=num_threads)
+
+
+class TFLiteBackend(InferenceBackend):
+    """
+    Executa um modelo TFLite (float ou quantizado em INT8).
+
+    O interpretador nao e thread-safe, entao as chamadas sao serializadas;
+    o micro-batching do classificador continua agrupando pedidos concorrentes.
+    """
+
+    name = 'tflite'
+
+    def __init__(self, model_path, num_threads: int = None):
+        self.model_path = str(model_path)
+        self.interpreter = _create_tflite_interpreter(self.model_path, num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._outputs = self.interpreter.get_output_details()
+        self._batch_size = int(self._input['shape'][0])
+        self._lock = threading.Lock()
+
+    def _resize(self, batch_size: int):
+        self.interpreter.resize_tensor_input(
+            self._input['index'], [batch_size] + list(self._input['shape'][1:])
+        )
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._outputs = self.interpreter.get_output_details()
+        self._batch_size = batch_size
+
+    def _read_output(self, details) -> np.ndarray:
+        output = self.interpreter.get_tensor(details['index'])
+        scale, zero_point = details['quantization']
+        if details['dtype'] != np.float32 and scale:
+            output = (output.astype(np.float32) - zero_point) * scale
+        return np.array(output, dtype=np.float32)
+
+    def predict_with_features(self, batch: np.ndarray):
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self._resize(batch.shape[0])
+
+            data = batch
+            scale, zero_point = self._input['quantization']
+            if self._input['dtype'] != np.float32 and scale:
+                info = np.iinfo(self._input['dtype'])
+                data = np.clip(np.round(batch / scale + zero_point), info.min, info.max)
+            self.interpreter.set_tensor(self._input['index'], data.astype(self._input['dtype']))
+
+            self.interpreter.invoke()
+
+            return _split_outputs([self._read_output(details) for details in self._outputs])
+
+
+def load_backend(name: str, model_path, num_threads: int = None) -> InferenceBackend:
+    """
+    Carrega um backend de arquivo exportado (onnx ou tflite).
+
+    O backend keras e construido diretamente pelo `XRayClassifier`, pois
+    depende do modelo Keras ja carregado.
+    """
+    if not os.path.exists(str(model_path)):
+        raise FileNotFoundError(f"Modelo {name} nao encontrado em: {model_path}")
+
+    if name == 'onnx':
+        return OnnxBackend(model_path, num_threads=num_threads)
+    if name == 'tflite':
+        return TFLiteBackend(model_path, num_threads=num_threads)
+
+    raise ValueError(f"Backend desconhecido: {name} (use: {', '.join(BACKENDS)})")
@@ -0,0 +1,248 @@
+"""
+Micro-batching de Inferencia
+============================
+Agrupa chamadas concorrentes de inferencia em um unico forward pass.
+
+Cada chamada a `MicroBatcher.submit` entra em uma fila; uma thread de
+fundo coleta os pedidos durante uma janela curta (tamanho maximo de lote
+ou tempo maximo de espera), executa a funcao de predicao uma unica vez
+com o lote empilhado e devolve a cada chamador a sua propria linha do
+resultado.
+
+Nenhum chamador espera para sempre: `submit` desiste apos `timeout_s` (o
+pedido abandonado sai do lote), erros da predicao chegam a todos os
+pedidos do lote e, se a propria thread de fundo falhar, os pedidos
+pendentes e os seguintes recebem o erro.
+"""
+
+import queue
+import threading
+import time
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Limites (inclusivos) dos buckets dos histogramas
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+QUEUE_WAIT_MS_BUCKETS = (0.5, 1, 2, 5, 10, 20, 50, 100, 250, 1000)
+
+
+class Histogram:
+    """Histograma simples com buckets fixos, seguro para uso entre threads."""
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self._counts = [0] * (len(self.bounds) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """Registra uma observacao no bucket correspondente."""
+        index = len(self.bounds)
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value
+            self._max = max(self._max, value)
+
+    def snapshot(self) -> dict:
+        """Retorna contagens por bucket, total, media e maximo."""
+        with self._lock:
+            buckets = {f"<={bound:g}": count for bound, count in zip(self.bounds, self._counts)}
+            buckets['+inf'] = self._counts[-1]
+            return {
+                'count': self._count,
+                'mean': self._sum / self._count if self._count else 0.0,
+                'max': self._max,
+                'buckets': buckets
+            }
+
+
+class _PendingRequest:
+    """Pedido aguardando a execucao do lote."""
+
+    __slots__ = ('item', 'enqueued_at', 'event', 'result', 'error', 'cancelled')
+
+    def __init__(self, item):
+        self.item = item
+        self.enqueued_at = time.perf_counter()
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.cancelled = False
+
+    def fail(self, error: BaseException):
+        if not self.event.is_set():
+            self.error = error
+            self.event.set()
+
+
+class MicroBatcher:
+    """
+    Fila de inferencia com agrupamento dinamico.
+
+    Args:
+        predict_fn: Funcao que recebe um array (N, ...) e retorna um array
+            (N, ...) ou uma tupla de arrays com N linhas cada.
+        max_batch_size: Numero maximo de itens por forward pass.
+        max_wait_ms: Tempo maximo que o primeiro item do lote espera por
+            companhia antes do lote ser executado.
+        timeout_s: Espera maxima de `submit` pelo resultado (None = sem limite).
+    """
+
+    def __init__(self, predict_fn, max_batch_size: int = 8, max_wait_ms: float = 5.0,
+                 name: str = 'inference', timeout_s: float = 30.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self.timeout_s = timeout_s
+        self._failure = None
+
+        self.batch_size_histogram = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_histogram = Histogram(QUEUE_WAIT_MS_BUCKETS)
+
+        self._queue = queue.Queue()
+        self._stopped = False
+        self._thread = threading.Thread(
+            target=self._run, name=f"{name}-batcher", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Micro-batching ativo ({name}): lote maximo {self.max_batch_size}, "
+                    f"espera maxima {self.max_wait * 1000:.1f} ms")
+
+    def submit(self, item: np.ndarray, timeout: float = None):
+        """
+        Enfileira um item (sem dimensao de batch) e aguarda o resultado.
+
+        Args:
+            item: Entrada sem a dimensao de batch
+            timeout: Espera maxima em segundos (padrao: `timeout_s`)
+
+        Returns:
+            A linha do resultado correspondente ao item (ou tupla de linhas).
+        """
+        if self._failure is not None:
+            raise self._failure
+        if self._stopped:
+            raise RuntimeError(f"MicroBatcher '{self.name}' encerrado")
+
+        request = _PendingRequest(item)
+        self._queue.put(request)
+
+        if not request.event.wait(self.timeout_s if timeout is None else timeout):
+            # Abandonado: a thread de fundo descarta o pedido ao montar o lote
+            request.cancelled = True
+            raise TimeoutError(f"Tempo esgotado aguardando inferencia ({self.name})")
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def close(self):
+        """Encerra a thread de agrupamento."""
+        if not self._stopped:
+            self._stopped = True
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+    def get_stats(self) -> dict:
+        """Histogramas de tamanho de lote e espera na fila (ms)."""
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'queue_depth': self._queue.qsize(),
+            'batch_size': self.batch_size_histogram.snapshot(),
+            'queue_wait_ms': self.queue_wait_histogram.snapshot()
+        }
+
+    def _collect_batch(self, batch):
+        """Completa o lote (iniciado com o primeiro item) ate encher ou esgotar a janela."""
+        deadline = batch[0].enqueued_at + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    request = self._queue.get(timeout=remaining)
+                else:
+                    # Janela esgotada: aproveitar apenas o que ja esta na fila
+                    request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if request is None:
+                self._stopped = True
+                break
+            batch.append(request)
+
+        return batch
+
+    def _run(self):
+        error = RuntimeError(f"MicroBatcher '{self.name}' encerrado")
+        batch = []
+        try:
+            while True:
+                first = self._queue.get()
+                if first is None:
+                    break
+
+                batch = [first]
+                self._collect_batch(batch)
+                self._execute(batch)
+                batch = []
+
+                if self._stopped:
+                    break
+        except BaseException as e:
+            # Falha da propria thread (nao da predicao): os pedidos do lote
+            # atual, os da fila e os proximos recebem o erro
+            logger.error(f"Thread de micro-batching ({self.name}) encerrada: {e}")
+            error = RuntimeError(f"MicroBatcher '{self.name}' falhou: {e}")
+            self._failure = error
+            self._stopped = True
+            for request in batch:
+                request.fail(error)
+
+        # Falhar pedidos que ficaram na fila apos o encerramento
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                request.fail(error)
+
+    def _execute(self, batch):
+        batch = [request for request in batch if not request.cancelled]
+        if not batch:
+            return
+        started = time.perf_counter()
+        for request in batch:
+            self.queue_wait_histogram.observe((started - request.enqueued_at) * 1000)
+        self.batch_size_histogram.observe(len(batch))
+
+        try:
+            outputs = self.predict_fn(np.stack([request.item for request in batch]))
+
+            for i, request in enumerate(batch):
+                if isinstance(outputs, tuple):
+                    request.result = tuple(
+                        output[i] if output is not None else None for output in outputs
+                    )
+                else:
+                    request.result = outputs[i]
+        except Exception as e:
+            logger.error(f"Erro na inferencia em lote ({self.name}): {e}")
+            for request in batch:
+                request.error = e
+        finally:
+            for request in batch:
+                request.event.set()
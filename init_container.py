@@ -56,10 +56,12 @@ def main():
         
         # 4. Validar que chromasaude/ existe
         logger.info("")
-        from config import CHROMA_PATH, MODEL_PATH
+        from config import CHROMA_PATH, MODEL_PATH, XRAY_FAST_MODEL_PATH, fast_model_available
         
-        # Verificar modelo
-        if MODEL_PATH.exists():
+        # Verificar modelo (o artefato rápido dispensa o .keras)
+        if fast_model_available():
+            logger.info(f"✅ Modelo de X-ray disponível (artefato rápido: {XRAY_FAST_MODEL_PATH})")
+        elif MODEL_PATH.exists():
             model_size = MODEL_PATH.stat().st_size
             if model_size > 1_000_000:  # > 1MB
                 logger.info(f"✅ Modelo de X-ray disponível ({model_size / 1_000_000:.1f}MB)")
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Servidor de Modelo Compartilhado
+================================
+Processo unico que carrega o modelo de raio-X e atende todos os workers
+do Gunicorn, em vez de cada worker carregar a sua propria copia do
+TensorFlow.
+
+- Transporte: socket Unix local (uma mensagem JSON por linha)
+- Tensores: passados por memoria compartilhada (`multiprocessing.shared_memory`);
+  o servidor le o lote do bloco do cliente e escreve as probabilidades e as
+  features penultimas de volta no mesmo bloco
+- Micro-batching: as requisicoes de todos os workers entram na mesma fila
+  (`MicroBatcher`) e sao agrupadas em um unico forward pass
+
+Uso:
+    python model_server.py --socket /tmp/xray_model.sock
+
+    # workers (mesma maquina/container)
+    XRAY_MODEL_SERVER_SOCKET=/tmp/xray_model.sock python chatbot.py
+
+Com XRAY_MODEL_SERVER_SOCKET definido, `get_classifier()` retorna um
+`RemoteXRayClassifier`, com a mesma interface de `XRayClassifier`.
+"""
+
+import argparse
+import atexit
+import json
+import logging
+import os
+import queue
+import signal
+import socket
+import socketserver
+import sys
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+try:
+    from config import XRAY_MODEL_SERVER_SOCKET, XRAY_MODEL_SERVER_TIMEOUT
+except ImportError:
+    # Fallback se config não importável (development edge case)
+    XRAY_MODEL_SERVER_SOCKET = os.getenv('XRAY_MODEL_SERVER_SOCKET', '')
+    XRAY_MODEL_SERVER_TIMEOUT = float(os.getenv('XRAY_MODEL_SERVER_TIMEOUT', 30))
+
+from inference_backends import InferenceBackend
+from xray_classifier import XRayClassifier
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = '/tmp/xray_model.sock'
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """
+    Anexa um bloco criado por outro processo sem registra-lo no
+    resource_tracker deste processo (que o removeria ao encerrar).
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        from multiprocessing import resource_tracker
+        block = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(block._name, 'shared_memory')
+        return block
+
+
+def _send(stream, message: dict):
+    stream.write(json.dumps(message).encode() + b'\n')
+    stream.flush()
+
+
+def _receive(stream):
+    line = stream.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+# ================================================================================
+# SERVIDOR
+# ================================================================================
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Conexao persistente de um cliente; atende mensagens ate o EOF."""
+
+    def handle(self):
+        blocks = {}
+        try:
+            while True:
+                message = _receive(self.rfile)
+                if message is None:
+                    break
+                try:
+                    reply = self.server.dispatch(message, blocks)
+                except Exception as e:
+                    logger.error(f"Erro no servidor de modelo: {e}")
+                    reply = {'ok': False, 'error': str(e)}
+                _send(self.wfile, reply)
+        finally:
+            for block in blocks.values():
+                block.close()
+
+
+class ModelServer(socketserver.ThreadingUnixStreamServer):
+    """
+    Servidor de inferencia sobre socket Unix.
+
+    Cada conexao e atendida em uma thread; o `MicroBatcher` do
+    classificador agrupa as requisicoes concorrentes de todas elas.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, classifier: XRayClassifier):
+        self.classifier = classifier
+        self.socket_path = socket_path
+        self._remove_stale_socket()
+        super().__init__(socket_path, _RequestHandler)
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.socket_path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except OSError:
+            os.unlink(self.socket_path)
+        else:
+            raise RuntimeError(f"Servidor de modelo ja em execucao em {self.socket_path}")
+        finally:
+            probe.close()
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def dispatch(self, message: dict, blocks: dict) -> dict:
+        op = message.get('op')
+        if op == 'predict':
+            return self._predict(message, blocks)
+        if op == 'ping':
+            return {
+                'ok': True,
+                'pid': os.getpid(),
+                'backend': self.classifier.backend_name,
+                'inference_mode': self.classifier.inference_mode
+            }
+        if op == 'stats':
+            return {'ok': True, 'stats': self.classifier.get_inference_stats()}
+        raise ValueError(f"Operacao desconhecida: {op}")
+
+    def _predict(self, message: dict, blocks: dict) -> dict:
+        name = message['shm']
+        block = blocks.get(name)
+        if block is None:
+            # Um bloco por conexao: o cliente so troca ao precisar de mais espaco
+            for old in blocks.values():
+                old.close()
+            blocks.clear()
+            block = blocks[name] = _attach_shared_memory(name)
+
+        shape = tuple(message['shape'])
+        batch = np.array(np.ndarray(shape, dtype=np.float32, buffer=block.buf))
+
+        batcher = self.classifier.batcher
+        if batcher is not None and shape[0] == 1:
+            probabilities, features = batcher.submit(batch[0])
+            probabilities = probabilities[np.newaxis]
+            features = features[np.newaxis] if features is not None else None
+        else:
+            probabilities, features = self.classifier.predict_batch_with_features(batch)
+
+        # Saidas escritas no inicio do mesmo bloco: probabilidades e depois features
+        probabilities = np.asarray(probabilities, dtype=np.float32)
+        np.ndarray(probabilities.shape, dtype=np.float32, buffer=block.buf)[...] = probabilities
+        reply = {'ok': True, 'probabilities': list(probabilities.shape), 'features': None}
+
+        if features is not None:
+            features = np.asarray(features, dtype=np.float32)
+            if probabilities.nbytes + features.nbytes <= block.size:
+                np.ndarray(features.shape, dtype=np.float32, buffer=block.buf,
+                           offset=probabilities.nbytes)[...] = features
+                reply['features'] = list(features.shape)
+
+        return reply
+
+
+# ================================================================================
+# CLIENTE
+# ================================================================================
+
+class _Channel:
+    """Conexao com o servidor e o bloco de memoria compartilhada associado."""
+
+    def __init__(self, socket_path: str, timeout: float):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        self.socket.connect(socket_path)
+        self.stream = self.socket.makefile('rwb')
+        self.block = None
+
+    def reserve(self, nbytes: int) -> shared_memory.SharedMemory:
+        if self.block is None or self.block.size < nbytes:
+            self._release_block()
+            self.block = shared_memory.SharedMemory(create=True, size=nbytes)
+        return self.block
+
+    def call(self, message: dict) -> dict:
+        _send(self.stream, message)
+        reply = _receive(self.stream)
+        if reply is None:
+            raise ConnectionError("Servidor de modelo encerrou a conexao")
+        if not reply.get('ok'):
+            raise RuntimeError(reply.get('error', 'Erro desconhecido no servidor de modelo'))
+        return reply
+
+    def _release_block(self):
+        if self.block is not None:
+            self.block.close()
+            self.block.unlink()
+            self.block = None
+
+    def close(self):
+        self._release_block()
+        try:
+            self.stream.close()
+            self.socket.close()
+        except OSError:
+            pass
+
+
+class RemoteBackend(InferenceBackend):
+    """
+    Backend que delega o forward pass ao `ModelServer`.
+
+    Mantem um pool de conexoes (uma por requisicao concorrente), cada uma
+    com o seu bloco de memoria compartilhada reaproveitado entre chamadas.
+    """
+
+    name = 'remote'
+
+    def __init__(self, socket_path: str, timeout: float = XRAY_MODEL_SERVER_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._channels = []
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _acquire(self) -> _Channel:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            channel = _Channel(self.socket_path, self.timeout)
+            with self._lock:
+                self._channels.append(channel)
+            return channel
+
+    def _discard(self, channel: _Channel):
+        channel.close()
+        with self._lock:
+            if channel in self._channels:
+                self._channels.remove(channel)
+
+    def call(self, message: dict) -> dict:
+        """Envia uma mensagem de controle ('ping', 'stats')."""
+        channel = self._acquire()
+        try:
+            reply = channel.call(message)
+        except Exception:
+            self._discard(channel)
+            raise
+        self._idle.put(channel)
+        return reply
+
+    def predict_with_features(self, batch: np.ndarray):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        channel = self._acquire()
+        try:
+            block = channel.reserve(batch.nbytes)
+            np.ndarray(batch.shape, dtype=np.float32, buffer=block.buf)[...] = batch
+
+            reply = channel.call({'op': 'predict', 'shm': block.name, 'shape': list(batch.shape)})
+
+            probabilities = np.array(np.ndarray(
+                reply['probabilities'], dtype=np.float32, buffer=block.buf
+            ))
+            features = None
+            if reply['features'] is not None:
+                features = np.array(np.ndarray(
+                    reply['features'], dtype=np.float32, buffer=block.buf,
+                    offset=probabilities.nbytes
+                ))
+        except Exception:
+            self._discard(channel)
+            raise
+
+        self._idle.put(channel)
+        return probabilities, features
+
+    def close(self):
+        with self._lock:
+            channels, self._channels = self._channels, []
+        for channel in channels:
+            channel.close()
+
+
+class RemoteXRayClassifier(XRayClassifier):
+    """
+    `XRayClassifier` que nao carrega o modelo: o forward pass e feito no
+    `ModelServer`. Pre-processamento, gate local, cache e GPT-4o Vision
+    continuam no worker.
+    """
+
+    def __init__(self, socket_path: str = None):
+        self.socket_path = socket_path or XRAY_MODEL_SERVER_SOCKET or DEFAULT_SOCKET
+        super().__init__(backend='remote')
+
+    def _load_model(self):
+        self.backend = RemoteBackend(self.socket_path)
+        self.model_format = 'remote'
+        try:
+            info = self.backend.call({'op': 'ping'})
+            self.inference_mode = info.get('inference_mode')
+            logger.info(f"Usando servidor de modelo em {self.socket_path} "
+                        f"(pid {info.get('pid')}, backend {info.get('backend')})")
+        except Exception as e:
+            # A conexao e refeita a cada requisicao; o servidor pode subir depois
+            logger.warning(f"Servidor de modelo indisponivel em {self.socket_path}: {e}")
+
+    def _initialize_batcher(self):
+        # O servidor agrupa as requisicoes de todos os workers
+        self.batcher = None
+
+    def get_inference_stats(self) -> dict:
+        stats = super().get_inference_stats()
+        try:
+            stats['server'] = self.backend.call({'op': 'stats'})['stats']
+        except Exception as e:
+            stats['server'] = {'error': str(e)}
+        return stats
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(description="Servidor de modelo de raio-X compartilhado")
+    parser.add_argument('--socket', default=XRAY_MODEL_SERVER_SOCKET or DEFAULT_SOCKET,
+                        help='Caminho do socket Unix')
+    parser.add_argument('--backend', help='keras, onnx ou tflite (padrao: XRAY_BACKEND)')
+    parser.add_argument('--inference-mode', help='compiled ou predict (padrao: XRAY_INFERENCE_MODE)')
+    args = parser.parse_args()
+
+    classifier = XRayClassifier(inference_mode=args.inference_mode, backend=args.backend)
+    if not classifier.is_model_loaded():
+        logger.error("❌ Modelo nao carregado")
+        sys.exit(1)
+
+    server = ModelServer(args.socket, classifier)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    logger.info(f"✅ Servidor de modelo ouvindo em {args.socket}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if classifier.batcher is not None:
+            classifier.batcher.close()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Gate Local de Out-of-Distribution para Raio-X
+=============================================
+Decide se uma imagem e um raio-X de torax usando as features penultimas
+do ResNet50, calculadas no mesmo forward pass da classificacao.
+
+As features sao pontuadas pela distancia de Mahalanobis ao centroide mais
+proximo das 4 classes (covariancia compartilhada com shrinkage), ajustada
+offline em imagens de referencia. O veredito tem tres estados:
+
+- 'xray':      distancia baixa - raio-X com confianca, sem chamada remota
+- 'not_xray':  distancia alta - rejeitado localmente, sem chamada remota
+- 'uncertain': zona intermediaria - escalar para o GPT-4o Vision
+
+Uso (ajuste offline):
+    python ood_gate.py fit --xray-dir <pasta_raio_x> [--negative-dir <pasta_outras_imagens>]
+
+    Subpastas de --xray-dir com o nome das classes (Covid-19, Normal, ...)
+    sao usadas como rotulos; sem elas, usa-se a classe predita pelo modelo.
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VERDICT_XRAY = 'xray'
+VERDICT_NOT_XRAY = 'not_xray'
+VERDICT_UNCERTAIN = 'uncertain'
+
+
+class MahalanobisGate:
+    """
+    Detector de out-of-distribution por distancia de Mahalanobis.
+
+    Attributes:
+        class_means: Centroides das classes (C, D)
+        precision: Inversa da covariancia compartilhada (D, D)
+        in_threshold: Distancias ate este valor sao raio-X com confianca
+        out_threshold: Distancias acima deste valor sao rejeitadas localmente
+    """
+
+    def __init__(self, class_means, precision, in_threshold: float, out_threshold: float):
+        self.class_means = np.asarray(class_means, dtype=np.float32)
+        self.precision = np.asarray(precision, dtype=np.float32)
+        self.in_threshold = float(in_threshold)
+        self.out_threshold = float(out_threshold)
+
+    @property
+    def feature_dim(self) -> int:
+        return self.class_means.shape[1]
+
+    def distance(self, features: np.ndarray) -> np.ndarray:
+        """
+        Distancia de Mahalanobis ao centroide mais proximo.
+
+        Args:
+            features: Array (N, D) ou (D,)
+
+        Returns:
+            numpy.ndarray: Distancias (N,)
+        """
+        features = np.atleast_2d(np.asarray(features, dtype=np.float32))
+        # (N, C, D): diferenca de cada amostra para cada centroide
+        diffs = features[:, np.newaxis, :] - self.class_means[np.newaxis, :, :]
+        squared = np.einsum('ncd,de,nce->nc', diffs, self.precision, diffs)
+        return np.sqrt(np.maximum(squared.min(axis=1), 0.0))
+
+    def verdict(self, features: np.ndarray) -> str:
+        """Classifica uma unica amostra em 'xray', 'not_xray' ou 'uncertain'."""
+        distance = float(self.distance(features)[0])
+        if distance <= self.in_threshold:
+            return VERDICT_XRAY
+        if distance > self.out_threshold:
+            return VERDICT_NOT_XRAY
+        return VERDICT_UNCERTAIN
+
+    @classmethod
+    def fit(cls, features, labels, negative_features=None, shrinkage: float = 0.1,
+            in_quantile: float = 0.90, out_quantile: float = 0.995,
+            out_margin: float = 1.5) -> 'MahalanobisGate':
+        """
+        Ajusta centroides, covariancia compartilhada e limiares.
+
+        Args:
+            features: Features penultimas de raios-X de referencia (N, D)
+            labels: Classe de cada amostra (N,)
+            negative_features: Features de imagens que NAO sao raio-X
+                (opcional); quando presentes, definem o limiar de rejeicao
+            shrinkage: Peso da regularizacao da covariancia em direcao a
+                identidade escalada (necessario quando N < D)
+            in_quantile: Quantil das distancias de referencia aceito sem
+                chamada remota
+            out_quantile: Quantil das distancias de referencia acima do
+                qual (vezes `out_margin`) a imagem e rejeitada localmente
+        """
+        features = np.asarray(features, dtype=np.float64)
+        labels = np.asarray(labels)
+        classes = np.unique(labels)
+
+        class_means = np.stack([features[labels == c].mean(axis=0) for c in classes])
+        centered = features - class_means[np.searchsorted(classes, labels)]
+
+        covariance = centered.T @ centered / max(len(features) - len(classes), 1)
+        scale = np.trace(covariance) / covariance.shape[0]
+        covariance = (1 - shrinkage) * covariance + shrinkage * scale * np.eye(covariance.shape[0])
+        precision = np.linalg.pinv(covariance)
+
+        gate = cls(class_means, precision, 0.0, 0.0)
+        reference = gate.distance(features)
+        gate.in_threshold = float(np.quantile(reference, in_quantile))
+        gate.out_threshold = float(np.quantile(reference, out_quantile) * out_margin)
+
+        if negative_features is not None and len(negative_features):
+            negative = gate.distance(negative_features)
+            # Rejeitar localmente apenas o que esta alem de quase todo raio-X
+            # de referencia e ainda assim abaixo da maioria dos negativos
+            gate.out_threshold = float(max(
+                np.quantile(reference, out_quantile),
+                min(gate.out_threshold, np.quantile(negative, 0.05))
+            ))
+            rejected = float(np.mean(negative > gate.out_threshold))
+            logger.info(f"Negativos rejeitados localmente: {rejected * 100:.1f}%")
+
+        gate.out_threshold = max(gate.out_threshold, gate.in_threshold)
+        logger.info(f"Gate ajustado: in <= {gate.in_threshold:.2f}, "
+                    f"out > {gate.out_threshold:.2f} ({len(features)} referencias)")
+        return gate
+
+    def save(self, path):
+        """Salva o gate em um arquivo .npz."""
+        np.savez(
+            path,
+            class_means=self.class_means,
+            precision=self.precision,
+            in_threshold=self.in_threshold,
+            out_threshold=self.out_threshold
+        )
+
+    @classmethod
+    def load(cls, path) -> 'MahalanobisGate':
+        """Carrega um gate salvo com `save`."""
+        with np.load(path) as data:
+            return cls(
+                data['class_means'],
+                data['precision'],
+                float(data['in_threshold']),
+                float(data['out_threshold'])
+            )
+
+
+def _extract_features(classifier, paths, batch_size: int = 32):
+    """Calcula as features penultimas de uma lista de imagens."""
+    from PIL import Image
+
+    features, probabilities = [], []
+    for start in range(0, len(paths), batch_size):
+        tensors = []
+        for path in paths[start:start + batch_size]:
+            with Image.open(path) as image:
+                tensors.append(classifier.preprocess_image(image)[0])
+        probs, feats = classifier.predict_batch_with_features(np.stack(tensors))
+        if feats is None:
+            raise RuntimeError("O backend carregado nao expoe as features penultimas")
+        features.append(feats)
+        probabilities.append(probs)
+
+    return np.concatenate(features), np.concatenate(probabilities)
+
+
+def _list_images(directory):
+    extensions = {'.png', '.jpg', '.jpeg', '.bmp', '.webp'}
+    return sorted(p for p in Path(directory).rglob('*') if p.suffix.lower() in extensions)
+
+
+def fit_from_directories(classifier, xray_dir, negative_dir=None, **kwargs) -> MahalanobisGate:
+    """Ajusta o gate a partir de pastas de imagens de referencia."""
+    from xray_classifier import CLASS_LABELS
+
+    paths = _list_images(xray_dir)
+    if not paths:
+        raise ValueError(f"Nenhuma imagem encontrada em {xray_dir}")
+
+    features, probabilities = _extract_features(classifier, paths)
+
+    # Rotulos pelas subpastas (quando nomeadas como as classes) ou pela predicao
+    label_ids = {name: class_id for class_id, name in CLASS_LABELS.items()}
+    labels = np.array([
+        label_ids.get(path.parent.name, int(np.argmax(probs)))
+        for path, probs in zip(paths, probabilities)
+    ])
+
+    negative_features = None
+    if negative_dir:
+        negative_paths = _list_images(negative_dir)
+        if negative_paths:
+            negative_features, _ = _extract_features(classifier, negative_paths)
+
+    return MahalanobisGate.fit(features, labels, negative_features=negative_features, **kwargs)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    from config import XRAY_OOD_GATE_PATH
+    from xray_classifier import XRayClassifier
+
+    parser = argparse.ArgumentParser(description="Ajustar o gate local de out-of-distribution")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    fit = subparsers.add_parser('fit', help='Ajustar o gate em imagens de referencia')
+    fit.add_argument('--xray-dir', required=True, help='Raios-X de torax de referencia')
+    fit.add_argument('--negative-dir', help='Imagens que nao sao raio-X de torax (opcional)')
+    fit.add_argument('--output', default=str(XRAY_OOD_GATE_PATH))
+    fit.add_argument('--in-quantile', type=float, default=0.90)
+    fit.add_argument('--out-quantile', type=float, default=0.995)
+    fit.add_argument('--shrinkage', type=float, default=0.1)
+
+    args = parser.parse_args()
+
+    classifier = XRayClassifier(backend='keras')
+    if not classifier.is_model_loaded():
+        logger.error("❌ Modelo nao carregado")
+        sys.exit(1)
+
+    gate = fit_from_directories(
+        classifier, args.xray_dir, args.negative_dir,
+        shrinkage=args.shrinkage,
+        in_quantile=args.in_quantile,
+        out_quantile=args.out_quantile
+    )
+    gate.save(args.output)
+    logger.info(f"✅ Gate salvo em {args.output}")
@@ -0,0 +1,320 @@
+"""
+Cache de Resultados Enderecado por Conteudo
+===========================================
+Cache LRU com TTL para resultados caros (verificacao via GPT-4o Vision,
+classificacao do raio-X), com uma camada opcional em SQLite compartilhada
+entre os processos do servidor.
+
+As chaves sao derivadas do conteudo: hash SHA-256 dos pixels decodificados
+e, opcionalmente, um hash perceptual (dHash) que tambem reconhece
+re-encodes quase identicos da mesma imagem. O dHash tem apenas 64 bits e
+radiografias diferentes podem colidir: um acerto por ele e so um
+candidato, confirmado pela miniatura guardada junto com o valor. Para
+videos, o SHA-256 do arquivo e calculado enquanto o upload e gravado em
+disco.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(image: Image.Image) -> str:
+    """Hash SHA-256 dos pixels decodificados (inclui modo e dimensoes)."""
+    digest = hashlib.sha256()
+    digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def save_stream_with_hash(stream, path, chunk_size: int = 1 << 20) -> str:
+    """
+    Grava um upload em disco e calcula o SHA-256 do arquivo no mesmo passo.
+
+    Cada bloco lido do upload e gravado e acumulado no hash, sem uma
+    segunda leitura do arquivo.
+
+    Returns:
+        str: hash SHA-256 (hex) do conteudo gravado
+    """
+    digest = hashlib.sha256()
+    with open(path, 'wb') as output:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            output.write(chunk)
+    return digest.hexdigest()
+
+
+def perceptual_hash(image: Image.Image, hash_size: int = 8) -> str:
+    """
+    Hash perceptual (dHash) de 64 bits.
+
+    Compara o brilho de pixels vizinhos em uma miniatura 9x8 em tons de
+    cinza; re-encodes JPEG e pequenas variacoes de escala produzem o mesmo hash.
+    """
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    value = int(''.join('1' if bit else '0' for bit in bits), 2)
+    return f"{value:0{hash_size * hash_size // 4}x}"
+
+
+def image_signature(image: Image.Image, size: int = 32) -> str:
+    """Miniatura size x size em tons de cinza (hex), para confirmar acertos do dHash."""
+    small = image.convert('L').resize((size, size), Image.Resampling.BILINEAR)
+    return small.tobytes().hex()
+
+
+def signature_difference(a: str, b: str) -> float:
+    """Diferenca absoluta media (0-255) entre duas miniaturas de `image_signature`."""
+    first = np.frombuffer(bytes.fromhex(a), dtype=np.uint8).astype(np.int16)
+    second = np.frombuffer(bytes.fromhex(b), dtype=np.uint8).astype(np.int16)
+    if first.shape != second.shape:
+        return float('inf')
+    return float(np.mean(np.abs(first - second)))
+
+
+class ImageCacheKeys:
+    """
+    Chaves de cache de uma imagem, da mais especifica para a mais tolerante:
+    `px:<sha256>` e, opcionalmente, `ph:<dhash>`.
+
+    Os valores sao gravados com a miniatura da imagem (`image_signature`).
+    O hash dos pixels basta para um acerto; pelo hash perceptual, o valor
+    so e aceito se a miniatura guardada diferir da consultada em no maximo
+    `max_difference` (0-255, media por pixel).
+
+    Args:
+        image: Imagem decodificada
+        use_perceptual_hash: Incluir a chave do dHash
+        max_difference: Tolerancia da confirmacao do dHash
+    """
+
+    def __init__(self, image: Image.Image, use_perceptual_hash: bool = False,
+                 max_difference: float = 2.0):
+        self.keys = [f"px:{content_hash(image)}"]
+        self.signature = None
+        self.max_difference = max_difference
+        if use_perceptual_hash:
+            self.keys.append(f"ph:{perceptual_hash(image)}")
+            self.signature = image_signature(image)
+
+    def __bool__(self) -> bool:
+        return bool(self.keys)
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def _confirmed(self, key: str, entry) -> bool:
+        if not isinstance(entry, dict) or 'value' not in entry:
+            return False
+        if key.split(':')[-2] != 'ph':
+            return True
+        stored = entry.get('signature')
+        return (stored is not None and self.signature is not None
+                and signature_difference(stored, self.signature) <= self.max_difference)
+
+    def get(self, cache, namespace: str):
+        """Valor em cache sob `namespace` (confirmado, se achado pelo dHash), ou None."""
+        entry = cache.get_any([f"{namespace}:{key}" for key in self.keys], accept=self._confirmed)
+        return entry['value'] if entry is not None else None
+
+    def set(self, cache, namespace: str, value):
+        """Grava o valor sob todas as chaves, com a miniatura para confirmacao."""
+        cache.set_all([f"{namespace}:{key}" for key in self.keys],
+                      {'value': value, 'signature': self.signature})
+
+
+def image_cache_keys(image: Image.Image, use_perceptual_hash: bool = False,
+                     max_difference: float = 2.0) -> ImageCacheKeys:
+    """Chaves de cache de uma imagem (ver `ImageCacheKeys`)."""
+    return ImageCacheKeys(image, use_perceptual_hash, max_difference)
+
+
+class ResultCache:
+    """
+    Cache LRU com TTL em memoria e camada opcional em SQLite.
+
+    Args:
+        max_entries: Numero maximo de entradas em memoria (e no disco)
+        ttl_seconds: Validade de cada entrada
+        sqlite_path: Arquivo SQLite compartilhado entre processos (opcional)
+        name: Nome usado nos logs e estatisticas
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600,
+                 sqlite_path=None, name: str = 'cache'):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.sqlite_path = str(sqlite_path) if sqlite_path else None
+        self.name = name
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0}
+
+        if self.sqlite_path:
+            self._initialize_sqlite()
+
+    # ------------------------------------------------------------------ SQLite
+
+    @contextmanager
+    def _connect(self):
+        """Conexao curta por operacao (segura entre threads e processos)."""
+        connection = sqlite3.connect(self.sqlite_path, timeout=5)
+        try:
+            connection.execute('PRAGMA journal_mode=WAL')
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def _initialize_sqlite(self):
+        try:
+            with self._connect() as connection:
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS results ('
+                    ' key TEXT PRIMARY KEY,'
+                    ' value TEXT NOT NULL,'
+                    ' expires_at REAL NOT NULL,'
+                    ' last_access REAL NOT NULL)'
+                )
+                connection.execute(
+                    'CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)'
+                )
+            logger.info(f"Cache {self.name} em disco: {self.sqlite_path}")
+        except Exception as e:
+            logger.error(f"Erro ao inicializar cache {self.name} em disco: {e}")
+            self.sqlite_path = None
+
+    def _disk_get(self, key: str):
+        try:
+            with self._connect() as connection:
+                row = connection.execute(
+                    'SELECT value, expires_at FROM results WHERE key = ?', (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                now = time.time()
+                if row[1] <= now:
+                    connection.execute('DELETE FROM results WHERE key = ?', (key,))
+                    return None
+                connection.execute(
+                    'UPDATE results SET last_access = ? WHERE key = ?', (now, key)
+                )
+                return json.loads(row[0]), row[1]
+        except Exception as e:
+            logger.warning(f"Erro ao ler cache {self.name} em disco: {e}")
+            return None
+
+    def _disk_set(self, key: str, value, expires_at: float):
+        try:
+            now = time.time()
+            with self._connect() as connection:
+                connection.execute(
+                    'INSERT OR REPLACE INTO results (key, value, expires_at, last_access) '
+                    'VALUES (?, ?, ?, ?)',
+                    (key, json.dumps(value), expires_at, now)
+                )
+                connection.execute('DELETE FROM results WHERE expires_at <= ?', (now,))
+                # LRU no disco: manter apenas as entradas acessadas mais recentemente
+                connection.execute(
+                    'DELETE FROM results WHERE key IN ('
+                    ' SELECT key FROM results ORDER BY last_access DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,)
+                )
+        except Exception as e:
+            logger.warning(f"Erro ao gravar cache {self.name} em disco: {e}")
+
+    # ------------------------------------------------------------------ API
+
+    def _lookup(self, key: str):
+        """Busca na memoria e depois no disco; retorna (valor, camada) ou (None, None)."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    return value, 'memory'
+                del self._entries[key]
+
+        if self.sqlite_path:
+            found = self._disk_get(key)
+            if found is not None:
+                value, expires_at = found
+                self._store_in_memory(key, value, expires_at)
+                return value, 'disk'
+
+        return None, None
+
+    def get(self, key: str):
+        """Retorna o valor em cache ou None (expirado ou ausente)."""
+        return self.get_any([key])
+
+    def get_any(self, keys, accept=None):
+        """
+        Retorna o primeiro valor encontrado entre as chaves (em ordem).
+
+        Com `accept(chave, valor)`, valores recusados sao ignorados (contam
+        como falha se nenhuma outra chave acertar).
+        """
+        for key in keys:
+            value, tier = self._lookup(key)
+            if tier is not None and (accept is None or accept(key, value)):
+                with self._lock:
+                    self._counters[f"{tier}_hits"] += 1
+                return value
+
+        with self._lock:
+            self._counters['misses'] += 1
+        return None
+
+    def set(self, key: str, value):
+        """Armazena um valor serializavel em JSON."""
+        expires_at = time.time() + self.ttl_seconds
+        self._store_in_memory(key, value, expires_at)
+        with self._lock:
+            self._counters['sets'] += 1
+        if self.sqlite_path:
+            self._disk_set(key, value, expires_at)
+
+    def set_all(self, keys, value):
+        """Armazena o mesmo valor sob todas as chaves."""
+        for key in keys:
+            self.set(key, value)
+
+    def _store_in_memory(self, key: str, value, expires_at: float):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def get_stats(self) -> dict:
+        """Contadores de acertos/falhas e ocupacao."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+        hits = stats['memory_hits'] + stats['disk_hits']
+        lookups = hits + stats['misses']
+        stats['hit_rate'] = hits / lookups if lookups else 0.0
+        stats['max_entries'] = self.max_entries
+        stats['ttl_seconds'] = self.ttl_seconds
+        stats['disk'] = self.sqlite_path
+        return stats
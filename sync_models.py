@@ -77,6 +77,87 @@ def download_model_from_gcs(bucket_name: str, model_path: Path) -> bool:
         return False
 
 
+# Artefato de carregamento rapido (fast_model.py); o manifesto vai por ultimo,
+# pois a sua presenca indica um artefato completo
+FAST_MODEL_REMOTE_DIR = "models/melhor_modelo.fastload"
+FAST_MODEL_FILES = ("weights.bin", "manifest.json")
+
+
+def download_fast_model_from_gcs(bucket_name: str, artifact_dir: Path) -> bool:
+    """
+    Baixa o artefato de carregamento rapido do modelo (pesos sem compressao).
+
+    Args:
+        bucket_name: Nome do bucket GCS
+        artifact_dir: Diretorio local do artefato (melhor_modelo.fastload)
+
+    Returns:
+        True se download foi bem-sucedido, False caso contrário
+    """
+    try:
+        from google.cloud import storage
+    except ImportError:
+        logger.error("❌ google-cloud-storage não instalado!")
+        logger.error("Execute: pip install google-cloud-storage")
+        return False
+
+    try:
+        client = storage.Client()
+        bucket = client.bucket(bucket_name)
+
+        blobs = [bucket.blob(f"{FAST_MODEL_REMOTE_DIR}/{name}") for name in FAST_MODEL_FILES]
+        if not all(blob.exists() for blob in blobs):
+            logger.info(f"ℹ️  Artefato rápido não encontrado em gs://{bucket_name}/{FAST_MODEL_REMOTE_DIR}")
+            return False
+
+        logger.info(f"📥 Baixando artefato rápido do modelo do bucket GCS: {bucket_name}")
+        artifact_dir.mkdir(parents=True, exist_ok=True)
+        for name, blob in zip(FAST_MODEL_FILES, blobs):
+            blob.download_to_filename(str(artifact_dir / name))
+
+        total_size = sum((artifact_dir / name).stat().st_size for name in FAST_MODEL_FILES)
+        logger.info(f"✅ Artefato rápido baixado com sucesso! ({total_size / 1_000_000:.1f}MB)")
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Erro ao baixar artefato rápido do GCS: {str(e)}")
+        return False
+
+
+def upload_fast_model_to_gcs(bucket_name: str, artifact_dir: Path) -> bool:
+    """
+    Envia o artefato de carregamento rápido (gerado com `python fast_model.py build`).
+
+    Returns:
+        True se upload foi bem-sucedido, False caso contrário
+    """
+    try:
+        from google.cloud import storage
+    except ImportError:
+        logger.error("❌ google-cloud-storage não instalado!")
+        logger.error("Execute: pip install google-cloud-storage")
+        return False
+
+    if not all((artifact_dir / name).exists() for name in FAST_MODEL_FILES):
+        logger.error(f"❌ Artefato rápido não existe: {artifact_dir}")
+        logger.error("   Gere com: python fast_model.py build")
+        return False
+
+    try:
+        logger.info(f"📤 Enviando artefato rápido para bucket GCS: {bucket_name}")
+        client = storage.Client()
+        bucket = client.bucket(bucket_name)
+        for name in FAST_MODEL_FILES:
+            bucket.blob(f"{FAST_MODEL_REMOTE_DIR}/{name}").upload_from_filename(str(artifact_dir / name))
+
+        logger.info(f"✅ Artefato rápido enviado! gs://{bucket_name}/{FAST_MODEL_REMOTE_DIR}")
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Erro ao enviar artefato rápido para GCS: {str(e)}")
+        return False
+
+
 def upload_model_to_gcs(bucket_name: str, model_path: Path) -> bool:
     """
     Envia modelo treinado para Google Cloud Storage.
@@ -158,6 +239,12 @@ def sync_models_startup() -> bool:
     logger.info("🔄 Sincronizando Modelos com Google Cloud Storage...")
     logger.info("=" * 70)
     
+    # Preferir o artefato de carregamento rápido (download menor, sem
+    # descompactar o .keras no startup); ausente, baixar o .keras
+    if download_fast_model_from_gcs(bucket_name, model_path.with_suffix('.fastload')):
+        logger.info("✅ Modelo pronto para usar (artefato rápido)!")
+        return True
+
     # Tentar baixar do GCS
     success = download_model_from_gcs(bucket_name, model_path)
     
@@ -228,6 +315,10 @@ if __name__ == "__main__":
     local_model = Path("Departamento_Medico/melhor_modelo.keras")
     
     if action == "upload":
+        local_fast_model = local_model.with_suffix('.fastload')
+        if local_fast_model.exists():
+            upload_fast_model_to_gcs(bucket, local_fast_model)
+
         if upload_model_to_gcs(bucket, local_model):
             print("\n" + "=" * 70)
             print("✅ Upload concluído com sucesso!")
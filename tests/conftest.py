@@ -0,0 +1,7 @@
+import os
+import sys
+from pathlib import Path
+
+# config.py exige a chave da OpenAI na importacao; os testes nao a usam
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
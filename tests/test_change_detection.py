@@ -0,0 +1,78 @@
+import numpy as np
+
+from video_sampling import ChangeDetector, FrameSampler
+
+
+class FakeCapture:
+    """VideoCapture minima sobre uma lista de frames (grab/retrieve)."""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.position = -1
+
+    def grab(self):
+        self.position += 1
+        return self.position < len(self.frames)
+
+    def retrieve(self):
+        return True, self.frames[self.position]
+
+
+def _frame(value: int, shape=(64, 64, 3)) -> np.ndarray:
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def test_first_frame_is_a_change():
+    detector = ChangeDetector(threshold=3.0)
+    assert detector.changed(_frame(100))
+    assert detector.last_difference is None
+
+
+def test_difference_below_threshold_is_not_a_change():
+    detector = ChangeDetector(threshold=3.0)
+    detector.changed(_frame(100))
+
+    noisy = _frame(100).astype(np.int16)
+    noisy[::2] += 4
+    assert not detector.changed(noisy.astype(np.uint8))
+    assert detector.last_difference == 2.0
+
+
+def test_slow_drift_accumulates_against_the_reference():
+    detector = ChangeDetector(threshold=3.0)
+    detector.changed(_frame(100))
+
+    assert not detector.changed(_frame(102))
+    assert not detector.changed(_frame(103))
+    assert detector.changed(_frame(104))
+    assert not detector.changed(_frame(106))
+
+
+def test_grayscale_and_bgr_frames_are_compared_alike():
+    detector = ChangeDetector(threshold=3.0)
+    detector.changed(_frame(100, shape=(48, 64)))
+    assert not detector.changed(_frame(100))
+    assert detector.changed(_frame(120, shape=(48, 64)))
+
+
+def test_sampler_skips_static_frames_and_widens_interval():
+    frames = [_frame(100)] * 60 + [_frame(200)] * 20
+    sampler = FrameSampler(FakeCapture(frames), every_n=4, mode='grab',
+                           change_detector=ChangeDetector(threshold=3.0))
+
+    sampled = [frame_number for frame_number, _, _ in sampler]
+
+    # Estatico: 0 e classificado; depois o intervalo dobra (2 -> 4 -> 8 -> 16)
+    # ate o maximo de 4x every_n, e a mudanca em 60 volta ao intervalo minimo
+    assert sampled[0] == 0
+    assert 60 < sampled[1] <= 60 + 16
+    assert len(sampled) == 2
+    stats = sampler.get_stats()
+    assert stats['frames_unchanged'] == stats['frames_decoded'] - 2
+    assert stats['frames_decoded'] < 80 // 4
+
+
+def test_sampler_without_detector_keeps_fixed_interval():
+    frames = [_frame(100)] * 20
+    sampler = FrameSampler(FakeCapture(frames), every_n=5, mode='grab')
+    assert [frame_number for frame_number, _, _ in sampler] == [0, 5, 10, 15]
@@ -0,0 +1,39 @@
+import pytest
+
+import config
+from fast_model import MANIFEST_NAME, WEIGHTS_NAME
+
+
+@pytest.fixture
+def deploy(tmp_path, monkeypatch):
+    """Deploy sem o .keras: so a pasta de uploads existe."""
+    monkeypatch.setattr(config, 'MODEL_PATH', tmp_path / 'melhor_modelo.keras')
+    monkeypatch.setattr(config, 'XRAY_FAST_MODEL_PATH', tmp_path / 'melhor_modelo.fastload')
+    monkeypatch.setattr(config, 'XRAY_FAST_MODEL_ENABLED', True)
+    monkeypatch.setattr(config, 'UPLOAD_FOLDER', tmp_path)
+    return tmp_path
+
+
+def test_validate_config_accepts_fast_artifact_without_keras(deploy):
+    artifact = deploy / 'melhor_modelo.fastload'
+    artifact.mkdir()
+    (artifact / WEIGHTS_NAME).write_bytes(b'\0')
+    (artifact / MANIFEST_NAME).write_text('{}')
+
+    config.validate_config()
+
+
+def test_validate_config_requires_some_model(deploy):
+    with pytest.raises(RuntimeError):
+        config.validate_config()
+
+
+def test_disabled_fast_artifact_is_not_a_model(deploy, monkeypatch):
+    artifact = deploy / 'melhor_modelo.fastload'
+    artifact.mkdir()
+    (artifact / WEIGHTS_NAME).write_bytes(b'\0')
+    (artifact / MANIFEST_NAME).write_text('{}')
+    monkeypatch.setattr(config, 'XRAY_FAST_MODEL_ENABLED', False)
+
+    with pytest.raises(RuntimeError):
+        config.validate_config()
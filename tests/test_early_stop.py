@@ -0,0 +1,74 @@
+import numpy as np
+
+from video_early_stop import EarlyStopRule
+
+LABELS = ['Normal', 'Pneumonia', 'Covid']
+
+
+def _probabilities(normal: float, pneumonia: float) -> dict:
+    return {'Normal': normal, 'Pneumonia': pneumonia, 'Covid': 1.0 - normal - pneumonia}
+
+
+def test_never_stops_before_min_frames():
+    rule = EarlyStopRule(LABELS, min_frames=8, min_margin=0.2, consistent_frames=3)
+    stops = [rule.update(_probabilities(0.95, 0.03)) for _ in range(8)]
+
+    assert not any(stops[:7])
+    assert stops[7]
+    assert rule.leader() == 'Normal'
+    assert rule.margin_lower_bound > 0.2
+
+
+def test_noisy_split_does_not_stop():
+    rule = EarlyStopRule(LABELS, min_frames=4, min_margin=0.2, consistent_frames=1)
+    rng = np.random.default_rng(0)
+    for _ in range(40):
+        normal = float(rng.uniform(0.3, 0.6))
+        assert not rule.update(_probabilities(normal, 0.9 - normal))
+
+
+def test_recent_disagreement_blocks_stop():
+    rule = EarlyStopRule(LABELS, min_frames=4, min_margin=0.2, consistent_frames=3)
+    for _ in range(10):
+        rule.update(_probabilities(0.9, 0.05))
+    assert not rule.update(_probabilities(0.1, 0.85))
+    assert not rule.update(_probabilities(0.9, 0.05))
+    assert not rule.update(_probabilities(0.9, 0.05))
+    assert rule.update(_probabilities(0.9, 0.05))
+
+
+def test_weights_enter_totals():
+    rule = EarlyStopRule(LABELS)
+    rule.update(_probabilities(0.6, 0.3), weight=1.0)
+    rule.update(_probabilities(0.2, 0.7), weight=3.0)
+
+    assert np.allclose(rule.totals, [1.2, 2.4, 0.4])
+    assert rule.leader() == 'Pneumonia'
+
+
+def test_early_verdict_matches_full_scan():
+    # Videos sinteticos com classe verdadeira dominante e frames ruidosos:
+    # quando a regra para, a classe vencedora deve ser a da varredura completa
+    rng = np.random.default_rng(42)
+    stopped = disagreements = 0
+    for _ in range(300):
+        true_class = int(rng.integers(len(LABELS)))
+        frames = rng.dirichlet(np.ones(len(LABELS)), size=120) * 0.6
+        frames[:, true_class] += float(rng.uniform(0.1, 0.4))
+        frames /= frames.sum(axis=1, keepdims=True)
+
+        rule = EarlyStopRule(LABELS)
+        early = None
+        for row in frames:
+            if rule.update(dict(zip(LABELS, row))):
+                early = rule.leader()
+                break
+        if early is None:
+            continue
+
+        stopped += 1
+        full_scan = LABELS[int(np.argmax(frames.sum(axis=0)))]
+        disagreements += early != full_scan
+
+    assert stopped > 50
+    assert disagreements / stopped <= 0.01
@@ -0,0 +1,62 @@
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from image_ingestion import image_to_tensor, ingest_image
+
+SIZE = (3000, 2000)
+
+
+def _png(image: Image.Image) -> BytesIO:
+    buffer = BytesIO()
+    image.save(buffer, format='PNG')
+    buffer.seek(0)
+    return buffer
+
+
+def _gradient() -> np.ndarray:
+    return np.tile(np.linspace(0, 1, SIZE[0]), (SIZE[1], 1))
+
+
+@pytest.mark.parametrize('mode', ['P', '1', 'I;16'])
+def test_large_png_in_non_rgb_modes_is_reduced(mode):
+    if mode == 'I;16':
+        image = Image.fromarray((_gradient() * 65535).astype(np.uint16))
+    else:
+        image = Image.fromarray((_gradient() * 255).astype(np.uint8), mode='L').convert(mode)
+
+    ingested = ingest_image(_png(image))
+
+    assert ingested.original_size == SIZE
+    assert ingested.image.mode in ('L', 'RGB')
+    assert max(ingested.image.size) < max(SIZE)
+    assert ingested.tensor.shape == (1, 256, 256, 3)
+    assert ingested.tensor.dtype == np.float32
+
+
+def test_signed_image_clips_negative_values():
+    values = np.tile(np.linspace(-1000, 1000, 64), (64, 1)).astype(np.int32)
+    tensor = image_to_tensor(Image.fromarray(values))
+
+    assert Image.fromarray(values).mode == 'I'
+    assert tensor.min() == 0.0
+    assert tensor.max() == pytest.approx(1.0, abs=0.01)
+    assert np.all(tensor[0, :, :100] == 0.0)
+
+
+@pytest.mark.parametrize('value', [0, -500])
+def test_image_without_positive_values_is_black(value):
+    image = Image.fromarray(np.full((64, 64), value, dtype=np.int32))
+    with np.errstate(all='raise'):
+        tensor = image_to_tensor(image)
+    assert not tensor.any()
+
+
+def test_sixteen_bit_image_uses_full_range():
+    image = Image.fromarray(np.tile(np.linspace(0, 4095, 64), (64, 1)).astype(np.uint16))
+    tensor = image_to_tensor(image)
+
+    assert tensor.min() == 0.0
+    assert tensor.max() == pytest.approx(1.0, abs=0.01)
@@ -0,0 +1,148 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from inference_batcher import MicroBatcher
+
+
+def _double(batch):
+    return batch * 2
+
+
+def _submit_concurrently(batcher, count):
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        futures = [pool.submit(batcher.submit, np.full(3, i, dtype=np.float32))
+                   for i in range(count)]
+        return [future.result(timeout=10) for future in futures]
+
+
+def test_concurrent_calls_share_one_batch_and_get_their_own_row():
+    sizes = []
+
+    def predict(batch):
+        sizes.append(len(batch))
+        return _double(batch)
+
+    batcher = MicroBatcher(predict, max_batch_size=4, max_wait_ms=500)
+    try:
+        results = _submit_concurrently(batcher, 4)
+    finally:
+        batcher.close()
+
+    assert sizes == [4]
+    for i, row in enumerate(results):
+        assert np.array_equal(row, np.full(3, 2 * i))
+
+
+def test_full_batch_flushes_before_the_window():
+    sizes = []
+
+    def predict(batch):
+        sizes.append(len(batch))
+        return _double(batch)
+
+    batcher = MicroBatcher(predict, max_batch_size=2, max_wait_ms=5000)
+    try:
+        started = time.perf_counter()
+        _submit_concurrently(batcher, 2)
+        elapsed = time.perf_counter() - started
+    finally:
+        batcher.close()
+
+    assert sizes == [2]
+    assert elapsed < 2.5
+
+
+def test_lone_call_flushes_after_the_window():
+    batcher = MicroBatcher(_double, max_batch_size=8, max_wait_ms=50)
+    try:
+        started = time.perf_counter()
+        result = batcher.submit(np.ones(2))
+        elapsed = time.perf_counter() - started
+    finally:
+        batcher.close()
+
+    assert np.array_equal(result, [2, 2])
+    assert 0.04 <= elapsed < 2
+    assert batcher.get_stats()['batch_size']['count'] == 1
+
+
+def test_tuple_outputs_are_split_per_row():
+    batcher = MicroBatcher(lambda batch: (batch * 2, None), max_batch_size=1, max_wait_ms=0)
+    try:
+        probabilities, features = batcher.submit(np.ones(2))
+    finally:
+        batcher.close()
+
+    assert np.array_equal(probabilities, [2, 2])
+    assert features is None
+
+
+def test_prediction_error_reaches_every_caller_and_batcher_recovers():
+    calls = []
+
+    def predict(batch):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise ValueError('falha no modelo')
+        return _double(batch)
+
+    batcher = MicroBatcher(predict, max_batch_size=3, max_wait_ms=500)
+    try:
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futures = [pool.submit(batcher.submit, np.ones(1)) for _ in range(3)]
+            for future in futures:
+                with pytest.raises(ValueError):
+                    future.result(timeout=10)
+        assert np.array_equal(batcher.submit(np.ones(1)), [2])
+    finally:
+        batcher.close()
+
+
+def test_submit_times_out_with_the_configured_timeout():
+    release = threading.Event()
+    sizes = []
+
+    def predict(batch):
+        sizes.append(len(batch))
+        release.wait(5)
+        return _double(batch)
+
+    batcher = MicroBatcher(predict, max_batch_size=1, max_wait_ms=0, timeout_s=0.1)
+    try:
+        blocker = threading.Thread(target=lambda: batcher.submit(np.ones(1), timeout=5))
+        blocker.start()
+        time.sleep(0.05)
+
+        started = time.perf_counter()
+        with pytest.raises(TimeoutError):
+            batcher.submit(np.ones(1))
+        assert time.perf_counter() - started < 2
+    finally:
+        release.set()
+        blocker.join()
+        batcher.close()
+
+    # O pedido abandonado nao chega a ser executado
+    assert sizes == [1]
+
+
+def test_thread_failure_fails_pending_and_later_calls(monkeypatch):
+    batcher = MicroBatcher(_double, max_batch_size=4, max_wait_ms=0, timeout_s=5)
+
+    def broken(batch):
+        raise MemoryError('sem memoria')
+
+    monkeypatch.setattr(batcher, '_collect_batch', broken)
+    try:
+        started = time.perf_counter()
+        with pytest.raises(RuntimeError, match='falhou'):
+            batcher.submit(np.ones(1))
+        assert time.perf_counter() - started < 2
+        with pytest.raises(RuntimeError, match='falhou'):
+            batcher.submit(np.ones(1))
+    finally:
+        batcher.close()
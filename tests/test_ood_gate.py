@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from ood_gate import VERDICT_NOT_XRAY, VERDICT_UNCERTAIN, VERDICT_XRAY, MahalanobisGate
+
+DIM = 16
+
+
+def _reference(rng, per_class=200):
+    """Quatro classes gaussianas (features de raio-X de referencia)."""
+    centers = rng.normal(0, 4, size=(4, DIM))
+    features = np.concatenate([center + rng.normal(0, 1, size=(per_class, DIM))
+                               for center in centers])
+    labels = np.repeat(np.arange(4), per_class)
+    return features, labels, centers
+
+
+def test_distance_uses_nearest_centroid():
+    gate = MahalanobisGate([[0, 0], [10, 0]], np.eye(2), 1.0, 5.0)
+    distances = gate.distance(np.array([[1, 0], [9, 0], [5, 3]]))
+    assert np.allclose(distances, [1.0, 1.0, np.hypot(5, 3)])
+
+
+def test_verdict_bands():
+    gate = MahalanobisGate([[0, 0]], np.eye(2), 1.0, 5.0)
+    assert gate.verdict([0.5, 0]) == VERDICT_XRAY
+    assert gate.verdict([3, 0]) == VERDICT_UNCERTAIN
+    assert gate.verdict([6, 0]) == VERDICT_NOT_XRAY
+
+
+def test_fit_accepts_reference_and_rejects_far_features():
+    rng = np.random.default_rng(0)
+    features, labels, centers = _reference(rng)
+    gate = MahalanobisGate.fit(features, labels)
+
+    assert gate.feature_dim == DIM
+    assert 0 < gate.in_threshold <= gate.out_threshold
+
+    held_out = centers[np.arange(200) % 4] + rng.normal(0, 1, size=(200, DIM))
+    verdicts = [gate.verdict(sample) for sample in held_out]
+    assert verdicts.count(VERDICT_XRAY) / len(verdicts) >= 0.8
+    assert VERDICT_NOT_XRAY not in verdicts
+
+    far = centers.mean(axis=0) + rng.normal(0, 1, size=(50, DIM)) + 30
+    assert all(gate.verdict(sample) == VERDICT_NOT_XRAY for sample in far)
+
+
+def test_negatives_tighten_rejection_threshold():
+    rng = np.random.default_rng(1)
+    features, labels, centers = _reference(rng)
+    negatives = centers[0] + rng.normal(0, 1, size=(200, DIM)) + 6
+
+    plain = MahalanobisGate.fit(features, labels)
+    gate = MahalanobisGate.fit(features, labels, negative_features=negatives)
+
+    assert gate.out_threshold <= plain.out_threshold
+    assert gate.out_threshold >= np.quantile(gate.distance(features), 0.995)
+    rejected = np.mean(gate.distance(negatives) > gate.out_threshold)
+    assert rejected >= np.mean(plain.distance(negatives) > plain.out_threshold)
+
+
+def test_fit_with_fewer_samples_than_dimensions():
+    rng = np.random.default_rng(2)
+    features = rng.normal(size=(12, 64))
+    labels = np.repeat(np.arange(4), 3)
+
+    gate = MahalanobisGate.fit(features, labels)
+    assert np.all(np.isfinite(gate.distance(features)))
+    assert gate.in_threshold <= gate.out_threshold
+
+
+def test_save_load_round_trip(tmp_path):
+    rng = np.random.default_rng(3)
+    features, labels, _ = _reference(rng, per_class=50)
+    gate = MahalanobisGate.fit(features, labels)
+    path = tmp_path / 'gate.npz'
+    gate.save(path)
+
+    loaded = MahalanobisGate.load(path)
+    assert loaded.in_threshold == pytest.approx(gate.in_threshold)
+    assert loaded.out_threshold == pytest.approx(gate.out_threshold)
+    assert np.allclose(loaded.distance(features), gate.distance(features))
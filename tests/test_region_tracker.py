@@ -0,0 +1,46 @@
+import numpy as np
+
+from gravar_e_transcrever import XRayRegionTracker, detect_xray_bbox
+
+
+def _screen(box=(480, 180, 900, 720), size=(1080, 1920)):
+    """Visualizador escuro com um raio-X claro e texturizado em `box`."""
+    rng = np.random.default_rng(0)
+    frame = np.full(size + (3,), 25, dtype=np.uint8)
+    x, y, w, h = box
+    texture = rng.integers(150, 230, size=(h, w), dtype=np.uint8)
+    frame[y:y + h, x:x + w] = texture[..., None]
+    return frame
+
+
+def test_downscaled_detection_matches_full_resolution():
+    frame = _screen()
+    full = np.array(detect_xray_bbox(frame))
+    small = np.array(detect_xray_bbox(frame, max_width=320))
+
+    # Copia 6x menor: a caixa so pode variar pela quantizacao da reducao
+    assert np.all(np.abs(small - full) <= 12)
+    assert np.all(np.abs(full - (475, 175, 910, 730)) <= 2)
+
+
+def test_downscaled_detection_does_not_merge_nearby_panels():
+    # Painel claro (miniaturas do visualizador) a 30 px do raio-X: separado
+    # na deteccao original, deve continuar separado na copia reduzida
+    frame = _screen()
+    frame[180:900, 1410:1560] = 200
+
+    full = np.array(detect_xray_bbox(frame))
+    small = np.array(detect_xray_bbox(frame, max_width=320))
+    assert full[0] + full[2] < 1410
+    assert np.all(np.abs(small - full) <= 12)
+
+
+def test_tracker_reuses_box_until_layout_changes():
+    tracker = XRayRegionTracker()
+    first = tracker.locate(_screen())
+    assert tracker.locate(_screen()) == first
+
+    moved = tracker.locate(_screen(box=(200, 100, 700, 800)))
+    assert moved != first
+    assert tracker.get_stats() == {'detections': 2, 'reused': 1}
+
@@ -0,0 +1,91 @@
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from result_cache import ResultCache, image_cache_keys, perceptual_hash
+
+
+def _gradient(offset: int = 0) -> Image.Image:
+    row = np.linspace(0, 150, 256) + offset
+    return Image.fromarray(np.tile(row, (256, 1)).astype(np.uint8), mode='L').convert('RGB')
+
+
+def _reencoded(image: Image.Image) -> Image.Image:
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', quality=90)
+    buffer.seek(0)
+    return Image.open(buffer).convert('RGB')
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ResultCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_expired_entries_are_misses(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr('result_cache.time.time', lambda: clock[0])
+    cache = ResultCache(ttl_seconds=10)
+    cache.set('a', 1)
+
+    clock[0] += 9
+    assert cache.get('a') == 1
+    clock[0] += 2
+    assert cache.get('a') is None
+
+
+def test_sqlite_tier_is_shared_between_instances(tmp_path):
+    path = tmp_path / 'cache.sqlite'
+    ResultCache(sqlite_path=path).set('a', {'classe': 'Normal'})
+
+    other = ResultCache(sqlite_path=path)
+    assert other.get('a') == {'classe': 'Normal'}
+    assert other.get_stats()['disk_hits'] == 1
+    assert other.get('a') == {'classe': 'Normal'}
+    assert other.get_stats()['memory_hits'] == 1
+
+
+def test_pixel_hash_hit_is_returned():
+    cache = ResultCache()
+    image = _gradient()
+    image_cache_keys(image).set(cache, 'classify:m1', {'classe': 'Normal'})
+
+    assert image_cache_keys(image.copy()).get(cache, 'classify:m1') == {'classe': 'Normal'}
+
+
+def test_perceptual_hit_is_confirmed_for_reencoded_image():
+    cache = ResultCache()
+    image = _gradient()
+    image_cache_keys(image, use_perceptual_hash=True).set(cache, 'classify:m1', 'Normal')
+
+    reencoded = image_cache_keys(_reencoded(image), use_perceptual_hash=True)
+    assert reencoded.keys[0] != image_cache_keys(image).keys[0]
+    assert reencoded.get(cache, 'classify:m1') == 'Normal'
+
+
+def test_perceptual_collision_with_different_content_is_rejected():
+    cache = ResultCache()
+    image, brighter = _gradient(), _gradient(offset=60)
+    assert perceptual_hash(image) == perceptual_hash(brighter)
+
+    image_cache_keys(image, use_perceptual_hash=True).set(cache, 'classify:m1', 'Normal')
+
+    assert image_cache_keys(brighter, use_perceptual_hash=True).get(cache, 'classify:m1') is None
+    assert cache.get_stats()['misses'] == 1
+
+
+def test_namespace_isolates_models():
+    cache = ResultCache()
+    image = _gradient()
+    image_cache_keys(image).set(cache, 'classify:m1', 'Normal')
+
+    assert image_cache_keys(image).get(cache, 'classify:m2') is None
@@ -0,0 +1,61 @@
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from video_ffmpeg import FFmpegFrameReader, find_ffmpeg
+from video_sampling import ChangeDetector, FrameSampler
+
+pytestmark = pytest.mark.skipif(not find_ffmpeg(), reason='ffmpeg nao encontrado no PATH')
+
+
+def _intensity(frame_number: int) -> int:
+    # Trechos estaticos de 30 frames com variacao abaixo do limite do detector
+    return 60 * (frame_number // 30) + 4 * ((frame_number % 30) // 10)
+
+
+def _write_video(path, frames: int = 120, size=(64, 48)):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), 30, size)
+    for n in range(frames):
+        writer.write(np.full((size[1], size[0], 3), min(255, _intensity(n)), dtype=np.uint8))
+    writer.release()
+
+
+def test_discarded_frames_do_not_overwrite_kept_frames(tmp_path):
+    video = tmp_path / 'static.mp4'
+    _write_video(video)
+
+    cap = cv2.VideoCapture(str(video))
+    sampler = FrameSampler(
+        cap, 4, mode='ffmpeg', video_path=str(video), fps=30,
+        total_frames=int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+        change_detector=ChangeDetector(threshold=10.0), buffers=3
+    )
+    kept = []
+    for frame_number, frame, _ in sampler:
+        # Consumidor com ate buffers - 1 frames vivos, sem copia
+        kept = (kept + [(frame_number, frame)])[-2:]
+        for number, held in kept:
+            assert abs(float(held.mean()) - _intensity(number)) < 2.0
+    cap.release()
+
+    assert sampler.frames_unchanged > 0
+
+
+def test_chatty_stderr_does_not_block_decoding(tmp_path):
+    video = tmp_path / 'video.mp4'
+    _write_video(video, frames=300)
+
+    reader = FFmpegFrameReader(str(video), 64, 48, every_n=1, max_width=None)
+    # -v trace escreve mais que o buffer de um pipe (64 KB) no stderr
+    reader.command = lambda command=reader.command: [
+        part if part != 'error' else 'trace' for part in command()
+    ]
+    frames = []
+    worker = threading.Thread(target=lambda: frames.extend(n for n, _ in reader), daemon=True)
+    worker.start()
+    worker.join(timeout=30)
+
+    assert not worker.is_alive(), 'decodificacao travada com o stderr cheio'
+    assert len(frames) == 300
@@ -0,0 +1,145 @@
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import video_jobs
+from video_jobs import (STATUS_FAILED, STATUS_QUEUED, STATUS_RUNNING, JobStore,
+                        VideoJobManager)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(tmp_path / 'jobs.sqlite3')
+
+
+def _upload(tmp_path, name='video.mp4'):
+    path = tmp_path / name
+    path.write_bytes(b'video')
+    return path
+
+
+def _age(store, job_id, seconds):
+    connection = sqlite3.connect(store.sqlite_path)
+    with connection:
+        connection.execute('UPDATE video_jobs SET updated_at = updated_at - ? WHERE id = ?',
+                           (seconds, job_id))
+    connection.close()
+
+
+def test_claim_takes_oldest_queued_job_once(store, tmp_path):
+    first = store.create(_upload(tmp_path, 'a.mp4'), {'full_scan': True})
+    second = store.create(_upload(tmp_path, 'b.mp4'))
+
+    job = store.claim_next()
+    assert job['id'] == first
+    assert job['status'] == STATUS_RUNNING
+    assert job['attempts'] == 1
+    assert job['options'] == {'full_scan': True}
+    assert store.claim_next()['id'] == second
+    assert store.claim_next() is None
+
+
+def test_concurrent_claims_never_share_a_job(store, tmp_path):
+    created = {store.create(_upload(tmp_path, f"{i}.mp4")) for i in range(20)}
+    claimed = []
+    lock = threading.Lock()
+
+    def claim():
+        own = JobStore(store.sqlite_path)
+        while True:
+            job = own.claim_next()
+            if job is None:
+                return
+            with lock:
+                claimed.append(job['id'])
+
+    threads = [threading.Thread(target=claim) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == sorted(created)
+
+
+def test_requeue_returns_job_to_queue_below_max_attempts(store, tmp_path):
+    upload = _upload(tmp_path)
+    job_id = store.create(upload)
+    store.claim_next()
+
+    assert store.requeue(job_id, max_attempts=2)
+    assert store.get(job_id)['status'] == STATUS_QUEUED
+    assert upload.exists()
+
+
+def test_requeue_fails_job_and_removes_upload_at_max_attempts(store, tmp_path):
+    upload = _upload(tmp_path)
+    job_id = store.create(upload)
+    store.claim_next()
+    store.requeue(job_id, max_attempts=2)
+    store.claim_next()
+
+    assert not store.requeue(job_id, max_attempts=2)
+    job = store.get(job_id)
+    assert job['status'] == STATUS_FAILED
+    assert job['attempts'] == 2
+    assert not upload.exists()
+
+
+def test_requeue_stale_only_touches_jobs_without_heartbeat(store, tmp_path):
+    stale = store.create(_upload(tmp_path, 'a.mp4'))
+    alive = store.create(_upload(tmp_path, 'b.mp4'))
+    store.claim_next()
+    store.claim_next()
+    _age(store, stale, 120)
+
+    assert store.requeue_stale(stale_seconds=60, max_attempts=2) == 1
+    assert store.get(stale)['status'] == STATUS_QUEUED
+    assert store.get(alive)['status'] == STATUS_RUNNING
+
+
+def test_purge_removes_only_old_finished_jobs(store, tmp_path):
+    done = store.create(_upload(tmp_path, 'a.mp4'))
+    queued = store.create(_upload(tmp_path, 'b.mp4'))
+    store.claim_next()
+    store.finish(done, {'success': True})
+
+    assert store.purge_finished(older_than_seconds=3600) == 0
+    assert store.purge_finished(older_than_seconds=-1) == 1
+    assert store.get(done) is None
+    assert store.get(queued) is not None
+
+
+class CrashingManager(VideoJobManager):
+    """Workers que morrem na hora (ex.: modelo que nao carrega)."""
+
+    def __init__(self, *args, **kwargs):
+        self.starts = []
+        super().__init__(*args, **kwargs)
+
+    def _start_worker(self):
+        self.starts.append(time.monotonic())
+        return subprocess.Popen([sys.executable, '-c', 'raise SystemExit(1)'])
+
+
+def test_supervisor_backs_off_and_stops_restarting(tmp_path, monkeypatch):
+    monkeypatch.setattr(video_jobs, 'SUPERVISE_INTERVAL', 0.01)
+    manager = CrashingManager(tmp_path / 'jobs.sqlite3', max_workers=1,
+                              max_restarts=2, restart_backoff=0.2)
+    try:
+        deadline = time.monotonic() + 10
+        while len(manager.starts) < 3 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(1.0)
+    finally:
+        manager.shutdown()
+
+    # Inicio + 2 reinicios, com a espera dobrando entre eles
+    assert len(manager.starts) == 3
+    gaps = [b - a for a, b in zip(manager.starts, manager.starts[1:])]
+    assert gaps[0] >= 0.2
+    assert gaps[1] >= 0.4
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from video_results import FrameResultStore
+
+LABELS = ['Normal', 'Pneumonia', 'Covid']
+
+
+def _result(normal: float, pneumonia: float) -> dict:
+    probabilities = {'Normal': normal, 'Pneumonia': pneumonia, 'Covid': 1.0 - normal - pneumonia}
+    class_name = max(probabilities, key=probabilities.get)
+    return {'class_name': class_name, 'confidence': probabilities[class_name],
+            'all_probabilities': probabilities}
+
+
+def test_each_frame_weighs_the_frames_it_represents():
+    store = FrameResultStore(LABELS, every_n=10)
+    store.add(0, _result(0.9, 0.05))
+    store.add(10, _result(0.1, 0.8))
+    store.add(40, _result(0.2, 0.7))
+    store.finalize(50)
+
+    assert [frame['weight'] for frame in store.frame_results()] == [1.0, 3.0, 1.0]
+    vote = store.vote()
+    assert vote['total_weight'] == 5.0
+    assert vote['class_name'] == 'Pneumonia'
+    assert vote['all_probabilities']['Normal'] == pytest.approx((0.9 + 0.3 + 0.2) / 5)
+
+
+def test_unreliable_frames_are_left_out_unless_all_are():
+    store = FrameResultStore(LABELS, every_n=1, min_confidence=0.5)
+    store.add(0, _result(0.9, 0.05))
+    store.add(1, _result(0.35, 0.34))
+    store.finalize(2)
+
+    assert store.reliable_frames == 1
+    assert store.vote()['all_probabilities']['Normal'] == pytest.approx(0.9)
+    assert store.class_counts() == {'Normal': 1}
+
+    only_unreliable = FrameResultStore(LABELS, every_n=1, min_confidence=0.5)
+    only_unreliable.add(0, _result(0.35, 0.34))
+    only_unreliable.finalize(1)
+    assert only_unreliable.vote()['frames'] == 1
+
+
+def test_overstated_frame_count_is_clamped():
+    # CAP_PROP_FRAME_COUNT muito acima do fim real nao infla o ultimo frame
+    store = FrameResultStore(LABELS, every_n=10)
+    store.add(0, _result(0.0, 0.95))
+    store.add(10, _result(0.9, 0.05))
+    store.finalize(100000)
+
+    assert store.frame_result(-1)['weight'] == 1.0
+    assert store.vote()['class_name'] == 'Pneumonia'
+
+
+def test_clamp_follows_the_sampling_interval():
+    store = FrameResultStore(LABELS, every_n=10)
+    store.add(0, _result(0.9, 0.05))
+    store.finalize(1000, max_span=40)
+    assert store.frame_result(-1)['weight'] == 4.0
+
+
+@pytest.mark.parametrize('end_frame', [0, 20])
+def test_missing_or_short_frame_count_weighs_one_interval(end_frame):
+    store = FrameResultStore(LABELS, every_n=10)
+    store.add(0, _result(0.9, 0.05))
+    store.add(20, _result(0.9, 0.05))
+    store.finalize(end_frame)
+    assert store.frame_result(-1)['weight'] == 1.0
+
+
+def test_short_tail_weighs_the_frames_left():
+    store = FrameResultStore(LABELS, every_n=10)
+    store.add(0, _result(0.9, 0.05))
+    store.finalize(5)
+    assert store.frame_result(-1)['weight'] == 0.5
+
+
+def test_partial_vote_counts_last_frame_once():
+    store = FrameResultStore(LABELS, every_n=10)
+    store.add(0, _result(0.9, 0.05))
+    store.add(10, _result(0.1, 0.8))
+
+    vote = store.vote()
+    assert vote['total_weight'] == 2.0
+    assert 'weight' not in store.frame_result(-1)
+
+
+def test_storage_grows_and_rejects_frames_after_finalize():
+    store = FrameResultStore(LABELS, every_n=1, capacity=2)
+    for frame_number in range(5):
+        store.add(frame_number, _result(0.6, 0.3))
+    store.finalize(5)
+
+    assert len(store) == 5
+    assert np.array_equal(store.frame_numbers[:5], np.arange(5))
+    assert store.vote()['total_weight'] == 5.0
+    with pytest.raises(RuntimeError):
+        store.add(5, _result(0.6, 0.3))
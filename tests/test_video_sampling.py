@@ -0,0 +1,80 @@
+import cv2
+import numpy as np
+import pytest
+
+import video_sampling
+from video_sampling import FrameSampler
+
+FRAMES = 40
+SIZE = (64, 48)
+
+
+def _intensity(frame_number: int) -> int:
+    return 5 * frame_number + 20
+
+
+@pytest.fixture(scope='module')
+def video(tmp_path_factory):
+    """Video curto em que o brilho de cada frame identifica o numero do frame."""
+    path = tmp_path_factory.mktemp('video') / 'frames.avi'
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), 10, SIZE)
+    if not writer.isOpened():
+        pytest.skip('OpenCV sem codificador MJPG')
+    for frame_number in range(FRAMES):
+        writer.write(np.full((SIZE[1], SIZE[0], 3), _intensity(frame_number), dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+
+def _sample(video, mode='grab', every_n=7, **kwargs):
+    cap = cv2.VideoCapture(video)
+    try:
+        sampler = FrameSampler(cap, every_n, mode=mode, video_path=video, fps=10,
+                               total_frames=int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), **kwargs)
+        frames = [(number, int(np.round(frame.mean()))) for number, frame, sampled in sampler
+                  if sampled]
+        return frames, sampler
+    finally:
+        cap.release()
+
+
+def _assert_decoded(frames):
+    for frame_number, brightness in frames:
+        assert abs(brightness - _intensity(frame_number)) <= 3
+
+
+@pytest.mark.parametrize('mode', ['read', 'grab', 'seek'])
+def test_modes_deliver_the_same_sampled_frames(video, mode):
+    frames, sampler = _sample(video, mode)
+
+    assert [number for number, _ in frames] == list(range(0, FRAMES, 7))
+    _assert_decoded(frames)
+    assert sampler.frames_decoded == (FRAMES if mode == 'read' else len(frames))
+
+
+def test_grab_converts_only_sampled_frames(video):
+    _, sampler = _sample(video, 'grab')
+    stats = sampler.get_stats()
+
+    assert stats['frames_grabbed'] == FRAMES
+    assert stats['frames_decoded'] == len(range(0, FRAMES, 7))
+    assert sampler.reached_end == FRAMES
+
+
+@pytest.mark.parametrize('mode', ['grab', 'seek'])
+def test_frame_range_limits_the_walk(video, mode):
+    frames, _ = _sample(video, mode, start_frame=14, end_frame=30)
+
+    assert [number for number, _ in frames] == [14, 21, 28]
+    _assert_decoded(frames)
+
+
+def test_keyframes_without_ffprobe_falls_back_to_seek(video, monkeypatch):
+    monkeypatch.setattr(video_sampling, 'probe_keyframe_times', lambda path: None)
+    frames, _ = _sample(video, 'keyframes')
+    assert [number for number, _ in frames] == list(range(0, FRAMES, 7))
+
+
+def test_unknown_mode_uses_grab(video):
+    _, sampler = _sample(video, 'turbo')
+    assert sampler.mode == 'grab'
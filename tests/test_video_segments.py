@@ -0,0 +1,63 @@
+import pytest
+
+import video_segments
+from video_segments import merge_segment_stats, plan_segments, segment_count
+
+
+@pytest.mark.parametrize('total_frames,every_n,count', [
+    (1000, 10, 4), (1003, 10, 3), (95, 10, 4), (30, 10, 8), (7, 10, 2)
+])
+def test_segments_cover_video_on_sampling_grid(total_frames, every_n, count):
+    ranges = plan_segments(total_frames, every_n, count)
+
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] == total_frames
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+    assert all(start % every_n == 0 and start < end for start, end in ranges)
+    assert len(ranges) == min(count, -(-total_frames // every_n))
+
+    # Mesmos frames amostrados que a analise em um unico processo
+    sampled = [frame for start, end in ranges for frame in range(start, end, every_n)]
+    assert sampled == list(range(0, total_frames, every_n))
+
+
+def test_segments_are_balanced():
+    lengths = [end - start for start, end in plan_segments(3600, 30, 4)]
+    assert max(lengths) - min(lengths) <= 30
+
+
+def test_segment_count_respects_minimum_duration(monkeypatch):
+    monkeypatch.setattr(video_segments, 'available_cpus', lambda: 8)
+
+    # 5 min a 30 fps com trechos de pelo menos 60 s: no maximo 5
+    assert segment_count(9000, 30, requested=0, min_seconds=60) == 5
+    assert segment_count(9000, 30, requested=3, min_seconds=60) == 3
+    assert segment_count(90000, 30, requested=0, min_seconds=60) == 8
+    assert segment_count(1000, 30, requested=4, min_seconds=60) == 1
+    assert segment_count(1000, 0, requested=4, min_seconds=60) == 4
+
+
+def test_merge_sums_sampling_and_tracking_stats():
+    sampling = {'mode': 'grab', 'every_n': 10, 'frames_grabbed': 100,
+                'frames_decoded': 10, 'frames_unchanged': 2, 'change_detection': True}
+    segments = [
+        ((0, 100), {'sampling': dict(sampling), 'region_tracking': {'detections': 2, 'reused': 8},
+                    'frame_results': [{}] * 8, 'pipeline': {'wall_s': 1.0}}),
+        ((100, 200), {'sampling': dict(sampling, frames_unchanged=0),
+                      'region_tracking': {'detections': 1, 'reused': 9},
+                      'frame_results': [{}] * 10, 'pipeline': {'wall_s': 1.5}}),
+        ((200, 250), {'success': False, 'error': 'falhou'})
+    ]
+
+    merged = merge_segment_stats(segments, wall_s=2.0)
+
+    assert merged['sampling']['frames_grabbed'] == 200
+    assert merged['sampling']['frames_decoded'] == 20
+    assert merged['sampling']['frames_unchanged'] == 2
+    assert merged['sampling']['mode'] == 'grab'
+    assert merged['region_tracking'] == {'detections': 3, 'reused': 17}
+    pipeline = merged['pipeline']
+    assert pipeline['mode'] == 'segments'
+    assert pipeline['segments'] == 3
+    assert [s['frames_classified'] for s in pipeline['per_segment']] == [8, 10, 0]
+    assert segments[0][1]['sampling']['frames_grabbed'] == 100
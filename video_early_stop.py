@@ -0,0 +1,91 @@
+"""
+Parada Antecipada da Analise de Video
+=====================================
+Mantem os totais ponderados de probabilidade a medida que os frames sao
+classificados e indica quando o restante do video nao tem mais chance
+realista de mudar a classe vencedora.
+
+Criterio (todos precisam valer):
+- pelo menos `min_frames` frames confiaveis classificados;
+- limite inferior de confianca (unilateral, ~99%) da margem media entre
+  as duas classes mais votadas acima de `min_margin`; a margem de cada
+  frame e p[1a] - p[2a], com media e variancia ponderadas pelo peso do
+  frame e tamanho efetivo de amostra (sum w)^2 / sum w^2;
+- os ultimos `consistent_frames` frames com a classe vencedora como a
+  mais provavel.
+"""
+
+import math
+
+import numpy as np
+
+# Quantil da normal para o limite inferior unilateral de ~99%
+CONFIDENCE_Z = 2.33
+
+
+class EarlyStopRule:
+    """
+    Regra sequencial de parada sobre os resultados dos frames.
+
+    Args:
+        class_labels: Ordem das classes nos vetores de probabilidade
+        min_frames: Minimo de frames antes de qualquer parada
+        min_margin: Margem minima (em probabilidade) entre 1a e 2a classe
+        consistent_frames: Ultimos frames que devem concordar com a vencedora
+    """
+
+    def __init__(self, class_labels, min_frames: int = 8, min_margin: float = 0.2,
+                 consistent_frames: int = 5):
+        self.class_labels = list(class_labels)
+        self.min_frames = max(2, int(min_frames))
+        self.min_margin = min_margin
+        self.consistent_frames = max(1, int(consistent_frames))
+
+        self.totals = np.zeros(len(self.class_labels))
+        self._probabilities = []
+        self._weights = []
+        self.margin_lower_bound = None
+
+    @property
+    def frames(self) -> int:
+        return len(self._weights)
+
+    def update(self, all_probabilities: dict, weight: float = 1.0) -> bool:
+        """
+        Acrescenta o resultado de um frame confiavel.
+
+        Args:
+            all_probabilities: Probabilidade por classe (formato de `classify`)
+            weight: Peso do frame na votacao
+
+        Returns:
+            bool: True se a analise ja pode parar
+        """
+        probabilities = np.array([all_probabilities.get(label, 0.0) for label in self.class_labels])
+        self.totals += probabilities * weight
+        self._probabilities.append(probabilities)
+        self._weights.append(weight)
+        return self.should_stop()
+
+    def should_stop(self) -> bool:
+        if self.frames < self.min_frames:
+            return False
+
+        second, first = np.argsort(self.totals)[-2:]
+        probabilities = np.array(self._probabilities)
+
+        recent = probabilities[-self.consistent_frames:]
+        if not np.all(np.argmax(recent, axis=1) == first):
+            return False
+
+        weights = np.array(self._weights)
+        margins = probabilities[:, first] - probabilities[:, second]
+        mean = np.average(margins, weights=weights)
+        variance = np.average((margins - mean) ** 2, weights=weights)
+        effective_n = weights.sum() ** 2 / np.sum(weights ** 2)
+
+        self.margin_lower_bound = float(mean - CONFIDENCE_Z * math.sqrt(variance / effective_n))
+        return self.margin_lower_bound > self.min_margin
+
+    def leader(self) -> str:
+        return self.class_labels[int(np.argmax(self.totals))]
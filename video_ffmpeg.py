@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Decodificacao de Video via ffmpeg
+=================================
+Backend alternativo ao `cv2.VideoCapture` para a analise de video. O
+ffmpeg roda como subprocesso e os filtros sao aplicados dentro do
+decodificador, de forma que so chegam ao Python frames ja amostrados e
+reduzidos:
+
+    select (grade de amostragem) -> scale (area) -> format=gray
+
+- `select` (e nao o filtro `fps`) mantem a mesma grade do modo 'grab' do
+  OpenCV: o frame n sai do decodificador se n % every_n == 0
+- `scale` reduz para no maximo `max_width` de largura (sem ampliar); a
+  regiao do raio-X e detectada e recortada nessa resolucao
+- `format=gray`: um byte por pixel no pipe, sem conversao BGR
+
+Os frames sao lidos do pipe (rawvideo) com `readinto` direto em buffers
+NumPy alocados uma vez e reaproveitados em anel, sem copias. O anel so
+avanca quando o consumidor fica com o frame (`keep`); frames descartados
+(fora da amostragem adaptativa, sem mudanca) tem o buffer reaproveitado
+na leitura seguinte. Cada frame mantido so e valido ate o anel dar a
+volta (`buffers` frames mantidos depois).
+
+Selecionado com VIDEO_SAMPLING_MODE=ffmpeg (modo 'ffmpeg' do
+`FrameSampler`); sem o executavel, a amostragem cai para 'grab'.
+
+Uso (comparacao com o caminho OpenCV):
+    python video_ffmpeg.py benchmark exame.mp4
+    python video_ffmpeg.py benchmark exame.mp4 --every-n 15 --max-width 640
+"""
+
+import argparse
+import json
+import logging
+import shutil
+import subprocess
+import threading
+import time
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def find_ffmpeg():
+    """Caminho do executavel do ffmpeg, ou None."""
+    return shutil.which('ffmpeg')
+
+
+# Bytes finais do stderr do ffmpeg guardados para a mensagem de erro
+STDERR_TAIL_BYTES = 4096
+
+
+class FFmpegFrameReader:
+    """
+    Frames amostrados e reduzidos, em tons de cinza, lidos do pipe do ffmpeg.
+
+    Cada item e `(frame_number, frame)`, com `frame` uint8 (altura, largura).
+    O consumidor chama `keep()` para cada frame que guardar alem da
+    iteracao atual; os demais tem o buffer sobrescrito pelo proximo frame.
+
+    Args:
+        video_path: Caminho do video
+        width: Largura original do video
+        height: Altura original do video
+        every_n: Intervalo de amostragem em frames
+        max_width: Largura maxima dos frames entregues (None = original)
+        fps: FPS do video (para posicionar no inicio do trecho)
+        start_frame: Primeiro frame do trecho
+        end_frame: Fim (exclusivo) do trecho; None = ate o fim do video
+        buffers: Tamanho do anel de buffers
+        ffmpeg_path: Executavel do ffmpeg (padrao: o do PATH)
+    """
+
+    def __init__(self, video_path: str, width: int, height: int, every_n: int,
+                 max_width: int = 640, fps: float = 0.0, start_frame: int = 0,
+                 end_frame: int = None, buffers: int = 4, ffmpeg_path: str = None):
+        self.video_path = str(video_path)
+        self.every_n = max(1, int(every_n))
+        self.fps = fps
+        self.start_frame = max(0, int(start_frame))
+        self.end_frame = end_frame
+        self.ffmpeg_path = ffmpeg_path or find_ffmpeg() or 'ffmpeg'
+
+        scale = min(1.0, max_width / width) if max_width else 1.0
+        # Dimensoes pares (exigencia de alguns filtros/formatos do ffmpeg)
+        self.out_width = max(2, int(round(width * scale / 2)) * 2)
+        self.out_height = max(2, int(round(height * scale / 2)) * 2)
+
+        self._buffers = [np.empty((self.out_height, self.out_width), dtype=np.uint8)
+                         for _ in range(max(2, int(buffers)))]
+        self._index = 0
+        self.frames_read = 0
+
+    def keep(self):
+        """Mantem o ultimo frame entregue: a proxima leitura usa o buffer seguinte do anel."""
+        self._index = (self._index + 1) % len(self._buffers)
+
+    def command(self) -> list:
+        command = [self.ffmpeg_path, '-v', 'error', '-nostdin']
+
+        start = self.start_frame
+        if start and self.fps > 0:
+            # Posiciona na entrada; o contador n do select recomeca do trecho
+            command += ['-ss', f'{start / self.fps:.6f}']
+            start = 0
+
+        select = f"not(mod(n\\,{self.every_n}))"
+        if start:
+            select = f"gte(n\\,{start})*not(mod(n-{start}\\,{self.every_n}))"
+
+        command += [
+            '-noautorotate', '-i', self.video_path,
+            '-an', '-sn', '-dn',
+            '-vf', f"select='{select}',scale={self.out_width}:{self.out_height}:flags=area,format=gray",
+            '-fps_mode', 'passthrough'
+        ]
+        if self.end_frame is not None:
+            count = -(-(self.end_frame - self.start_frame) // self.every_n)
+            command += ['-frames:v', str(max(0, count))]
+        command += ['-f', 'rawvideo', '-pix_fmt', 'gray', 'pipe:1']
+        return command
+
+    @staticmethod
+    def _read_into(stream, view) -> int:
+        filled = 0
+        while filled < len(view):
+            read = stream.readinto(view[filled:])
+            if not read:
+                break
+            filled += read
+        return filled
+
+    @staticmethod
+    def _drain(stream, tail: bytearray):
+        """Esvazia o stderr em paralelo (um pipe cheio travaria o ffmpeg)."""
+        for chunk in iter(lambda: stream.read(4096), b''):
+            tail.extend(chunk)
+            del tail[:-STDERR_TAIL_BYTES]
+        stream.close()
+
+    def __iter__(self):
+        process = subprocess.Popen(self.command(), stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE, bufsize=0)
+        errors = bytearray()
+        drain = threading.Thread(target=self._drain, args=(process.stderr, errors),
+                                 name='ffmpeg-stderr', daemon=True)
+        drain.start()
+        try:
+            frame_number = self.start_frame
+            while self.end_frame is None or frame_number < self.end_frame:
+                frame = self._buffers[self._index]
+                view = memoryview(frame).cast('B')
+                if self._read_into(process.stdout, view) < len(view):
+                    break
+                self.frames_read += 1
+                yield frame_number, frame
+                frame_number += self.every_n
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            process.wait()
+            drain.join(timeout=5)
+            if process.returncode not in (0, -9) and not self.frames_read:
+                raise RuntimeError(f"ffmpeg falhou ({process.returncode}): "
+                                   f"{bytes(errors).decode(errors='replace').strip()}")
+
+
+# ================================================================================
+# BENCHMARK (ffmpeg x OpenCV)
+# ================================================================================
+
+def _time_mode(video_path: str, mode: str, every_n: int, max_width: int) -> tuple:
+    """Decodifica e pre-processa os frames amostrados em um modo; retorna (metricas, pixels)."""
+    from image_ingestion import prepare_frame
+    from video_sampling import FrameSampler
+
+    cap = cv2.VideoCapture(video_path)
+    try:
+        sampler = FrameSampler(
+            cap, every_n, mode=mode, video_path=video_path,
+            fps=cap.get(cv2.CAP_PROP_FPS),
+            total_frames=int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+            decode_width=max_width
+        )
+        decode_s = preprocess_s = 0.0
+        pixels = {}
+        frame_shape = None
+        start = time.perf_counter()
+        for frame_number, frame, _ in sampler:
+            decoded = time.perf_counter()
+            decode_s += decoded - start
+            frame_shape = frame.shape
+            pixels[frame_number] = prepare_frame(frame)
+            start = time.perf_counter()
+            preprocess_s += start - decoded
+    finally:
+        cap.release()
+
+    frames = len(pixels)
+    return {
+        'mode': sampler.mode,
+        'frames': frames,
+        'frame_shape': list(frame_shape) if frame_shape else None,
+        'decode_s': round(decode_s, 3),
+        'preprocess_s': round(preprocess_s, 3),
+        'frames_per_s': round(frames / max(decode_s + preprocess_s, 1e-9), 1)
+    }, pixels
+
+
+def run_benchmark(video_path: str, every_n: int = None, max_width: int = 640) -> dict:
+    """Compara os modos 'grab' (OpenCV) e 'ffmpeg' nos mesmos frames."""
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    if not every_n:
+        every_n = max(3, int(fps / 2)) if fps > 0 else 10
+
+    opencv, opencv_pixels = _time_mode(video_path, 'grab', every_n, max_width)
+    ffmpeg, ffmpeg_pixels = _time_mode(video_path, 'ffmpeg', every_n, max_width)
+
+    common = sorted(set(opencv_pixels) & set(ffmpeg_pixels))
+    differences = [np.mean(np.abs(opencv_pixels[n].astype(np.int16) - ffmpeg_pixels[n]))
+                   for n in common]
+    return {
+        'video': video_path,
+        'every_n': every_n,
+        'opencv': opencv,
+        'ffmpeg': ffmpeg,
+        'speedup': round(ffmpeg['frames_per_s'] / max(opencv['frames_per_s'], 1e-9), 2),
+        'same_frames': set(opencv_pixels) == set(ffmpeg_pixels),
+        'mean_pixel_difference': round(float(np.mean(differences)), 2) if differences else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Decodificacao de video via ffmpeg')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    benchmark = subparsers.add_parser('benchmark', help='Compara com o caminho OpenCV')
+    benchmark.add_argument('video', help='Caminho do video')
+    benchmark.add_argument('--every-n', type=int, default=None,
+                           help='Intervalo de amostragem (padrao: ~2 frames/s)')
+    benchmark.add_argument('--max-width', type=int, default=640,
+                           help='Largura maxima dos frames do ffmpeg')
+    benchmark.add_argument('--json', action='store_true', help='Saida em JSON')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == 'benchmark':
+        if not find_ffmpeg():
+            parser.error('ffmpeg nao encontrado no PATH')
+        report = run_benchmark(args.video, args.every_n, args.max_width)
+        if args.json:
+            print(json.dumps(report, indent=2))
+            return
+
+        print(f"Video: {report['video']} (a cada {report['every_n']} frames)")
+        for name in ('opencv', 'ffmpeg'):
+            stats = report[name]
+            print(f"  {name:<7} {stats['frames']:>5} frames {str(stats['frame_shape']):>16} | "
+                  f"decodificacao {stats['decode_s']:.2f}s | pre-processamento "
+                  f"{stats['preprocess_s']:.2f}s | {stats['frames_per_s']:.1f} frames/s")
+        print(f"  ganho: {report['speedup']:.2f}x | mesmos frames: {report['same_frames']} | "
+              f"diferenca media dos pixels: {report['mean_pixel_difference']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+"""
+Jobs Assincronos de Analise de Video
+====================================
+O upload de video apenas registra um job e retorna o id; a analise roda
+em processos de trabalho em segundo plano (sem disputar o GIL com as
+threads do Flask), que gravam progresso e resultado em SQLite.
+
+- Estados: queued -> running -> done | failed
+- Workers: VIDEO_JOB_WORKERS processos `python video_jobs.py worker` por
+  container, iniciados e supervisionados por um unico processo (master do
+  Gunicorn ou `python chatbot.py`) e reiniciados se morrerem. Os workers
+  web apenas enfileiram.
+  Cada worker carrega o modelo uma vez e pega o proximo job da fila; a
+  transicao queued -> running e atomica, entao varios workers (ou varios
+  servidores com o mesmo banco) nunca processam o mesmo job
+- Progresso: frames classificados, frame atual e votacao parcial,
+  gravados no maximo a cada VIDEO_JOB_PROGRESS_INTERVAL segundos; uma
+  thread de heartbeat mantem o job vivo em trechos sem frames classificados
+- Reinicio: os jobs na fila continuam no banco e sao processados quando os
+  workers voltam; jobs 'running' sem heartbeat ha VIDEO_JOB_STALE_SECONDS
+  (worker morto) voltam para a fila. Um job interrompido
+  VIDEO_JOB_MAX_ATTEMPTS vezes falha. Jobs que terminam como falhos tem o
+  video enviado apagado
+- Supervisao: workers que morrem sao reiniciados com espera crescente
+  (VIDEO_JOB_RESTART_BACKOFF segundos, dobrando a cada queda seguida); apos
+  VIDEO_JOB_MAX_RESTARTS quedas seguidas (ex.: modelo que nao carrega) o
+  worker nao e mais reiniciado
+
+Uso (workers em outro container/maquina com o mesmo banco):
+    VIDEO_JOB_WORKERS=0 python chatbot.py
+    python video_jobs.py worker
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    from config import (
+        VIDEO_JOB_WORKERS,
+        VIDEO_JOBS_DB_PATH,
+        VIDEO_JOB_STALE_SECONDS,
+        VIDEO_JOB_TTL_SECONDS,
+        VIDEO_JOB_PROGRESS_INTERVAL,
+        VIDEO_JOB_MAX_ATTEMPTS,
+        VIDEO_JOB_MAX_RESTARTS,
+        VIDEO_JOB_RESTART_BACKOFF
+    )
+except ImportError:
+    # Fallback se config não importável (development edge case)
+    VIDEO_JOB_WORKERS = int(os.getenv('VIDEO_JOB_WORKERS', 1))
+    VIDEO_JOBS_DB_PATH = Path(os.getenv('VIDEO_JOBS_DB_PATH', Path('/tmp/uploads') / 'video_jobs.sqlite3'))
+    VIDEO_JOB_STALE_SECONDS = int(os.getenv('VIDEO_JOB_STALE_SECONDS', 600))
+    VIDEO_JOB_TTL_SECONDS = int(os.getenv('VIDEO_JOB_TTL_SECONDS', 86400))
+    VIDEO_JOB_PROGRESS_INTERVAL = float(os.getenv('VIDEO_JOB_PROGRESS_INTERVAL', 1.0))
+    VIDEO_JOB_MAX_ATTEMPTS = int(os.getenv('VIDEO_JOB_MAX_ATTEMPTS', 2))
+    VIDEO_JOB_MAX_RESTARTS = int(os.getenv('VIDEO_JOB_MAX_RESTARTS', 5))
+    VIDEO_JOB_RESTART_BACKOFF = float(os.getenv('VIDEO_JOB_RESTART_BACKOFF', 5.0))
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+_JSON_COLUMNS = ('options', 'progress', 'result', 'response')
+
+# Supervisao do pool: intervalo de verificacao, espera maxima entre reinicios
+# e tempo de pe apos o qual um worker volta a contar como saudavel
+SUPERVISE_INTERVAL = 1.0
+RESTART_BACKOFF_MAX = 300.0
+WORKER_HEALTHY_SECONDS = 300.0
+
+
+def remove_upload(video_path):
+    """Apaga o video enviado de um job (ja removido e ignorado)."""
+    try:
+        os.unlink(video_path)
+    except OSError:
+        pass
+
+
+class JobStore:
+    """Tabela de jobs em SQLite, com conexoes curtas (segura entre threads e processos)."""
+
+    def __init__(self, sqlite_path):
+        self.sqlite_path = str(sqlite_path)
+        Path(self.sqlite_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS video_jobs ('
+                ' id TEXT PRIMARY KEY,'
+                ' status TEXT NOT NULL,'
+                ' video_path TEXT NOT NULL,'
+                ' options TEXT NOT NULL,'
+                ' progress TEXT,'
+                ' result TEXT,'
+                ' response TEXT,'
+                ' error TEXT,'
+                ' attempts INTEGER NOT NULL DEFAULT 0,'
+                ' created_at REAL NOT NULL,'
+                ' started_at REAL,'
+                ' finished_at REAL,'
+                ' updated_at REAL NOT NULL)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS video_jobs_status ON video_jobs (status, created_at)'
+            )
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.sqlite_path, timeout=10)
+        connection.row_factory = sqlite3.Row
+        try:
+            connection.execute('PRAGMA journal_mode=WAL')
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def create(self, video_path: str, options: dict = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                'INSERT INTO video_jobs (id, status, video_path, options, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, STATUS_QUEUED, str(video_path), json.dumps(options or {}), now, now)
+            )
+        return job_id
+
+    def get(self, job_id: str):
+        """Job como dict (colunas JSON ja decodificadas), ou None."""
+        with self._connect() as connection:
+            row = connection.execute('SELECT * FROM video_jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for column in _JSON_COLUMNS:
+            if job[column] is not None:
+                job[column] = json.loads(job[column])
+        return job
+
+    def claim_next(self):
+        """Pega o job mais antigo da fila (queued -> running); None se vazia."""
+        with self._connect() as connection:
+            candidates = connection.execute(
+                'SELECT id FROM video_jobs WHERE status = ? ORDER BY created_at LIMIT 5',
+                (STATUS_QUEUED,)
+            ).fetchall()
+
+        for row in candidates:
+            now = time.time()
+            with self._connect() as connection:
+                cursor = connection.execute(
+                    'UPDATE video_jobs SET status = ?, started_at = ?, updated_at = ?, '
+                    'attempts = attempts + 1 WHERE id = ? AND status = ?',
+                    (STATUS_RUNNING, now, now, row['id'], STATUS_QUEUED)
+                )
+            if cursor.rowcount == 1:
+                return self.get(row['id'])
+        return None
+
+    def update_progress(self, job_id: str, progress: dict):
+        with self._connect() as connection:
+            connection.execute(
+                'UPDATE video_jobs SET progress = ?, updated_at = ? WHERE id = ?',
+                (json.dumps(progress), time.time(), job_id)
+            )
+
+    def heartbeat(self, job_id: str):
+        with self._connect() as connection:
+            connection.execute(
+                'UPDATE video_jobs SET updated_at = ? WHERE id = ?', (time.time(), job_id)
+            )
+
+    def finish(self, job_id: str, result: dict):
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                'UPDATE video_jobs SET status = ?, result = ?, finished_at = ?, updated_at = ? '
+                'WHERE id = ?',
+                (STATUS_DONE, json.dumps(result), now, now, job_id)
+            )
+
+    def fail(self, job_id: str, error: str):
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                'UPDATE video_jobs SET status = ?, error = ?, finished_at = ?, updated_at = ? '
+                'WHERE id = ?',
+                (STATUS_FAILED, error, now, now, job_id)
+            )
+
+    def set_response(self, job_id: str, response: dict):
+        """Resposta final da API (montada uma unica vez pelo servidor web)."""
+        with self._connect() as connection:
+            connection.execute(
+                'UPDATE video_jobs SET response = ? WHERE id = ?',
+                (json.dumps(response), job_id)
+            )
+
+    def requeue(self, job_id: str, max_attempts: int) -> bool:
+        """
+        Devolve a fila um job interrompido; falha apos `max_attempts`
+        tentativas (e o video enviado e apagado, pois nao sera mais lido).
+        """
+        now = time.time()
+        with self._connect() as connection:
+            failed = connection.execute(
+                'UPDATE video_jobs SET status = ?, error = ?, finished_at = ?, updated_at = ? '
+                'WHERE id = ? AND status = ? AND attempts >= ?',
+                (STATUS_FAILED, 'Processamento interrompido repetidamente', now, now,
+                 job_id, STATUS_RUNNING, max_attempts)
+            ).rowcount
+            connection.execute(
+                'UPDATE video_jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?',
+                (STATUS_QUEUED, now, job_id, STATUS_RUNNING)
+            )
+            row = connection.execute(
+                'SELECT status, video_path FROM video_jobs WHERE id = ?', (job_id,)
+            ).fetchone()
+        if failed and row is not None:
+            remove_upload(row['video_path'])
+        return row is not None and row['status'] == STATUS_QUEUED
+
+    def requeue_stale(self, stale_seconds: float, max_attempts: int) -> int:
+        """Devolve a fila os jobs 'running' sem heartbeat recente (processo morto)."""
+        with self._connect() as connection:
+            rows = connection.execute(
+                'SELECT id FROM video_jobs WHERE status = ? AND updated_at < ?',
+                (STATUS_RUNNING, time.time() - stale_seconds)
+            ).fetchall()
+        for row in rows:
+            self.requeue(row['id'], max_attempts)
+        return len(rows)
+
+    def purge_finished(self, older_than_seconds: float) -> int:
+        with self._connect() as connection:
+            cursor = connection.execute(
+                'DELETE FROM video_jobs WHERE status IN (?, ?) AND finished_at < ?',
+                (STATUS_DONE, STATUS_FAILED, time.time() - older_than_seconds)
+            )
+        return cursor.rowcount
+
+
+# ================================================================================
+# PROCESSO DE TRABALHO
+# ================================================================================
+
+def run_job(store: JobStore, job: dict) -> str:
+    """Executa um job ja marcado como 'running'; retorna o status final."""
+    from gravar_e_transcrever import processar_video_xray
+
+    job_id = job['id']
+    last_write = 0.0
+    done = threading.Event()
+
+    def heartbeat():
+        while not done.wait(VIDEO_JOB_STALE_SECONDS / 10):
+            try:
+                store.heartbeat(job_id)
+            except sqlite3.Error as e:
+                logger.warning(f"Erro no heartbeat do job {job_id}: {e}")
+
+    threading.Thread(target=heartbeat, name='video-job-heartbeat', daemon=True).start()
+
+    def report(progress):
+        nonlocal last_write
+        now = time.monotonic()
+        if now - last_write >= VIDEO_JOB_PROGRESS_INTERVAL:
+            store.update_progress(job_id, progress)
+            last_write = now
+
+    try:
+        result = processar_video_xray(
+            job['video_path'],
+            show_window=False,
+            full_scan=job['options'].get('full_scan', False),
+            progress_callback=report
+        )
+    except Exception as e:
+        logger.error(f"Erro no job de vídeo {job_id}: {e}")
+        result = {'success': False, 'error': str(e)}
+    except BaseException:
+        # Worker encerrado (SIGTERM) no meio do job: devolver a fila
+        store.requeue(job_id, VIDEO_JOB_MAX_ATTEMPTS)
+        raise
+    finally:
+        done.set()
+
+    remove_upload(job['video_path'])
+
+    if result.get('success'):
+        store.finish(job_id, result)
+        return STATUS_DONE
+    store.fail(job_id, result.get('error', 'Erro desconhecido ao processar vídeo'))
+    return STATUS_FAILED
+
+
+def run_worker(sqlite_path, poll_interval: float = 0.5):
+    """
+    Loop de um processo de trabalho: carrega o modelo e processa a fila.
+
+    Encerra com SIGTERM ou quando o processo pai (servidor web) termina.
+    """
+    from xray_classifier import get_classifier
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    parent = os.getppid()
+
+    store = JobStore(sqlite_path)
+    if not get_classifier().is_model_loaded():
+        logger.error("❌ Modelo nao carregado - worker de vídeo encerrado")
+        sys.exit(1)
+    logger.info(f"✅ Worker de vídeo pronto (pid {os.getpid()})")
+
+    last_recovery = 0.0
+    while os.getppid() == parent:
+        if time.monotonic() - last_recovery >= VIDEO_JOB_STALE_SECONDS / 10:
+            requeued = store.requeue_stale(VIDEO_JOB_STALE_SECONDS, VIDEO_JOB_MAX_ATTEMPTS)
+            if requeued:
+                logger.warning(f"⚠️  {requeued} job(s) de vídeo interrompido(s) voltaram para a fila")
+            last_recovery = time.monotonic()
+
+        job = store.claim_next()
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+
+        logger.info(f"Processando job de vídeo {job['id']} (tentativa {job['attempts']})")
+        status = run_job(store, job)
+        logger.info(f"Job de vídeo {job['id']}: {status}")
+
+
+# ================================================================================
+# GERENCIADOR (PROCESSO WEB)
+# ================================================================================
+
+class VideoJobManager:
+    """
+    Registra jobs e mantem os processos de trabalho deste servidor.
+
+    Args:
+        sqlite_path: Banco de jobs (compartilhado com os workers)
+        max_workers: Processos de trabalho iniciados (0 = workers externos)
+    """
+
+    def __init__(self, sqlite_path=VIDEO_JOBS_DB_PATH, max_workers: int = VIDEO_JOB_WORKERS,
+                 max_restarts: int = VIDEO_JOB_MAX_RESTARTS,
+                 restart_backoff: float = VIDEO_JOB_RESTART_BACKOFF):
+        self.sqlite_path = str(sqlite_path)
+        self.max_workers = max(0, int(max_workers))
+        self.max_restarts = max(0, int(max_restarts))
+        self.restart_backoff = max(0.0, float(restart_backoff))
+        self.store = JobStore(self.sqlite_path)
+        self._processes = []
+        self._stopping = threading.Event()
+        # Processos filhos de um fork (workers do Gunicorn) herdam o objeto,
+        # mas so o processo que iniciou o pool pode encerra-lo
+        self._owner_pid = os.getpid()
+
+        try:
+            purged = self.store.purge_finished(VIDEO_JOB_TTL_SECONDS)
+            if purged:
+                logger.info(f"{purged} job(s) de vídeo antigo(s) removido(s)")
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao limpar jobs de vídeo: {e}")
+
+        if self.max_workers:
+            self._processes = [self._start_worker() for _ in range(self.max_workers)]
+            threading.Thread(target=self._supervise, name='video-job-supervisor', daemon=True).start()
+
+    def _start_worker(self) -> subprocess.Popen:
+        command = [sys.executable, os.path.abspath(__file__), 'worker', '--db', self.sqlite_path]
+        return subprocess.Popen(command)
+
+    def _supervise(self):
+        """
+        Reinicia workers que morreram (o job deles volta a fila como stale).
+
+        Cada queda seguida dobra a espera antes do reinicio; depois de
+        `max_restarts` quedas seguidas o worker fica parado. Um worker de pe
+        por WORKER_HEALTHY_SECONDS zera a contagem.
+        """
+        count = len(self._processes)
+        started = [time.monotonic()] * count
+        failures = [0] * count
+        restart_at = [None] * count
+
+        while not self._stopping.wait(SUPERVISE_INTERVAL):
+            now = time.monotonic()
+            for index, process in enumerate(self._processes):
+                if restart_at[index] is not None:
+                    if now >= restart_at[index] and not self._stopping.is_set():
+                        self._processes[index] = self._start_worker()
+                        started[index] = now
+                        restart_at[index] = None
+                    continue
+                if process.poll() is None:
+                    continue
+
+                if now - started[index] >= WORKER_HEALTHY_SECONDS:
+                    failures[index] = 0
+                failures[index] += 1
+                if failures[index] > self.max_restarts:
+                    logger.error(f"❌ Worker de vídeo {process.pid} encerrou "
+                                 f"(codigo {process.returncode}) {failures[index]} vezes "
+                                 f"seguidas - nao sera reiniciado")
+                    restart_at[index] = float('inf')
+                    continue
+
+                delay = min(RESTART_BACKOFF_MAX, self.restart_backoff * 2 ** (failures[index] - 1))
+                logger.error(f"❌ Worker de vídeo {process.pid} encerrou "
+                             f"(codigo {process.returncode}) - reiniciando em {delay:.0f}s")
+                restart_at[index] = now + delay
+
+    def submit(self, video_path, options: dict = None) -> str:
+        job_id = self.store.create(video_path, options)
+        logger.info(f"Job de vídeo {job_id} enfileirado")
+        return job_id
+
+    def get(self, job_id: str):
+        return self.store.get(job_id)
+
+    def shutdown(self):
+        if os.getpid() != self._owner_pid:
+            return
+        self._stopping.set()
+        for process in self._processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in self._processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+_job_manager = None
+_worker_pool = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> VideoJobManager:
+    """
+    Gerenciador de jobs do processo web (criado no primeiro uso).
+
+    Apenas enfileira e consulta jobs: os processos de trabalho sao do pool
+    do container (`start_worker_pool`), nao de cada worker do Gunicorn.
+    """
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            _job_manager = VideoJobManager(max_workers=0)
+        return _job_manager
+
+
+def start_worker_pool(max_workers: int = VIDEO_JOB_WORKERS) -> VideoJobManager:
+    """
+    Inicia os VIDEO_JOB_WORKERS processos de trabalho do container.
+
+    Chamado uma unica vez por container: no master do Gunicorn
+    (`gunicorn.conf.py`) ou no processo do `python chatbot.py`. Cada
+    processo de trabalho carrega o proprio modelo, entao o pool nao deve
+    ser multiplicado pelos workers web.
+    """
+    global _worker_pool
+    with _job_manager_lock:
+        if _worker_pool is None:
+            _worker_pool = VideoJobManager(max_workers=max_workers)
+            logger.info(f"Pool de vídeo iniciado com {_worker_pool.max_workers} worker(s)")
+        return _worker_pool
+
+
+def stop_worker_pool():
+    """Encerra o pool do container (sem efeito em processos que nao o iniciaram)."""
+    if _worker_pool is not None:
+        _worker_pool.shutdown()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(description="Processamento assincrono de videos de raio-X")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    worker = subparsers.add_parser('worker', help='Processar jobs da fila')
+    worker.add_argument('--db', default=str(VIDEO_JOBS_DB_PATH), help='Banco SQLite dos jobs')
+    worker.add_argument('--poll-interval', type=float, default=0.5)
+
+    args = parser.parse_args()
+    try:
+        run_worker(args.db, args.poll_interval)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,206 @@
+"""
+Pipeline de Processamento de Video
+==================================
+Executa as etapas da analise de video em paralelo, em vez de uma apos a
+outra na mesma thread:
+
+    decodificacao (1 thread) -> pre-processamento (pool) -> inferencia em lote
+
+- decodificacao: percorre o `FrameSampler` e envia cada frame amostrado
+  ao pool de pre-processamento
+- pre-processamento: recorte do raio-X, reducao e CLAHE; o OpenCV libera
+  o GIL, entao as threads rodam de fato em paralelo
+- inferencia: consome os frames pre-processados na ordem, escreve cada um
+  em float32 direto no buffer do lote (alocado uma vez) e chama
+  `classify_batch`
+
+Um semaforo limita os frames em voo (decodificados e ainda nao
+consumidos pela inferencia), de forma que a decodificacao espera quando
+as etapas seguintes atrasam e a memoria fica limitada. Os resultados saem
+na ordem dos frames. `get_stats` informa a utilizacao de cada etapa para
+identificar o gargalo.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from image_ingestion import IMAGE_SIZE, pixels_to_tensor
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class _StageTimer:
+    """Tempo ocupado (e bloqueado) acumulado de uma etapa, seguro entre threads."""
+
+    def __init__(self):
+        self.busy_s = 0.0
+        self.blocked_s = 0.0
+        self.items = 0
+        self._lock = threading.Lock()
+
+    def add(self, busy_s: float = 0.0, blocked_s: float = 0.0, items: int = 0):
+        with self._lock:
+            self.busy_s += busy_s
+            self.blocked_s += blocked_s
+            self.items += items
+
+
+class VideoPipeline:
+    """
+    Pipeline decodificacao -> pre-processamento -> inferencia com backpressure.
+
+    Args:
+        classifier: `XRayClassifier` (usa `classify_batch`)
+        preprocess_fn: Funcao frame -> pixels uint8 (256, 256) / (256, 256, 3)
+                       ou tensor float32 (1, 256, 256, 3); recebe o item de
+                       frame como entregue por `frames` em `run`
+        batch_size: Frames por forward pass
+        workers: Threads de pre-processamento
+        max_in_flight: Maximo de frames entre a decodificacao e a inferencia
+    """
+
+    def __init__(self, classifier, preprocess_fn, batch_size: int = 16,
+                 workers: int = 4, max_in_flight: int = 32):
+        self.classifier = classifier
+        self.preprocess_fn = preprocess_fn
+        self.batch_size = max(1, int(batch_size))
+        self.workers = max(1, int(workers))
+        self.max_in_flight = max(self.batch_size, int(max_in_flight))
+
+        self._decode = _StageTimer()
+        self._preprocess = _StageTimer()
+        self._inference = _StageTimer()
+        self._batches = 0
+        self._wall_s = 0.0
+
+    def _timed_preprocess(self, frame):
+        start = time.perf_counter()
+        try:
+            return self.preprocess_fn(frame)
+        finally:
+            self._preprocess.add(busy_s=time.perf_counter() - start, items=1)
+
+    def _decode_loop(self, frames, pool, ordered, slots, stop):
+        """Thread de decodificacao: envia frames ao pool respeitando o limite em voo."""
+        iterator = iter(frames)
+        try:
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    frame_number, frame = next(iterator)
+                except StopIteration:
+                    break
+                decoded = time.perf_counter()
+                self._decode.add(busy_s=decoded - start, items=1)
+
+                # Backpressure: aguarda a inferencia consumir frames anteriores
+                while not slots.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                self._decode.add(blocked_s=time.perf_counter() - decoded)
+
+                ordered.put((frame_number, pool.submit(self._timed_preprocess, frame)))
+        except Exception as e:
+            ordered.put((_END, e))
+            return
+        ordered.put((_END, None))
+
+    def run(self, frames):
+        """
+        Processa os frames amostrados.
+
+        Args:
+            frames: Iteravel de (frame_number, frame); o iteravel roda na
+                    thread de decodificacao, na ordem dos frames
+
+        Yields:
+            (frame_number, resultado de `classify_batch`), na ordem dos frames
+        """
+        ordered = queue.Queue()
+        slots = threading.BoundedSemaphore(self.max_in_flight)
+        stop = threading.Event()
+        started = time.perf_counter()
+
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='video-preprocess')
+        decoder = threading.Thread(
+            target=self._decode_loop, args=(frames, pool, ordered, slots, stop),
+            name='video-decode', daemon=True
+        )
+        decoder.start()
+
+        # Buffer do lote reaproveitado em todos os forward passes
+        batch = np.empty((self.batch_size, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+        frame_numbers = []
+        try:
+            while True:
+                wait_start = time.perf_counter()
+                frame_number, item = ordered.get()
+                if frame_number is _END:
+                    if item is not None:
+                        raise item
+                    break
+
+                pixels = item.result()
+                slots.release()
+                self._inference.add(blocked_s=time.perf_counter() - wait_start)
+
+                pixels_to_tensor(pixels, out=batch[len(frame_numbers)])
+                frame_numbers.append(frame_number)
+                if len(frame_numbers) >= self.batch_size:
+                    yield from self._infer(frame_numbers, batch)
+
+            yield from self._infer(frame_numbers, batch)
+        finally:
+            stop.set()
+            decoder.join()
+            pool.shutdown(wait=True, cancel_futures=True)
+            self._wall_s += time.perf_counter() - started
+
+    def _infer(self, frame_numbers: list, batch: np.ndarray):
+        if not frame_numbers:
+            return
+        start = time.perf_counter()
+        results = self.classifier.classify_batch(batch[:len(frame_numbers)])
+        self._inference.add(busy_s=time.perf_counter() - start, items=len(frame_numbers))
+        self._batches += 1
+
+        numbers = list(frame_numbers)
+        frame_numbers.clear()
+        yield from zip(numbers, results)
+
+    def get_stats(self) -> dict:
+        """Tempo ocupado e utilizacao de cada etapa; o gargalo e a mais utilizada."""
+        wall = self._wall_s or 1e-9
+        stages = {
+            'decode': {
+                'busy_s': round(self._decode.busy_s, 3),
+                'blocked_s': round(self._decode.blocked_s, 3),
+                'utilization': round(self._decode.busy_s / wall, 3),
+                'frames': self._decode.items
+            },
+            'preprocess': {
+                'busy_s': round(self._preprocess.busy_s, 3),
+                'utilization': round(self._preprocess.busy_s / (wall * self.workers), 3),
+                'workers': self.workers,
+                'frames': self._preprocess.items
+            },
+            'inference': {
+                'busy_s': round(self._inference.busy_s, 3),
+                'starved_s': round(self._inference.blocked_s, 3),
+                'utilization': round(self._inference.busy_s / wall, 3),
+                'batches': self._batches,
+                'frames': self._inference.items
+            }
+        }
+        return {
+            'wall_s': round(self._wall_s, 3),
+            'stages': stages,
+            'bottleneck': max(stages, key=lambda name: stages[name]['utilization'])
+        }
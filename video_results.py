@@ -0,0 +1,206 @@
+"""
+Resultados por Frame da Analise de Video
+========================================
+Armazenamento em colunas dos frames classificados (numero do frame,
+confianca, classe e matriz float32 de probabilidades), com a votacao
+ponderada mantida de forma incremental: cada frame novo fecha o peso do
+anterior, que entra nas somas na hora. Assim a votacao final nao precisa
+percorrer a lista, e gravacoes longas nao acumulam um dict por frame.
+
+Peso de cada frame: os frames de video que ele representa (ate o proximo
+frame classificado), em unidades do intervalo de amostragem base; o
+ultimo vale ate o fim do trecho analisado, no maximo um intervalo de
+amostragem (`finalize`). Frames sem
+mudanca nao sao classificados, entao o resultado anterior carrega o peso
+deles; com amostragem fixa, todos os pesos sao 1.
+
+A votacao usa os frames confiaveis (confianca >= `min_confidence`) ou,
+se nao houver nenhum, todos. Os `frame_results` no formato JSON so sao
+montados quando pedidos.
+"""
+
+import numpy as np
+
+
+class FrameResultStore:
+    """
+    Resultados dos frames classificados de um video, em colunas.
+
+    Args:
+        class_labels: Ordem das classes nos vetores de probabilidade
+        every_n: Intervalo de amostragem base (unidade dos pesos)
+        min_confidence: Confianca minima para o frame entrar na votacao
+        capacity: Capacidade inicial (dobra quando enche)
+    """
+
+    def __init__(self, class_labels, every_n: int, min_confidence: float = 0.4,
+                 capacity: int = 256):
+        self.class_labels = list(class_labels)
+        self.every_n = max(1, int(every_n))
+        self.min_confidence = min_confidence
+        self._label_index = {label: i for i, label in enumerate(self.class_labels)}
+
+        capacity = max(1, int(capacity))
+        self.frame_numbers = np.empty(capacity, dtype=np.int64)
+        self.confidences = np.empty(capacity, dtype=np.float32)
+        self.class_ids = np.empty(capacity, dtype=np.int16)
+        self.probabilities = np.empty((capacity, len(self.class_labels)), dtype=np.float32)
+        # NaN ate o proximo frame (ou `finalize`) fechar o peso
+        self.weights = np.empty(capacity, dtype=np.float64)
+        self._size = 0
+        self._finalized = False
+
+        # Somas ponderadas e contagens: [0] frames confiaveis, [1] todos
+        self._scores = np.zeros((2, len(self.class_labels)))
+        self._total_weight = np.zeros(2)
+        self._counts = np.zeros((2, len(self.class_labels)), dtype=np.int64)
+        self._frames = np.zeros(2, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def last_frame_number(self):
+        return int(self.frame_numbers[self._size - 1]) if self._size else None
+
+    @property
+    def reliable_frames(self) -> int:
+        return int(self._frames[0])
+
+    def _grow(self):
+        capacity = len(self.frame_numbers) * 2
+        for name in ('frame_numbers', 'confidences', 'class_ids', 'weights'):
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            setattr(self, name, grown)
+        grown = np.empty((capacity, len(self.class_labels)), dtype=np.float32)
+        grown[:self._size] = self.probabilities[:self._size]
+        self.probabilities = grown
+
+    def _is_reliable(self, index: int) -> bool:
+        return self.confidences[index] >= self.min_confidence
+
+    def _close_weight(self, index: int, end_frame: int):
+        """Fecha o peso do frame `index` e o acumula na votacao."""
+        weight = (end_frame - self.frame_numbers[index]) / self.every_n
+        self.weights[index] = weight
+
+        probabilities = self.probabilities[index].astype(np.float64)
+        groups = (0, 1) if self._is_reliable(index) else (1,)
+        for group in groups:
+            self._scores[group] += probabilities * weight
+            self._total_weight[group] += weight
+
+    def add(self, frame_number: int, result: dict):
+        """
+        Acrescenta um frame classificado (formato de `classify`).
+
+        Fecha o peso do frame anterior, que passa a contar na votacao.
+        """
+        if self._finalized:
+            raise RuntimeError('resultados ja finalizados')
+        if self._size == len(self.frame_numbers):
+            self._grow()
+
+        index = self._size
+        probabilities = self.probabilities[index]
+        for label, probability in result['all_probabilities'].items():
+            column = self._label_index.get(label)
+            if column is not None:
+                probabilities[column] = probability
+        self.frame_numbers[index] = frame_number
+        self.confidences[index] = result['confidence']
+        self.class_ids[index] = self._label_index.get(result['class_name'], int(np.argmax(probabilities)))
+        self.weights[index] = np.nan
+        self._size += 1
+
+        groups = (0, 1) if self._is_reliable(index) else (1,)
+        for group in groups:
+            self._counts[group, self.class_ids[index]] += 1
+            self._frames[group] += 1
+
+        if index > 0:
+            self._close_weight(index - 1, frame_number)
+
+    def finalize(self, end_frame: int, max_span: int = None):
+        """
+        Fecha o peso do ultimo frame: ele vale ate `end_frame` (fim do trecho
+        analisado), limitado a `max_span` frames (padrao: `every_n`).
+
+        O fim costuma vir de CAP_PROP_FRAME_COUNT, uma estimativa do container
+        que pode sobrar ou faltar: o limite impede que o ultimo frame herde um
+        trecho que o amostrador nao percorreu, e um fim que nao passa do
+        ultimo frame vale um intervalo de amostragem.
+        """
+        if self._finalized or not self._size:
+            return
+        last = self._size - 1
+        span = end_frame - self.frame_numbers[last]
+        if span <= 0:
+            span = self.every_n
+        span = min(span, max(1, int(max_span or self.every_n)))
+        self._close_weight(last, self.frame_numbers[last] + span)
+        self._finalized = True
+
+    def _group(self) -> int:
+        """Frames confiaveis, ou todos se nenhum for confiavel."""
+        return 0 if self._frames[0] else 1
+
+    def vote(self) -> dict:
+        """
+        Votacao ponderada com os pesos ja fechados.
+
+        Antes de `finalize`, o ultimo frame entra com peso provisorio de um
+        intervalo de amostragem (votacao parcial durante a analise).
+        """
+        group = self._group()
+        scores = self._scores[group].copy()
+        total_weight = self._total_weight[group]
+
+        if self._size and not self._finalized:
+            last = self._size - 1
+            if group == 1 or self._is_reliable(last):
+                scores += self.probabilities[last].astype(np.float64)
+                total_weight += 1.0
+
+        if total_weight <= 0:
+            return None
+
+        probabilities = {label: float(score / total_weight)
+                         for label, score in zip(self.class_labels, scores)}
+        class_name = self.class_labels[int(np.argmax(scores))]
+        return {
+            'class_name': class_name,
+            'confidence': probabilities[class_name],
+            'all_probabilities': probabilities,
+            'total_weight': float(total_weight),
+            'frames': int(self._frames[group])
+        }
+
+    def class_counts(self) -> dict:
+        """Frames por classe prevista entre os usados na votacao."""
+        counts = self._counts[self._group()]
+        return {label: int(count) for label, count in zip(self.class_labels, counts) if count}
+
+    def frame_result(self, index: int) -> dict:
+        """Um frame no formato JSON de `frame_results` (indices negativos aceitos)."""
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+
+        frame = {
+            'frame_number': int(self.frame_numbers[index]),
+            'class_name': self.class_labels[self.class_ids[index]],
+            'confidence': float(self.confidences[index]),
+            'all_probabilities': {label: float(probability) for label, probability
+                                  in zip(self.class_labels, self.probabilities[index])}
+        }
+        if not np.isnan(self.weights[index]):
+            frame['weight'] = float(self.weights[index])
+        return frame
+
+    def frame_results(self) -> list:
+        """Todos os frames no formato JSON (montados agora, sob demanda)."""
+        return [self.frame_result(index) for index in range(self._size)]
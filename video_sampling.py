@@ -0,0 +1,330 @@
+"""
+Amostragem de Frames de Video
+=============================
+Entrega apenas os frames amostrados de um video, sem converter para BGR
+(ou sem sequer decodificar) os frames descartados.
+
+Modos:
+- 'read':      decodifica e entrega todos os frames (preview com janela)
+- 'grab':      `cap.grab()` em todos os frames e `cap.retrieve()` apenas nos
+               amostrados; os descartados nao passam pela conversao
+               YUV -> BGR nem sao copiados. Mesmos frames do loop com `read()`
+- 'seek':      posiciona direto em cada frame amostrado; com intervalos
+               maiores que o GOP, os frames intermediarios nao sao decodificados
+- 'keyframes': varredura rapida apenas dos keyframes (timestamps via
+               ffprobe); para videos longos. Sem ffprobe, cai para 'seek'
+- 'ffmpeg':    decodificacao pelo ffmpeg (`video_ffmpeg.py`), com amostragem,
+               reducao e conversao para cinza dentro do decodificador; os
+               frames entregues sao cinza, com no maximo `decode_width` de
+               largura. Sem ffmpeg, cai para 'grab'
+
+Com um `ChangeDetector`, frames amostrados cujo conteudo nao mudou desde
+o ultimo frame classificado nao sao entregues (o resultado anterior vale
+por eles), e o intervalo de amostragem se adapta: cai para `min_every_n`
+quando o conteudo muda e dobra a cada amostra estatica, ate `max_every_n`.
+
+Com `start_frame`/`end_frame`, apenas o trecho [start_frame, end_frame)
+e percorrido (processamento do video em segmentos paralelos).
+"""
+
+import logging
+import subprocess
+
+import cv2
+import numpy as np
+
+from video_ffmpeg import FFmpegFrameReader, find_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+SAMPLING_MODES = ('read', 'grab', 'seek', 'keyframes', 'ffmpeg')
+
+
+def probe_keyframe_times(video_path: str, timeout: float = 120):
+    """
+    Timestamps (s) dos keyframes do primeiro stream de video.
+
+    O ffprobe com `-skip_frame nokey` decodifica apenas os keyframes.
+
+    Returns:
+        list de floats, ou None se o ffprobe nao estiver disponivel/falhar
+    """
+    command = [
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0', '-skip_frame', 'nokey',
+        '-show_entries', 'frame=pts_time,best_effort_timestamp_time',
+        '-of', 'csv=p=0', str(video_path)
+    ]
+    try:
+        output = subprocess.run(command, capture_output=True, text=True,
+                                timeout=timeout, check=True).stdout
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning(f"ffprobe indisponivel para listar keyframes: {e}")
+        return None
+
+    times = []
+    for line in output.splitlines():
+        for value in line.split(','):
+            try:
+                times.append(float(value))
+                break
+            except ValueError:
+                continue
+    return sorted(set(times))
+
+
+class ChangeDetector:
+    """
+    Detector de mudanca de conteudo por miniatura em escala de cinza.
+
+    Compara a miniatura do frame com a do ultimo frame considerado
+    alterado (a referencia), de forma que mudancas lentas se acumulam ate
+    ultrapassar o limite. Ruido de compressao e o cursor do mouse ficam
+    bem abaixo dele.
+
+    Args:
+        threshold: Diferenca absoluta media (escala 0-255) a partir da qual
+                   o conteudo e considerado alterado
+        size: Tamanho (largura, altura) da miniatura
+    """
+
+    def __init__(self, threshold: float = 3.0, size: tuple = (32, 32)):
+        self.threshold = threshold
+        self.size = size
+        self.reference = None
+        self.last_difference = None
+
+    def thumbnail(self, frame) -> np.ndarray:
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def changed(self, frame) -> bool:
+        """True se o conteudo mudou (o frame passa a ser a referencia)."""
+        thumbnail = self.thumbnail(frame)
+        if self.reference is None:
+            self.reference = thumbnail
+            self.last_difference = None
+            return True
+
+        self.last_difference = float(np.mean(np.abs(thumbnail - self.reference)))
+        if self.last_difference > self.threshold:
+            self.reference = thumbnail
+            return True
+        return False
+
+
+class FrameSampler:
+    """
+    Itera sobre os frames amostrados de um `cv2.VideoCapture`.
+
+    Cada item e `(frame_number, frame_bgr, sampled)`; `sampled` so e False
+    no modo 'read', que entrega tambem os frames nao amostrados.
+
+    Args:
+        cap: VideoCapture ja aberto
+        every_n: Intervalo de amostragem em frames
+        mode: Um de SAMPLING_MODES
+        video_path: Caminho do video (necessario para 'keyframes')
+        fps: FPS do video (para converter timestamps em numero de frame)
+        total_frames: Numero de frames informado pelo container
+        change_detector: `ChangeDetector` opcional (deduplicacao e
+                         amostragem adaptativa)
+        min_every_n: Intervalo minimo com deteccao de mudanca
+                     (padrao: metade de every_n)
+        max_every_n: Intervalo maximo com deteccao de mudanca
+                     (padrao: 4x every_n)
+        start_frame: Primeiro frame do trecho (a captura e posicionada nele)
+        end_frame: Fim (exclusivo) do trecho; None = ate o fim do video
+        decode_width: Largura maxima dos frames no modo 'ffmpeg'
+        buffers: Buffers reaproveitados no modo 'ffmpeg'; cada frame entregue
+                 so e valido ate `buffers` frames entregues depois (o
+                 consumidor nao pode manter mais frames vivos que isso)
+    """
+
+    def __init__(self, cap, every_n: int, mode: str = 'grab', video_path: str = None,
+                 fps: float = 0.0, total_frames: int = 0, change_detector: ChangeDetector = None,
+                 min_every_n: int = None, max_every_n: int = None,
+                 start_frame: int = 0, end_frame: int = None,
+                 decode_width: int = 640, buffers: int = 4):
+        if mode not in SAMPLING_MODES:
+            logger.warning(f"Modo de amostragem desconhecido '{mode}', usando 'grab'")
+            mode = 'grab'
+
+        self.cap = cap
+        self.every_n = max(1, int(every_n))
+        self.mode = mode
+        self.video_path = video_path
+        self.fps = fps
+        self.total_frames = total_frames
+        self.change_detector = change_detector
+        self.min_every_n = max(1, int(min_every_n or self.every_n // 2))
+        self.max_every_n = max(self.every_n, int(max_every_n or self.every_n * 4))
+        self.interval = self.every_n
+        self.frames_grabbed = 0
+        self.frames_decoded = 0
+        self.frames_unchanged = 0
+        self.start_frame = max(0, int(start_frame))
+        self.end_frame = end_frame
+        # Fim (exclusivo) dos frames efetivamente lidos, nos modos sequenciais
+        self.reached_end = None
+        self._next_sample = self.start_frame
+        self.decode_width = decode_width
+        self.buffers = buffers
+
+    def _schedule(self, frame_number: int, frame) -> bool:
+        """
+        Agenda a proxima amostra a partir do frame amostrado atual.
+
+        Returns:
+            bool: False se o conteudo nao mudou (frame nao precisa ser classificado)
+        """
+        if self.change_detector is None:
+            self._next_sample = frame_number + self.every_n
+            return True
+
+        if self.change_detector.changed(frame):
+            self.interval = self.min_every_n
+            changed = True
+        else:
+            self.interval = min(self.max_every_n, self.interval * 2)
+            self.frames_unchanged += 1
+            changed = False
+
+        self._next_sample = frame_number + self.interval
+        return changed
+
+    def _in_range(self, frame_number: int) -> bool:
+        return self.end_frame is None or frame_number < self.end_frame
+
+    def _seek_start(self) -> int:
+        """Posiciona a captura no inicio do trecho; retorna o numero do frame."""
+        if self.start_frame:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+        return self.start_frame
+
+    def __iter__(self):
+        if self.mode == 'keyframes':
+            return self._iter_keyframes()
+        if self.mode == 'seek':
+            return self._iter_seek()
+        if self.mode == 'read':
+            return self._iter_read()
+        if self.mode == 'ffmpeg':
+            return self._iter_ffmpeg()
+        return self._iter_grab()
+
+    def _iter_read(self):
+        frame_number = self._seek_start()
+        while self._in_range(frame_number):
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            self.frames_grabbed += 1
+            self.frames_decoded += 1
+            sampled = frame_number == self._next_sample and self._schedule(frame_number, frame)
+            yield frame_number, frame, sampled
+            frame_number += 1
+        self.reached_end = frame_number
+
+    def _iter_grab(self):
+        frame_number = self._seek_start()
+        while self._in_range(frame_number) and self.cap.grab():
+            self.frames_grabbed += 1
+            if frame_number == self._next_sample:
+                ret, frame = self.cap.retrieve()
+                if not ret:
+                    break
+                self.frames_decoded += 1
+                if self._schedule(frame_number, frame):
+                    yield frame_number, frame, True
+            frame_number += 1
+        self.reached_end = frame_number
+
+    def _iter_seek(self):
+        if self.total_frames <= 0:
+            # Sem contagem confiavel no container: percorrer sequencialmente
+            yield from self._iter_grab()
+            return
+
+        end = self.total_frames if self.end_frame is None else min(self.total_frames, self.end_frame)
+        while self._next_sample < end:
+            frame_number = self._next_sample
+            if frame_number and not self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number):
+                break
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            self.frames_grabbed += 1
+            self.frames_decoded += 1
+            if self._schedule(frame_number, frame):
+                yield frame_number, frame, True
+
+    def _iter_keyframes(self):
+        times = probe_keyframe_times(self.video_path) if self.video_path else None
+        if not times or self.fps <= 0:
+            logger.warning("Keyframes indisponiveis - usando amostragem por seek")
+            yield from self._iter_seek()
+            return
+
+        last_frame = None
+        for timestamp in times:
+            frame_number = int(round(timestamp * self.fps))
+            if frame_number < self.start_frame:
+                continue
+            if not self._in_range(frame_number):
+                break
+            # Keyframes mais proximos que o intervalo de amostragem sao ignorados
+            if last_frame is not None and frame_number - last_frame < self.every_n:
+                continue
+            if not self.cap.set(cv2.CAP_PROP_POS_MSEC, timestamp * 1000):
+                break
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            self.frames_grabbed += 1
+            self.frames_decoded += 1
+            last_frame = frame_number
+            # Keyframes ja sao esparsos: o detector so remove os repetidos
+            if self._schedule(frame_number, frame):
+                yield frame_number, frame, True
+
+    def _iter_ffmpeg(self):
+        if not self.video_path or not find_ffmpeg():
+            logger.warning("ffmpeg indisponivel - usando amostragem por grab")
+            yield from self._iter_grab()
+            return
+
+        # Com deteccao de mudanca, o ffmpeg entrega a grade do intervalo minimo
+        # e o agendamento adaptativo descarta os frames antes da proxima amostra
+        grid = self.min_every_n if self.change_detector is not None else self.every_n
+        reader = FFmpegFrameReader(
+            self.video_path,
+            int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            grid,
+            max_width=self.decode_width,
+            fps=self.fps,
+            start_frame=self.start_frame,
+            end_frame=self.end_frame,
+            buffers=self.buffers
+        )
+        for frame_number, frame in reader:
+            self.frames_grabbed += 1
+            if frame_number < self._next_sample:
+                continue
+            self.frames_decoded += 1
+            if self._schedule(frame_number, frame):
+                # So os frames entregues ocupam o anel; os descartados tem o
+                # buffer reaproveitado, entao `buffers` limita os frames vivos
+                reader.keep()
+                yield frame_number, frame, True
+
+    def get_stats(self) -> dict:
+        """Frames percorridos, convertidos para BGR e descartados por nao terem mudado."""
+        return {
+            'mode': self.mode,
+            'every_n': self.every_n,
+            'frames_grabbed': self.frames_grabbed,
+            'frames_decoded': self.frames_decoded,
+            'frames_unchanged': self.frames_unchanged,
+            'change_detection': self.change_detector is not None
+        }
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Processamento de Video em Segmentos Paralelos
+=============================================
+Divide o video em N trechos de tempo e processa cada trecho em um processo
+separado, com a propria captura posicionada no inicio do trecho. Os
+resultados dos frames voltam na ordem dos trechos e sao juntados antes da
+votacao ponderada em `processar_video_xray`.
+
+- N acompanha os nucleos utilizaveis (afinidade do processo limitada pela
+  cota do cgroup, via `autotune.available_cpus`), sem deixar nenhum trecho
+  com menos de `min_seconds` de video (cada processo carrega o modelo);
+- os limites dos trechos caem na grade de amostragem (multiplos de
+  every_n): sem deteccao de mudanca, os frames classificados sao os mesmos
+  da analise em um unico processo;
+- cada processo recebe a sua fatia dos nucleos para as threads de
+  inferencia e de pre-processamento.
+
+Os processos sao iniciados como `python video_segments.py segment ...`, e
+nao com multiprocessing, pelo mesmo motivo dos workers de `video_jobs.py`:
+o spawn reimportaria o modulo principal (chatbot.py) em cada filho.
+
+Uso (processo filho, chamado por `run_segments`):
+    python video_segments.py segment --video exame.mp4 --start 0 --end 1800
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+from autotune import available_cpus
+
+logger = logging.getLogger(__name__)
+
+# Intervalo de verificacao de cancelamento enquanto aguarda um trecho
+POLL_INTERVAL = 0.5
+
+
+def segment_count(total_frames: int, fps: float, requested: int = 0, min_seconds: float = 60) -> int:
+    """
+    Numero de trechos para o video.
+
+    Args:
+        total_frames: Frames do video
+        fps: FPS do video
+        requested: Trechos pedidos (0 = um por nucleo utilizavel)
+        min_seconds: Duracao minima de cada trecho
+
+    Returns:
+        int: 1 quando o video nao compensa a divisao
+    """
+    count = requested if requested > 0 else available_cpus()
+    if fps > 0 and min_seconds > 0:
+        count = min(count, int(total_frames / fps // min_seconds))
+    return max(1, count)
+
+
+def plan_segments(total_frames: int, every_n: int, count: int) -> list:
+    """Trechos [inicio, fim) com os limites alinhados a grade de amostragem."""
+    every_n = max(1, int(every_n))
+    steps = -(-total_frames // every_n)
+    count = max(1, min(count, steps))
+    bounds = [round(i * steps / count) * every_n for i in range(count)] + [total_frames]
+    return [(bounds[i], bounds[i + 1]) for i in range(count) if bounds[i] < bounds[i + 1]]
+
+
+def _segment_command(video_path: str, start: int, end: int, sampling_mode: str = None,
+                     change_detection: bool = None) -> list:
+    command = [sys.executable, os.path.abspath(__file__), 'segment',
+               '--video', str(video_path), '--start', str(start), '--end', str(end)]
+    if sampling_mode:
+        command += ['--sampling-mode', sampling_mode]
+    if change_detection is not None:
+        command += ['--change-detection', 'true' if change_detection else 'false']
+    return command
+
+
+def _wait_output(process: subprocess.Popen, cancel_event=None) -> str:
+    """Aguarda o processo do trecho e devolve o stdout (JSON); None se cancelado."""
+    while True:
+        try:
+            output, _ = process.communicate(timeout=POLL_INTERVAL)
+            break
+        except subprocess.TimeoutExpired:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+
+    if process.returncode != 0:
+        raise RuntimeError(f"processo do trecho terminou com codigo {process.returncode}")
+    return output
+
+
+def run_segments(video_path: str, ranges: list, sampling_mode: str = None,
+                 change_detection: bool = None, cancel_event=None):
+    """
+    Processa os trechos em paralelo, um processo por trecho.
+
+    Gera `((inicio, fim), resultado)` na ordem dos trechos, a medida que
+    cada um termina (o resultado e o dict de `processar_video_xray`
+    restrito ao trecho). Fechar o gerador (parada antecipada) ou sinalizar
+    `cancel_event` encerra os processos restantes.
+    """
+    threads = max(1, available_cpus() // len(ranges))
+    env = dict(os.environ)
+    env['TF_CPP_MIN_LOG_LEVEL'] = '2'
+    env['XRAY_INTRA_OP_THREADS'] = str(threads)
+    env['VIDEO_PREPROCESS_WORKERS'] = str(threads)
+
+    processes = [
+        subprocess.Popen(_segment_command(video_path, start, end, sampling_mode, change_detection),
+                         env=env, stdout=subprocess.PIPE, text=True)
+        for start, end in ranges
+    ]
+
+    try:
+        for frame_range, process in zip(ranges, processes):
+            output = _wait_output(process, cancel_event)
+            if output is None:
+                return
+            try:
+                yield frame_range, json.loads(output)
+            except ValueError:
+                raise RuntimeError(f"saida invalida do trecho {frame_range}")
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+
+
+def merge_segment_stats(segments: list, wall_s: float) -> dict:
+    """Soma as estatisticas de amostragem e rastreamento dos trechos."""
+    sampling = None
+    region_tracking = {}
+    per_segment = []
+
+    for (start, end), result in segments:
+        stats = result.get('sampling')
+        if stats:
+            if sampling is None:
+                sampling = dict(stats)
+            else:
+                for key in ('frames_grabbed', 'frames_decoded', 'frames_unchanged'):
+                    sampling[key] += stats[key]
+        for key, value in (result.get('region_tracking') or {}).items():
+            region_tracking[key] = region_tracking.get(key, 0) + value
+        per_segment.append({
+            'start_frame': start,
+            'end_frame': end,
+            'frames_classified': len(result.get('frame_results', [])),
+            'pipeline': result.get('pipeline')
+        })
+
+    return {
+        'sampling': sampling,
+        'region_tracking': region_tracking,
+        'pipeline': {
+            'mode': 'segments',
+            'segments': len(per_segment),
+            'wall_s': wall_s,
+            'per_segment': per_segment
+        }
+    }
+
+
+def run_segment_worker(video_path: str, start: int, end: int, sampling_mode: str = None,
+                       change_detection: bool = None):
+    """Processo filho: analisa um trecho e escreve o resultado em JSON no stdout."""
+    # Mensagens de progresso vao para o stderr; o stdout leva apenas o resultado
+    output = sys.stdout
+    sys.stdout = sys.stderr
+
+    from gravar_e_transcrever import processar_video_xray
+
+    started = time.perf_counter()
+    result = processar_video_xray(
+        video_path,
+        sampling_mode=sampling_mode,
+        change_detection=change_detection,
+        full_scan=True,
+        frame_range=(start, end),
+        include_frame_results=True
+    )
+    logger.info(f"Trecho {start}-{end} processado em {time.perf_counter() - started:.1f}s")
+
+    output.write(json.dumps(result))
+    output.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Processamento de video em segmentos paralelos')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    segment = subparsers.add_parser('segment', help='Analisa um trecho do video (processo filho)')
+    segment.add_argument('--video', required=True, help='Caminho do video')
+    segment.add_argument('--start', type=int, required=True, help='Primeiro frame do trecho')
+    segment.add_argument('--end', type=int, required=True, help='Fim (exclusivo) do trecho')
+    segment.add_argument('--sampling-mode', default=None, help="'grab', 'seek' ou 'keyframes'")
+    segment.add_argument('--change-detection', choices=('true', 'false'), default=None,
+                         help='Deteccao de mudanca (padrao: VIDEO_CHANGE_DETECTION)')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == 'segment':
+        change_detection = None if args.change_detection is None else args.change_detection == 'true'
+        run_segment_worker(args.video, args.start, args.end, args.sampling_mode, change_detection)
+
+
+if __name__ == '__main__':
+    main()
@@ -12,23 +12,82 @@ Classes de classificacao:
 - 3: Pneumonia Bacteriana
 """
 
+import hashlib
+import json
 import os
+import time
 import numpy as np
 from PIL import Image
-import base64
-from io import BytesIO
 import logging
 from dotenv import load_dotenv
 
 # Importar configurações centralizadas
 try:
-    from config import MODEL_PATH, IMAGE_SIZE
+    from config import (
+        MODEL_PATH,
+        IMAGE_SIZE,
+        XRAY_BATCHING_ENABLED,
+        XRAY_MAX_BATCH_SIZE,
+        XRAY_MAX_BATCH_WAIT_MS,
+        XRAY_BATCH_TIMEOUT_SECONDS,
+        XRAY_INFERENCE_MODE,
+        XRAY_JIT_COMPILE,
+        XRAY_INTRA_OP_THREADS,
+        XRAY_INTER_OP_THREADS,
+        XRAY_RUNTIME_PROFILE_ENABLED,
+        XRAY_RUNTIME_PROFILE_PATH,
+        XRAY_BACKEND,
+        XRAY_ONNX_MODEL_PATH,
+        XRAY_TFLITE_MODEL_PATH,
+        XRAY_FAST_MODEL_ENABLED,
+        XRAY_FAST_MODEL_PATH,
+        XRAY_OOD_GATE_ENABLED,
+        XRAY_OOD_GATE_PATH,
+        XRAY_CACHE_ENABLED,
+        XRAY_CACHE_MAX_ENTRIES,
+        XRAY_CACHE_TTL_SECONDS,
+        XRAY_CACHE_SQLITE_PATH,
+        XRAY_CACHE_PERCEPTUAL_HASH,
+        XRAY_CACHE_PERCEPTUAL_MAX_DIFF,
+        XRAY_MODEL_SERVER_SOCKET
+    )
 except ImportError:
     # Fallback se config não importável (development edge case)
     from pathlib import Path
     BASE_DIR = Path(__file__).parent
     MODEL_PATH = BASE_DIR / "Departamento_Medico" / "melhor_modelo.keras"
     IMAGE_SIZE = (256, 256)
+    XRAY_BATCHING_ENABLED = os.getenv('XRAY_BATCHING_ENABLED', 'true').lower() == 'true'
+    XRAY_MAX_BATCH_SIZE = int(os.getenv('XRAY_MAX_BATCH_SIZE', 8))
+    XRAY_MAX_BATCH_WAIT_MS = float(os.getenv('XRAY_MAX_BATCH_WAIT_MS', 5))
+    XRAY_BATCH_TIMEOUT_SECONDS = float(os.getenv('XRAY_BATCH_TIMEOUT_SECONDS', 30))
+    XRAY_INFERENCE_MODE = os.getenv('XRAY_INFERENCE_MODE', 'compiled').lower()
+    XRAY_JIT_COMPILE = os.getenv('XRAY_JIT_COMPILE', 'false').lower() == 'true'
+    XRAY_INTRA_OP_THREADS = int(os.getenv('XRAY_INTRA_OP_THREADS', 0))
+    XRAY_INTER_OP_THREADS = int(os.getenv('XRAY_INTER_OP_THREADS', 0))
+    XRAY_RUNTIME_PROFILE_ENABLED = os.getenv('XRAY_RUNTIME_PROFILE_ENABLED', 'true').lower() == 'true'
+    XRAY_RUNTIME_PROFILE_PATH = Path(os.getenv('XRAY_RUNTIME_PROFILE_PATH', MODEL_PATH.parent / 'runtime_profile.json'))
+    XRAY_BACKEND = os.getenv('XRAY_BACKEND', 'keras').lower()
+    XRAY_ONNX_MODEL_PATH = Path(os.getenv('XRAY_ONNX_MODEL_PATH', MODEL_PATH.with_suffix('.onnx')))
+    XRAY_TFLITE_MODEL_PATH = Path(os.getenv('XRAY_TFLITE_MODEL_PATH', MODEL_PATH.with_suffix('.tflite')))
+    XRAY_FAST_MODEL_ENABLED = os.getenv('XRAY_FAST_MODEL_ENABLED', 'true').lower() == 'true'
+    XRAY_FAST_MODEL_PATH = Path(os.getenv('XRAY_FAST_MODEL_PATH', MODEL_PATH.with_suffix('.fastload')))
+    XRAY_OOD_GATE_ENABLED = os.getenv('XRAY_OOD_GATE_ENABLED', 'true').lower() == 'true'
+    XRAY_OOD_GATE_PATH = Path(os.getenv('XRAY_OOD_GATE_PATH', MODEL_PATH.parent / 'ood_gate.npz'))
+    XRAY_CACHE_ENABLED = os.getenv('XRAY_CACHE_ENABLED', 'true').lower() == 'true'
+    XRAY_CACHE_MAX_ENTRIES = int(os.getenv('XRAY_CACHE_MAX_ENTRIES', 512))
+    XRAY_CACHE_TTL_SECONDS = int(os.getenv('XRAY_CACHE_TTL_SECONDS', 3600))
+    XRAY_CACHE_SQLITE_PATH = os.getenv('XRAY_CACHE_SQLITE_PATH', '')
+    XRAY_CACHE_PERCEPTUAL_HASH = os.getenv('XRAY_CACHE_PERCEPTUAL_HASH', 'false').lower() == 'true'
+    XRAY_CACHE_PERCEPTUAL_MAX_DIFF = float(os.getenv('XRAY_CACHE_PERCEPTUAL_MAX_DIFF', 2.0))
+    XRAY_MODEL_SERVER_SOCKET = os.getenv('XRAY_MODEL_SERVER_SOCKET', '')
+
+from fast_model import MANIFEST_NAME, is_fast_artifact, load_fast_artifact
+from inference_batcher import MicroBatcher
+from inference_backends import BACKENDS, INFERENCE_MODES, KerasBackend, load_backend
+from image_ingestion import encode_vision_thumbnail, frame_to_tensor, image_to_tensor
+from ood_gate import MahalanobisGate, VERDICT_NOT_XRAY, VERDICT_UNCERTAIN, VERDICT_XRAY
+from result_cache import ResultCache, image_cache_keys
 
 load_dotenv()
 
@@ -51,6 +110,15 @@ DISEASE_QUERIES = {
     'Pneumonia Bacteriana': 'pneumonia bacteriana infeccao bacteria antibioticos tratamento pulmonar'
 }
 
+# Chaves do perfil de runtime (autotune.py) -> (atributo, variavel de ambiente)
+RUNTIME_PROFILE_SETTINGS = {
+    'backend': ('backend_name', 'XRAY_BACKEND'),
+    'intra_op_threads': ('intra_op_threads', 'XRAY_INTRA_OP_THREADS'),
+    'inter_op_threads': ('inter_op_threads', 'XRAY_INTER_OP_THREADS'),
+    'max_batch_size': ('max_batch_size', 'XRAY_MAX_BATCH_SIZE'),
+    'max_batch_wait_ms': ('max_batch_wait_ms', 'XRAY_MAX_BATCH_WAIT_MS')
+}
+
 
 class XRayClassifier:
     """
@@ -60,14 +128,129 @@ class XRayClassifier:
     para classificar imagens em 4 categorias de doencas pulmonares.
     """
 
-    def __init__(self):
-        """Inicializa o classificador carregando o modelo e o cliente OpenAI."""
+    def __init__(self, inference_mode: str = None, backend: str = None,
+                 backend_path=None):
+        """
+        Inicializa o classificador carregando o modelo e o cliente OpenAI.
+
+        Args:
+            inference_mode: 'compiled' (tf.function com assinatura fixa,
+                aquecida no carregamento) ou 'predict' (model.predict do
+                Keras). Padrao: XRAY_INFERENCE_MODE.
+            backend: Runtime de inferencia ('keras', 'onnx' ou 'tflite').
+                Padrao: XRAY_BACKEND ou o perfil de runtime (autotune.py).
+            backend_path: Arquivo do modelo exportado (onnx/tflite).
+                Padrao: XRAY_ONNX_MODEL_PATH / XRAY_TFLITE_MODEL_PATH.
+        """
+        self._started_at = time.perf_counter()
         self.model = None
+        self.model_format = None
+        self.load_time_ms = None
+        self.time_to_first_prediction_ms = None
+        self.backend = None
         self.client = None
+        self.batcher = None
+        self.inference_mode = (inference_mode or XRAY_INFERENCE_MODE).lower()
+        self.backend_name = (backend or XRAY_BACKEND).lower()
+        self.backend_path = backend_path
+        self.intra_op_threads = XRAY_INTRA_OP_THREADS
+        self.inter_op_threads = XRAY_INTER_OP_THREADS
+        self.max_batch_size = XRAY_MAX_BATCH_SIZE
+        self.max_batch_wait_ms = XRAY_MAX_BATCH_WAIT_MS
+        self.runtime_profile = None
+        self._explicit_backend = backend is not None
+        self.ood_gate = None
+        self.cache = None
+        self.cache_namespace = None
+        self.gate_counts = {VERDICT_XRAY: 0, VERDICT_NOT_XRAY: 0, VERDICT_UNCERTAIN: 0}
+
         self._load_model()
+        if self.backend is not None:
+            self.load_time_ms = (time.perf_counter() - self._started_at) * 1000
+            logger.info(f"⏱️  Modelo pronto em {self.load_time_ms:.0f} ms (formato: {self.model_format})")
+        self._load_ood_gate()
+        self._initialize_batcher()
+        self._initialize_cache()
         self._initialize_openai_client()
 
     def _load_model(self):
+        """
+        Carrega o modelo no backend configurado.
+
+        Backends exportados (onnx/tflite) nao dependem do TensorFlow completo;
+        se falharem, o classificador volta para o modelo Keras.
+        """
+        self._apply_runtime_profile()
+
+        if self.backend_name != 'keras':
+            if self._load_exported_backend():
+                return
+            self.backend_name = 'keras'
+
+        self._load_keras_model()
+
+    def _apply_runtime_profile(self):
+        """
+        Aplica o perfil de runtime gerado por `autotune.py`.
+
+        Variaveis de ambiente definidas explicitamente e o backend passado
+        ao construtor tem precedencia sobre o perfil.
+        """
+        if not XRAY_RUNTIME_PROFILE_ENABLED or not os.path.exists(str(XRAY_RUNTIME_PROFILE_PATH)):
+            return
+
+        try:
+            with open(XRAY_RUNTIME_PROFILE_PATH) as f:
+                settings = json.load(f).get('settings', {})
+        except Exception as e:
+            logger.error(f"Erro ao ler perfil de runtime {XRAY_RUNTIME_PROFILE_PATH}: {e}")
+            return
+
+        applied = {}
+        for key, (attribute, env_var) in RUNTIME_PROFILE_SETTINGS.items():
+            if key not in settings or env_var in os.environ:
+                continue
+            if key == 'backend' and self._explicit_backend:
+                continue
+            setattr(self, attribute, settings[key])
+            applied[key] = settings[key]
+
+        self.runtime_profile = applied
+        logger.info(f"Perfil de runtime aplicado ({XRAY_RUNTIME_PROFILE_PATH}): {applied}")
+
+    def _configure_tensorflow_threads(self, tf):
+        """Limita os pools de threads do TensorFlow (antes do primeiro uso do runtime)."""
+        try:
+            if self.intra_op_threads:
+                tf.config.threading.set_intra_op_parallelism_threads(int(self.intra_op_threads))
+            if self.inter_op_threads:
+                tf.config.threading.set_inter_op_parallelism_threads(int(self.inter_op_threads))
+        except RuntimeError as e:
+            # O runtime ja foi inicializado neste processo (ex.: outro classificador)
+            logger.warning(f"Threads do TensorFlow nao aplicadas: {e}")
+
+    def _load_exported_backend(self) -> bool:
+        """Carrega um modelo exportado em ONNX ou TFLite."""
+        default_paths = {'onnx': XRAY_ONNX_MODEL_PATH, 'tflite': XRAY_TFLITE_MODEL_PATH}
+
+        if self.backend_name not in BACKENDS:
+            logger.error(f"Backend desconhecido '{self.backend_name}', usando keras")
+            return False
+
+        model_path = self.backend_path or default_paths[self.backend_name]
+        try:
+            self.backend = load_backend(self.backend_name, model_path,
+                                        num_threads=int(self.intra_op_threads) or None)
+            self.inference_mode = None
+            self.model_format = self.backend_name
+            logger.info(f"Modelo de raio-X ({self.backend_name}) carregado de: {model_path}")
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao carregar backend {self.backend_name}, usando keras: {e}")
+            self.backend = None
+            return False
+
+    def _load_keras_model(self):
         """
         Carrega o modelo Keras do arquivo.
 
@@ -79,22 +262,127 @@ class XRayClassifier:
             os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
             import tensorflow as tf
             tf.get_logger().setLevel('ERROR')
+            self._configure_tensorflow_threads(tf)
 
             from tensorflow.keras.models import load_model
 
             # Converter Path para string se necessário
             model_path_str = str(MODEL_PATH) if not isinstance(MODEL_PATH, str) else MODEL_PATH
-            
-            if not os.path.exists(model_path_str):
-                logger.error(f"Modelo nao encontrado em: {model_path_str}")
-                return
 
-            self.model = load_model(model_path_str)
-            logger.info(f"Modelo de raio-X carregado com sucesso de: {model_path_str}")
+            self.model = self._load_fast_model()
+
+            if self.model is None:
+                if not os.path.exists(model_path_str):
+                    logger.error(f"Modelo nao encontrado em: {model_path_str}")
+                    return
+
+                self.model = load_model(model_path_str)
+                self.model_format = 'keras'
+                logger.info(f"Modelo de raio-X carregado com sucesso de: {model_path_str}")
+
+            self.backend = KerasBackend(
+                self.model,
+                IMAGE_SIZE,
+                inference_mode=self.inference_mode,
+                jit_compile=XRAY_JIT_COMPILE
+            )
+            self.inference_mode = self.backend.inference_mode
 
         except Exception as e:
             logger.error(f"Erro ao carregar modelo de raio-X: {e}")
             self.model = None
+            self.backend = None
+
+    def _load_fast_model(self):
+        """
+        Carrega o artefato de carregamento rapido (`fast_model.py`), se existir.
+
+        Returns:
+            Modelo Keras, ou None para cair no `.keras`.
+        """
+        if not XRAY_FAST_MODEL_ENABLED or not is_fast_artifact(XRAY_FAST_MODEL_PATH):
+            return None
+
+        try:
+            model = load_fast_artifact(XRAY_FAST_MODEL_PATH)
+            self.model_format = 'fastload'
+            logger.info(f"Modelo de raio-X carregado do artefato rapido: {XRAY_FAST_MODEL_PATH}")
+            return model
+        except Exception as e:
+            logger.error(f"Erro ao carregar artefato rapido, usando .keras: {e}")
+            return None
+
+    def _load_ood_gate(self):
+        """
+        Carrega o gate local de out-of-distribution, se ajustado.
+
+        Sem o arquivo do gate, todas as imagens continuam sendo verificadas
+        pelo GPT-4o Vision.
+        """
+        if self.backend is None or not XRAY_OOD_GATE_ENABLED:
+            return
+
+        if not os.path.exists(str(XRAY_OOD_GATE_PATH)):
+            logger.info(f"Gate local de raio-X nao encontrado em {XRAY_OOD_GATE_PATH} "
+                        f"- usando apenas GPT-4o Vision")
+            return
+
+        try:
+            self.ood_gate = MahalanobisGate.load(XRAY_OOD_GATE_PATH)
+            logger.info(f"Gate local de raio-X carregado de: {XRAY_OOD_GATE_PATH}")
+        except Exception as e:
+            logger.error(f"Erro ao carregar gate local de raio-X: {e}")
+            self.ood_gate = None
+
+    def _initialize_batcher(self):
+        """
+        Cria a fila de micro-batching usada por `classify`.
+
+        Chamadas concorrentes (varias threads do Flask usando o mesmo
+        singleton) sao agrupadas em um unico forward pass.
+        """
+        if self.backend is None or not XRAY_BATCHING_ENABLED or self.max_batch_size <= 1:
+            return
+
+        self.batcher = MicroBatcher(
+            self.predict_batch_with_features,
+            max_batch_size=int(self.max_batch_size),
+            max_wait_ms=float(self.max_batch_wait_ms),
+            name='xray',
+            timeout_s=XRAY_BATCH_TIMEOUT_SECONDS
+        )
+
+    def _initialize_cache(self):
+        """
+        Cria o cache de resultados (veredito do Vision e classificacao),
+        enderecado pelo conteudo da imagem.
+        """
+        if not XRAY_CACHE_ENABLED:
+            return
+
+        self.cache = ResultCache(
+            max_entries=XRAY_CACHE_MAX_ENTRIES,
+            ttl_seconds=XRAY_CACHE_TTL_SECONDS,
+            sqlite_path=XRAY_CACHE_SQLITE_PATH or None,
+            name='xray'
+        )
+        # Identidade do modelo carregado nas chaves: a camada em SQLite
+        # sobrevive a reinicios e nao pode servir resultados de outro modelo
+        identity = {'format': self.model_format, **model_fingerprint()}
+        self.cache_namespace = hashlib.sha256(
+            json.dumps(identity, sort_keys=True).encode()
+        ).hexdigest()[:16]
+
+    def get_cache_keys(self, image: Image.Image):
+        """
+        Chaves de cache de uma imagem decodificada (`ImageCacheKeys`: hash dos
+        pixels e, se habilitado, hash perceptual). Lista vazia se o cache
+        estiver desligado.
+        """
+        if self.cache is None:
+            return []
+        return image_cache_keys(image, use_perceptual_hash=XRAY_CACHE_PERCEPTUAL_HASH,
+                                max_difference=XRAY_CACHE_PERCEPTUAL_MAX_DIFF)
 
     def _initialize_openai_client(self):
         """Inicializa o cliente OpenAI para deteccao de raio-X."""
@@ -114,32 +402,60 @@ class XRayClassifier:
             image: Imagem PIL a ser processada
 
         Returns:
-            numpy.ndarray: Imagem preprocessada com shape (1, 256, 256, 3)
+            numpy.ndarray: Imagem preprocessada float32 com shape (1, 256, 256, 3)
+        """
+        return image_to_tensor(image)
+
+    def preprocess_frame(self, frame: np.ndarray, bbox: tuple = None, out: np.ndarray = None) -> np.ndarray:
+        """
+        Pre-processa um frame de video (array BGR/cinza do OpenCV) sem passar pelo PIL.
+
+        Args:
+            frame: Frame uint8 (H, W, 3) BGR ou (H, W)
+            bbox: Regiao (x, y, w, h) do raio-X, ou None para o frame inteiro
+            out: Destino opcional, por exemplo uma fatia de um lote preallocado
+
+        Returns:
+            numpy.ndarray: float32 com shape (1, 256, 256, 3) (ou `out`)
         """
-        # Converter para RGB se necessario
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
+        return frame_to_tensor(frame, bbox, out=out)
 
-        # Redimensionar para o tamanho esperado pelo modelo
-        image = image.resize(IMAGE_SIZE)
+    def predict_batch(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Executa o modelo em um lote ja preprocessado.
 
-        # Converter para array numpy
-        img_array = np.array(image)
+        Args:
+            batch: Array com shape (N, 256, 256, 3)
 
-        # Normalizar valores de pixel para [0, 1]
-        img_array = img_array / 255.0
+        Returns:
+            numpy.ndarray: Probabilidades com shape (N, 4)
+        """
+        return self.predict_batch_with_features(batch)[0]
+
+    def predict_batch_with_features(self, batch: np.ndarray):
+        """
+        Executa o modelo e retorna tambem as features penultimas.
+
+        Returns:
+            tuple: (probabilidades (N, 4), features (N, D) ou None se o
+            backend nao expuser a camada penultima)
+        """
+        outputs = self.backend.predict_with_features(np.asarray(batch, dtype=np.float32))
 
-        # Adicionar dimensao de batch: (1, 256, 256, 3)
-        img_array = img_array.reshape(-1, IMAGE_SIZE[0], IMAGE_SIZE[1], 3)
+        if self.time_to_first_prediction_ms is None:
+            self.time_to_first_prediction_ms = (time.perf_counter() - self._started_at) * 1000
+            logger.info(f"⏱️  Tempo ate a primeira predicao: {self.time_to_first_prediction_ms:.0f} ms "
+                        f"(formato: {self.model_format})")
 
-        return img_array
+        return outputs
 
-    def classify(self, image: Image.Image) -> dict:
+    def classify(self, image) -> dict:
         """
         Classifica uma imagem de raio-X.
 
         Args:
-            image: Imagem PIL do raio-X
+            image: Imagem PIL do raio-X ou tensor ja preprocessado
+                (1, 256, 256, 3), como o produzido por `ingest_image`
 
         Returns:
             dict: Dicionario com resultado da classificacao:
@@ -150,48 +466,123 @@ class XRayClassifier:
                 - all_probabilities: probabilidades para todas as classes
                 - error: mensagem de erro (se aplicavel)
         """
-        if self.model is None:
-            return {
+        return self._classify(image)[0]
+
+    def classify_batch(self, images) -> list:
+        """
+        Classifica varias imagens em um unico forward pass.
+
+        Args:
+            images: Lista de imagens PIL / tensores (1, 256, 256, 3), ou um
+                lote ja empilhado (N, 256, 256, 3)
+
+        Returns:
+            list: Um dicionario por imagem, no mesmo formato de `classify`
+        """
+        if self.backend is None:
+            return [{
                 'success': False,
                 'error': 'Modelo de classificacao nao carregado'
-            }
+            } for _ in range(len(images))]
 
         try:
-            # Pre-processar imagem
-            processed = self.preprocess_image(image)
+            if isinstance(images, np.ndarray):
+                batch = images
+            else:
+                batch = np.concatenate([
+                    image if isinstance(image, np.ndarray) else self.preprocess_image(image)
+                    for image in images
+                ])
 
-            # Fazer predicao
-            predictions = self.model.predict(processed, verbose=0)
+            return [build_classification_result(p) for p in self.predict_batch(batch)]
 
-            # Obter classe com maior probabilidade
-            class_id = int(np.argmax(predictions[0]))
-            confidence = float(predictions[0][class_id])
-            class_name = CLASS_LABELS[class_id]
+        except Exception as e:
+            logger.error(f"Erro na classificacao em lote: {e}")
+            return [{
+                'success': False,
+                'error': str(e)
+            } for _ in range(len(images))]
 
-            # Construir dicionario de probabilidades
-            all_probabilities = {
-                CLASS_LABELS[i]: float(predictions[0][i])
-                for i in range(len(CLASS_LABELS))
-            }
+    def classify_with_gate(self, image, cache_keys=None) -> tuple:
+        """
+        Classifica a imagem e avalia o gate local de raio-X no mesmo forward pass.
 
-            logger.info(f"Raio-X classificado: {class_name} ({confidence*100:.1f}%)")
+        Args:
+            image: Imagem PIL do raio-X ou tensor ja preprocessado
+            cache_keys: Chaves de `get_cache_keys`; com elas, o resultado e
+                reaproveitado para a mesma imagem
 
+        Returns:
+            tuple: (resultado de `classify`, veredito do gate local:
+            'xray', 'not_xray' ou 'uncertain'). Sem gate ajustado, ou se a
+            classificacao falhar, o veredito e 'uncertain' e a decisao fica
+            com `is_xray_image`.
+        """
+        if cache_keys and self.cache is not None:
+            cached = cache_keys.get(self.cache, f"classify:{self.cache_namespace}")
+            if cached is not None:
+                logger.info(f"Raio-X em cache: {cached['result']['class_name']} "
+                            f"(gate local: {cached['verdict']})")
+                return cached['result'], cached['verdict']
+
+        result, features = self._classify(image)
+
+        verdict = VERDICT_UNCERTAIN
+        if result['success'] and self.ood_gate is not None and features is not None:
+            try:
+                verdict = self.ood_gate.verdict(features)
+            except Exception as e:
+                logger.error(f"Erro no gate local de raio-X: {e}")
+
+        self.gate_counts[verdict] += 1
+        logger.info(f"Gate local de raio-X: {verdict}")
+
+        if cache_keys and self.cache is not None and result['success']:
+            cache_keys.set(self.cache, f"classify:{self.cache_namespace}",
+                           {'result': result, 'verdict': verdict})
+
+        return result, verdict
+
+    def _classify(self, image) -> tuple:
+        """Executa a classificacao e retorna (resultado, features penultimas)."""
+        if self.backend is None:
             return {
-                'success': True,
-                'class_name': class_name,
-                'class_id': class_id,
-                'confidence': confidence,
-                'all_probabilities': all_probabilities
-            }
+                'success': False,
+                'error': 'Modelo de classificacao nao carregado'
+            }, None
+
+        try:
+            # Pre-processar imagem (se ainda nao for o tensor do modelo)
+            if isinstance(image, np.ndarray):
+                processed = image
+            else:
+                processed = self.preprocess_image(image)
+
+            # Fazer predicao (agrupada com chamadas concorrentes, se habilitado)
+            if self.batcher is not None:
+                probabilities, features = self.batcher.submit(processed[0],
+                                                              timeout=XRAY_BATCH_TIMEOUT_SECONDS)
+            else:
+                probabilities, features = self.predict_batch_with_features(processed)
+                probabilities = probabilities[0]
+                features = features[0] if features is not None else None
+
+            result = build_classification_result(probabilities)
+
+            logger.info(f"Raio-X classificado: {result['class_name']} "
+                        f"({result['confidence']*100:.1f}%)")
+
+            return result, features
 
         except Exception as e:
             logger.error(f"Erro na classificacao: {e}")
             return {
                 'success': False,
                 'error': str(e)
-            }
+            }, None
 
-    def is_xray_image(self, image: Image.Image) -> bool:
+    def is_xray_image(self, image: Image.Image, image_data_url: str = None,
+                      cache_keys=None) -> bool:
         """
         Detecta se uma imagem e um raio-X de torax usando GPT-4o Vision.
 
@@ -201,19 +592,28 @@ class XRayClassifier:
 
         Args:
             image: Imagem PIL a ser analisada
+            image_data_url: Miniatura ja codificada (data URL); se ausente,
+                e gerada a partir de `image`
+            cache_keys: Chaves de `get_cache_keys`; com elas, o veredito e
+                reaproveitado para a mesma imagem sem nova chamada remota
 
         Returns:
             bool: True se a imagem for um raio-X de torax, False caso contrario
         """
+        if cache_keys and self.cache is not None:
+            cached = cache_keys.get(self.cache, f"vision:{self.cache_namespace}")
+            if cached is not None:
+                logger.info(f"Deteccao de raio-X em cache: {'Sim' if cached else 'Nao'}")
+                return cached
+
         if self.client is None:
             logger.warning("Cliente OpenAI nao disponivel para deteccao de raio-X")
             return False
 
         try:
-            # Converter imagem para base64
-            buffered = BytesIO()
-            image.save(buffered, format="PNG")
-            base64_image = base64.b64encode(buffered.getvalue()).decode('utf-8')
+            # Miniatura JPEG comprimida em base64 (evita PNG em resolucao total)
+            if image_data_url is None:
+                image_data_url = encode_vision_thumbnail(image)
 
             # Consultar GPT-4o Vision
             response = self.client.chat.completions.create(
@@ -238,7 +638,7 @@ Nao inclua nenhum outro texto na resposta."""
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/png;base64,{base64_image}",
+                                    "url": image_data_url,
                                 }
                             }
                         ]
@@ -251,6 +651,11 @@ Nao inclua nenhum outro texto na resposta."""
             is_xray = answer == 'YES'
 
             logger.info(f"Deteccao de raio-X: {'Sim' if is_xray else 'Nao'}")
+
+            # Apenas respostas validas vao para o cache (erros nao)
+            if cache_keys and self.cache is not None:
+                cache_keys.set(self.cache, f"vision:{self.cache_namespace}", is_xray)
+
             return is_xray
 
         except Exception as e:
@@ -274,12 +679,78 @@ Nao inclua nenhum outro texto na resposta."""
 
     def is_model_loaded(self) -> bool:
         """Verifica se o modelo foi carregado com sucesso."""
-        return self.model is not None
+        return self.backend is not None
 
     def get_class_labels(self) -> dict:
         """Retorna o mapeamento de IDs para nomes de classes."""
         return CLASS_LABELS.copy()
 
+    def get_inference_stats(self) -> dict:
+        """Retorna estatisticas de inferencia (histogramas do micro-batching)."""
+        return {
+            'backend': self.backend_name,
+            'inference_mode': self.inference_mode,
+            'model_format': self.model_format,
+            'load_time_ms': self.load_time_ms,
+            'time_to_first_prediction_ms': self.time_to_first_prediction_ms,
+            'runtime_profile': self.runtime_profile,
+            'intra_op_threads': self.intra_op_threads,
+            'inter_op_threads': self.inter_op_threads,
+            'ood_gate_loaded': self.ood_gate is not None,
+            'ood_gate_verdicts': dict(self.gate_counts),
+            'cache': self.cache.get_stats() if self.cache is not None else None,
+            'batching_enabled': self.batcher is not None,
+            'batching': self.batcher.get_stats() if self.batcher is not None else None
+        }
+
+
+def build_classification_result(probabilities) -> dict:
+    """
+    Monta o dicionario de resultado a partir do vetor de probabilidades.
+
+    Args:
+        probabilities: Vetor com as 4 probabilidades de saida do modelo
+
+    Returns:
+        dict: Mesmo formato retornado por `XRayClassifier.classify`
+    """
+    class_id = int(np.argmax(probabilities))
+
+    return {
+        'success': True,
+        'class_name': CLASS_LABELS[class_id],
+        'class_id': class_id,
+        'confidence': float(probabilities[class_id]),
+        'all_probabilities': {
+            CLASS_LABELS[i]: float(probabilities[i])
+            for i in range(len(CLASS_LABELS))
+        }
+    }
+
+
+def model_fingerprint() -> dict:
+    """
+    Identidade dos artefatos que o classificador configurado pode carregar.
+
+    Caminho, tamanho e mtime de cada artefato (mais o perfil de runtime,
+    que pode trocar o backend), sem carregar o modelo. Vai nas chaves de
+    caches persistentes para que uma troca de modelo ou de backend nao
+    sirva resultados antigos.
+    """
+    paths = {'keras': MODEL_PATH, 'onnx': XRAY_ONNX_MODEL_PATH, 'tflite': XRAY_TFLITE_MODEL_PATH,
+             'runtime_profile': XRAY_RUNTIME_PROFILE_PATH, 'ood_gate': XRAY_OOD_GATE_PATH}
+    if XRAY_FAST_MODEL_ENABLED:
+        paths['fastload'] = os.path.join(XRAY_FAST_MODEL_PATH, MANIFEST_NAME)
+
+    artifacts = {}
+    for name, path in paths.items():
+        try:
+            stat = os.stat(path)
+            artifacts[name] = [str(path), stat.st_size, stat.st_mtime_ns]
+        except OSError:
+            artifacts[name] = None
+    return {'backend': XRAY_BACKEND, 'artifacts': artifacts}
+
 
 # Instancia global para uso no chatbot (carregamento lazy)
 _classifier_instance = None
@@ -289,9 +760,39 @@ def get_classifier() -> XRayClassifier:
     Retorna a instancia global do classificador.
 
     Utiliza padrao singleton para evitar carregar o modelo
-    multiplas vezes.
+    multiplas vezes. Com XRAY_MODEL_SERVER_SOCKET definido, o modelo fica
+    no servidor compartilhado (`model_server.py`) e este processo nao o carrega.
     """
     global _classifier_instance
     if _classifier_instance is None:
-        _classifier_instance = XRayClassifier()
+        if XRAY_MODEL_SERVER_SOCKET:
+            from model_server import RemoteXRayClassifier
+            _classifier_instance = RemoteXRayClassifier(XRAY_MODEL_SERVER_SOCKET)
+        else:
+            _classifier_instance = XRayClassifier()
     return _classifier_instance
+
+
+if __name__ == "__main__":
+    # Compara o caminho compilado com model.predict em lotes sinteticos
+    import sys
+
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    batch = np.random.rand(1, IMAGE_SIZE[0], IMAGE_SIZE[1], 3).astype(np.float32)
+    outputs = {}
+
+    for mode in INFERENCE_MODES:
+        classifier = XRayClassifier(inference_mode=mode)
+        if not classifier.is_model_loaded():
+            print("Modelo nao carregado")
+            sys.exit(1)
+
+        classifier.predict_batch(batch)
+        start = time.perf_counter()
+        for _ in range(runs):
+            outputs[mode] = classifier.predict_batch(batch)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / runs
+        print(f"{mode:>9}: {elapsed_ms:.2f} ms/imagem ({classifier.inference_mode})")
+
+    delta = float(np.max(np.abs(outputs['compiled'] - outputs['predict'])))
+    print(f"Diferenca maxima de probabilidade: {delta:.2e}")
@@ -0,0 +1,120 @@
+"""
+Pipeline Especulativo de Analise de Raio-X
+==========================================
+Orquestra as etapas de /upload_xray sem executa-las estritamente em serie:
+
+1. verificacao remota via GPT-4o Vision (`is_xray_image`)
+2. classificacao local (forward pass + gate local de raio-X)
+3. busca RAG + LLM com informacoes de saude da classe detectada
+
+A verificacao remota (quando necessaria) e a busca RAG rodam em paralelo
+com o trabalho local; se o veredito final for "nao e raio-X", o trabalho
+especulativo e descartado. A latencia total fica proxima da etapa mais
+lenta em vez da soma de todas.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from config import XRAY_SPECULATIVE_PIPELINE, XRAY_PIPELINE_WORKERS
+except ImportError:
+    # Fallback se config não importável (development edge case)
+    import os
+    XRAY_SPECULATIVE_PIPELINE = os.getenv('XRAY_SPECULATIVE_PIPELINE', 'true').lower() == 'true'
+    XRAY_PIPELINE_WORKERS = int(os.getenv('XRAY_PIPELINE_WORKERS', 8))
+
+from ood_gate import VERDICT_NOT_XRAY, VERDICT_UNCERTAIN
+
+logger = logging.getLogger(__name__)
+
+# Pool compartilhado pelas requisicoes (chamadas remotas sao I/O-bound)
+_executor = ThreadPoolExecutor(max_workers=XRAY_PIPELINE_WORKERS, thread_name_prefix='xray-pipeline')
+
+
+def _discard(future):
+    """Cancela um trabalho especulativo (se ainda nao iniciou) e ignora o resultado."""
+    if future is not None and not future.cancel():
+        future.add_done_callback(lambda f: f.exception())
+
+
+def analyze_xray(classifier, ingested, fetch_health_info, cache_keys=None,
+                 speculative: bool = XRAY_SPECULATIVE_PIPELINE) -> dict:
+    """
+    Executa verificacao, classificacao e busca de informacoes de saude.
+
+    Args:
+        classifier: Instancia de `XRayClassifier`
+        ingested: `IngestedImage` produzido por `ingest_image`
+        fetch_health_info: Funcao que recebe a query da doenca e retorna
+            as informacoes de saude (ex.: `chatbot.get_ragsaude_response`)
+        cache_keys: Chaves de cache da imagem (`classifier.get_cache_keys`)
+        speculative: Se False, executa as etapas em serie (comparacao)
+
+    Returns:
+        dict com:
+            - is_xray: bool
+            - classification: resultado de `classify`
+            - health_info: retorno de `fetch_health_info` (ou None)
+    """
+    def verify():
+        return classifier.is_xray_image(
+            ingested.image,
+            image_data_url=ingested.vision_data_url,
+            cache_keys=cache_keys
+        )
+
+    if not speculative:
+        return _analyze_sequential(classifier, ingested, fetch_health_info, cache_keys, verify)
+
+    # Sem gate local ajustado o veredito remoto sempre sera necessario:
+    # dispara a chamada ja, em paralelo com o forward pass
+    vision_future = _executor.submit(verify) if classifier.ood_gate is None else None
+
+    result, gate_verdict = classifier.classify_with_gate(ingested.tensor, cache_keys=cache_keys)
+
+    if gate_verdict == VERDICT_NOT_XRAY:
+        _discard(vision_future)
+        return {'is_xray': False, 'classification': result, 'health_info': None}
+
+    # Busca RAG especulativa da classe detectada enquanto o veredito e aguardado
+    rag_future = None
+    if result['success']:
+        rag_future = _executor.submit(
+            fetch_health_info, classifier.get_disease_query(result['class_name'])
+        )
+
+    if gate_verdict == VERDICT_UNCERTAIN:
+        if vision_future is None:
+            vision_future = _executor.submit(verify)
+        is_xray = vision_future.result()
+    else:
+        _discard(vision_future)
+        is_xray = True
+
+    if not is_xray:
+        logger.info("Veredito: nao e raio-X - descartando busca RAG especulativa")
+        _discard(rag_future)
+        return {'is_xray': False, 'classification': result, 'health_info': None}
+
+    return {
+        'is_xray': True,
+        'classification': result,
+        'health_info': rag_future.result() if rag_future is not None else None
+    }
+
+
+def _analyze_sequential(classifier, ingested, fetch_health_info, cache_keys, verify) -> dict:
+    """Mesmo fluxo, etapa por etapa."""
+    result, gate_verdict = classifier.classify_with_gate(ingested.tensor, cache_keys=cache_keys)
+
+    if gate_verdict == VERDICT_UNCERTAIN:
+        is_xray = verify()
+    else:
+        is_xray = gate_verdict != VERDICT_NOT_XRAY
+
+    health_info = None
+    if is_xray and result['success']:
+        health_info = fetch_health_info(classifier.get_disease_query(result['class_name']))
+
+    return {'is_xray': is_xray, 'classification': result, 'health_info': health_info}